@@ -32,6 +32,160 @@ class Settings(BaseSettings):
         None  # e.g. "mistral-small-latest" or "mistral-large-latest"
     )
 
+    # Shared HTTP pool for the OpenAI / Azure OpenAI engines (all tenants)
+    LLM_HTTP_MAX_CONNECTIONS: int = 500
+    LLM_HTTP_MAX_KEEPALIVE: int = 100
+    LLM_HTTP_TIMEOUT: float = 60.0  # default per-call timeout (engine.config "timeout")
+    LLM_HTTP_CONNECT_TIMEOUT: float = 5.0
+    LLM_HTTP2: bool = False
+    LLM_MAX_RETRIES: int = 2  # SDK retries (engine.config "max_retries")
+    LLM_MAX_CONCURRENCY: int = 0  # calls in flight per tenant engine; 0 = no cap
+
+    # Tenant store cache (only applies to tenants fetched through a loader)
+    TENANT_CACHE_TTL: float = 300.0  # fresh for this long
+    TENANT_STALE_TTL: float = 3600.0  # then served stale while refreshing
+    TENANT_NEGATIVE_TTL: float = 60.0  # remember unknown ids/tokens
+    TENANT_NEGATIVE_MAX: int = 10000
+
+    # Hot-reloaded tenants file (JSON list, same shape as the dev seed file)
+    TENANT_WATCH_FILE: str | None = None
+    TENANT_WATCH_INTERVAL: float = 1.0  # polling fallback when watchfiles is absent
+
+    # WhatsApp Cloud (Graph) API client
+    GRAPH_API_BASE_URL: str = "https://graph.facebook.com"
+    GRAPH_API_VERSION: str = "v21.0"
+    GRAPH_HTTP_MAX_CONNECTIONS: int = 200
+    GRAPH_HTTP_MAX_KEEPALIVE: int = 100
+    GRAPH_HTTP_TIMEOUT: float = 15.0
+    GRAPH_HTTP_CONNECT_TIMEOUT: float = 5.0
+    GRAPH_HTTP2: bool = True  # used only if the `h2` package is installed
+
+    # Engine cache (warm ResponseEngine instances per tenant)
+    ENGINE_CACHE_MAX_SIZE: int = 512
+    ENGINE_CACHE_IDLE_TTL: float = 1800.0  # seconds; 0 disables idle eviction
+    ENGINE_PREWARM: bool = True
+    # engine types whose SDKs the gunicorn master imports before forking
+    # (shared copy-on-write by the workers), e.g. ["openai", "mistral"]
+    ENGINE_PRELOAD: list[str] = []
+
+    # Engine resilience: per-attempt deadline and per-provider circuit breakers.
+    # Per tenant via engine.config deadline_ms / hedge_after_ms / fallbacks
+    ENGINE_DEADLINE_MS: int = 20000
+    ENGINE_BREAKER_WINDOW: int = 20  # last N calls per provider
+    ENGINE_BREAKER_MIN_CALLS: int = 10
+    ENGINE_BREAKER_ERROR_RATE: float = 0.5
+    ENGINE_BREAKER_SLOW_CALL_MS: int = 8000
+    ENGINE_BREAKER_SLOW_RATE: float = 0.8
+    ENGINE_BREAKER_COOLDOWN: float = 30.0  # seconds open before a probe call
+
+    # Webhook work queue
+    QUEUE_BACKEND: str = "memory"  # "memory" | "sqlite"
+    QUEUE_SQLITE_PATH: str = "work_queue.db"
+    QUEUE_MAX_SIZE: int = 10000  # memory backend only
+    QUEUE_CONSUMERS: int = 16
+    QUEUE_MAX_ATTEMPTS: int = 5
+    QUEUE_RETRY_BASE: float = 1.0  # seconds, doubled per attempt
+    QUEUE_RETRY_MAX: float = 300.0
+    QUEUE_VISIBILITY_TIMEOUT: float = 300.0  # sqlite lease before redelivery
+    QUEUE_TENANT_CONCURRENCY: int = 8  # jobs per tenant at once; 0 = no cap
+
+    # Fair scheduling across tenants (per tenant: TenantConfig.limits
+    # {"weight", "engine", "sends", "jobs"})
+    FAIR_ENGINE_CONCURRENCY: int = 256  # engine calls at once (async, no threads)
+    FAIR_ENGINE_PER_TENANT: int = 64
+    FAIR_SEND_CONCURRENCY: int = 128  # Graph API sends at once
+    FAIR_SEND_PER_TENANT: int = 32
+
+    # Inbound message-ID deduplication (Meta webhook retries)
+    DEDUP_BACKEND: str = "memory"  # "memory" | "bloom" | "sqlite" | "none"
+    DEDUP_TTL_SECONDS: float = 86400.0
+    DEDUP_MAX_ENTRIES: int = 200000  # memory backend
+    DEDUP_BLOOM_CAPACITY: int = 1000000  # ids per half-window, bloom backend
+    DEDUP_BLOOM_ERROR_RATE: float = 0.0001
+    DEDUP_SQLITE_PATH: str = "dedup.db"
+    # sqlite backend: a claim not completed within this long (worker died) can
+    # be claimed again by the queue's redelivery; keep it below
+    # QUEUE_VISIBILITY_TIMEOUT
+    DEDUP_CLAIM_LEASE: float = 120.0
+
+    # Outbound send scheduler (Graph API throughput / pair rate limits)
+    SEND_RATE_PER_NUMBER: float = 80.0  # messages/s per phone_number_id
+    SEND_BURST_PER_NUMBER: float = 80.0
+    SEND_PAIR_RATE: float = 1 / 6  # messages/s to one recipient
+    SEND_PAIR_BURST: float = 45.0
+    SEND_MAX_RETRIES: int = 5  # on rate-limit responses only
+    SEND_RETRY_BASE: float = 1.0  # seconds, doubled per retry (+ jitter)
+
+    # Delivery status pipeline (webhook status callbacks)
+    STATUS_TRACK_MAX_MESSAGES: int = 100000  # per tenant, oldest dropped first
+    STATUS_FLUSH_INTERVAL: float = 10.0  # seconds between aggregate log lines
+    STATUS_MAX_BUFFER: int = 5000  # buffered events before an early apply
+
+    # Conversation memory (LLM context per tenant + wa_id)
+    MEMORY_MAX_TURNS: int = 12
+    MEMORY_MAX_TOKENS: int = 1200  # older turns are folded into a short digest
+    MEMORY_MAX_CHARS: int = 1000  # per stored turn
+    MEMORY_MAX_CONVERSATIONS: int = 20000  # kept in memory (LRU)
+    MEMORY_IDLE_TTL: float = 3600.0  # seconds before a conversation leaves memory
+    MEMORY_SPILL_PATH: str | None = None  # e.g. "conversations.db" to keep evicted ones
+
+    # Streamed LLM replies, sent as one WhatsApp message per sentence/paragraph
+    # chunk (per tenant: engine.config "stream")
+    LLM_STREAM_REPLIES: bool = False
+    STREAM_MIN_CHUNK_CHARS: int = 80  # don't send sentence fragments shorter than this
+
+    # Reply cache in front of the engines (per tenant: engine.config "cache")
+    REPLY_CACHE_MAX_ENTRIES: int = 10000  # across tenants, LRU
+    REPLY_CACHE_TTL: float = 3600.0
+    REPLY_CACHE_MAX_CHARS: int = 256  # longer messages are never cached
+
+    # Media, streamed in chunks both ways (services/media.py)
+    MEDIA_DIR: str = "media"  # inbound files, per tenant
+    # off unless the engine reads files; per tenant: engine.config "download_media"
+    MEDIA_DOWNLOAD_INBOUND: bool = False
+    MEDIA_CHUNK_SIZE: int = 262144
+    MEDIA_MAX_BYTES: int = 100 * 1024 * 1024
+    MEDIA_RETENTION: float = 86400.0  # seconds inbound files are kept; 0 = forever
+    # upload linked media once per number and send by ID; the server fetches
+    # the link itself (https, public addresses only). Per tenant: engine.config
+    # "upload_media" / "upload_media_hosts"
+    MEDIA_UPLOAD_CACHE: bool = False
+    MEDIA_UPLOAD_HOSTS: list[str] = []  # allowed hosts (and subdomains); [] = any
+    MEDIA_ID_TTL: float = 25 * 86400.0  # Meta keeps uploads for 30 days
+    MEDIA_LINK_TTL: float = 3600.0  # trust a link's content hash this long
+    MEDIA_ID_CACHE_MAX_ENTRIES: int = 10000
+
+    # Reply coalescing: bursts from one user get a single engine call + send.
+    # Per tenant via engine.config coalesce_window_ms / coalesce_max_wait_ms
+    COALESCE_WINDOW_MS: int = 0  # quiet time to wait for more messages; 0 = off
+    COALESCE_MAX_WAIT_MS: int = 5000  # cap from the first message of a burst
+
+    # Logging (records are written by a background thread)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "text" | "json"
+    LOG_FILE: str | None = "app.log"  # local runs only; empty disables
+    LOG_QUEUE_SIZE: int = 10000  # records beyond this are dropped, not waited on
+    # per-category share of INFO lines kept, then a per-second cap
+    LOG_SAMPLE_RATES: dict[str, float] = {"payload": 0.1}
+    LOG_RATE_LIMITS: dict[str, float] = {"payload": 20, "fallback": 10}
+
+    # Admission control (services/admission.py): degrade to rules replies at
+    # pressure 1, defer queued jobs and fail /ready at ADMISSION_SHED_FACTOR
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_SAMPLE_INTERVAL: float = 0.1  # seconds between loop-lag probes
+    ADMISSION_LOOP_LAG_MS: float = 200.0
+    ADMISSION_EXECUTOR_QUEUE: int = 64  # default executor calls waiting for a thread
+    ADMISSION_ENGINE_CALLS: int = (
+        0  # engine calls running + waiting; 0 = FAIR_ENGINE_CONCURRENCY
+    )
+    ADMISSION_SHED_FACTOR: float = 2.0
+    ADMISSION_RECOVER_FACTOR: float = 0.7
+    ADMISSION_MIN_HOLD: float = 5.0  # seconds below the threshold before stepping down
+    ADMISSION_SHED_CONSUMERS: int = 2  # consumers still taking jobs while overloaded
+
+    # Prometheus text metrics on /metrics
+    METRICS_ENABLED: bool = True
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
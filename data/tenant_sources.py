@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+from typing import Optional
+
+from data.tenants_store import TenantsStore
+from logger import logger
+
+try:  # inotify/FSEvents via watchfiles (ships with uvicorn[standard])
+    from watchfiles import awatch
+except ImportError:  # pragma: no cover - falls back to mtime polling
+    awatch = None
+
+
+def _normalize(t: dict) -> dict:
+    t = dict(t)
+    for k in ("phone_number_id", "waba_id", "verify_token", "tenant_id"):
+        if k in t and t[k] is not None:
+            t[k] = str(t[k])
+    return t
+
+
+class FileTenantsSource:
+    """
+    Tenants from a JSON file (list of TenantConfig dicts), kept in sync with
+    the store while the app runs.
+
+    On every change the file is re-read, diffed by tenant_id, and only added /
+    changed / removed tenants are re-indexed. The store's change listeners
+    then drop dependent caches (engines, Graph clients).
+    Also implements TenantsLoader, so it can be passed to set_loader().
+    """
+
+    def __init__(self, path: str, store: TenantsStore, poll_interval: float = 1.0):
+        self.path = os.path.abspath(path)
+        self.store = store
+        self.poll_interval = poll_interval
+        self._tenants: dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+        self._loaded_mtime: Optional[int] = None
+        self.reloads = 0
+
+    # --- TenantsLoader ---
+
+    def _find(self, field: str, value: str) -> Optional[dict]:
+        for t in self._tenants.values():
+            if t.get(field) == value:
+                return t
+        return None
+
+    async def by_phone_number_id(self, phone_number_id: str) -> Optional[dict]:
+        return self._find("phone_number_id", phone_number_id)
+
+    async def by_verify_token(self, verify_token: str) -> Optional[dict]:
+        return self._find("verify_token", verify_token)
+
+    async def by_waba_id(self, waba_id: str) -> Optional[dict]:
+        return self._find("waba_id", waba_id)
+
+    # --- reload ---
+
+    def _mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self) -> dict[str, dict]:
+        self._loaded_mtime = self._mtime()
+        with open(self.path, "r", encoding="utf-8") as f:
+            tenants = json.load(f)
+        return {str(t["tenant_id"]): _normalize(t) for t in tenants}
+
+    def reload(self) -> dict[str, list[str]]:
+        """Re-read the file and apply the diff. Keeps the old state on errors."""
+        try:
+            new = self._read()
+        except Exception as e:
+            logger.error("[tenants] failed to reload %s: %s", self.path, e)
+            return {"added": [], "changed": [], "removed": []}
+
+        old = self._tenants
+        added = [tid for tid in new if tid not in old]
+        changed = [tid for tid in new if tid in old and new[tid] != old[tid]]
+        removed = [tid for tid in old if tid not in new]
+
+        self._tenants = new
+        for tid in removed:
+            self.store.remove(tid)
+        for tid in added + changed:
+            try:
+                self.store.upsert(new[tid], pinned=True)
+            except Exception as e:
+                logger.error("[tenants] invalid tenant %s: %s", tid, e)
+
+        self.reloads += 1
+        if added or changed or removed:
+            logger.info(
+                "[tenants] reloaded %s: added=%s changed=%s removed=%s",
+                self.path,
+                added,
+                changed,
+                removed,
+            )
+        return {"added": added, "changed": changed, "removed": removed}
+
+    async def _watch(self):
+        if awatch is not None:
+            # watch the directory so atomic replace (write tmp + rename) is seen;
+            # the periodic timeout yield also catches events missed at startup
+            name = os.path.basename(self.path)
+            async for changes in awatch(
+                os.path.dirname(self.path),
+                watch_filter=lambda _change, p: os.path.basename(p) == name,
+                stop_event=self._stop,
+                debounce=50,
+                step=10,
+                rust_timeout=int(self.poll_interval * 1000),
+                yield_on_timeout=True,
+            ):
+                if changes or self._mtime() != self._loaded_mtime:
+                    self.reload()
+            return
+
+        while not self._stop.is_set():
+            if self._mtime() != self._loaded_mtime:
+                self.reload()
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        self.reload()
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, 5)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
@@ -1,6 +1,13 @@
-from typing import Optional, Protocol
+import asyncio
+import time
+from collections import OrderedDict
+from functools import cached_property
+from typing import Callable, Optional, Protocol
 from pydantic import BaseModel
 
+from core.config import settings
+from logger import logger
+
 
 class TenantConfig(BaseModel):
     tenant_id: str
@@ -12,6 +19,13 @@ class TenantConfig(BaseModel):
     access_token: str
     engine: dict
     status: str = "active"
+    # fair-share weight and concurrency caps, see services.fair_scheduler
+    limits: dict | None = None
+
+    @cached_property
+    def as_dict(self) -> dict:
+        """model_dump() computed once per config (shared: don't mutate)."""
+        return self.model_dump()
 
 
 class TenantsLoader(Protocol):
@@ -20,24 +34,127 @@ class TenantsLoader(Protocol):
     async def by_waba_id(self, waba_id: str) -> Optional[dict]: ...
 
 
+# listener(tenant_id, old, new): old/new is None on add/remove
+TenantChangeListener = Callable[
+    [str, Optional[TenantConfig], Optional[TenantConfig]], None
+]
+
+# lookup kind -> (TenantConfig attribute, loader method)
+_KINDS = {
+    "verify_token": ("verify_token", "by_verify_token"),
+    "phone_number_id": ("phone_number_id", "by_phone_number_id"),
+    "waba_id": ("waba_id", "by_waba_id"),
+}
+
+
 class TenantsStore:
-    def __init__(self):
+    """
+    In-process tenant cache in front of an optional async loader.
+
+    - Loader-backed entries are fresh for `ttl` seconds, then served stale for up
+      to `stale_ttl` more while a background refresh runs; after that a lookup
+      waits for the reload. Seeded (dev) tenants never expire.
+    - Unknown keys are remembered for `negative_ttl` seconds (bounded), so
+      webhooks for unknown numbers don't hit the backend every time.
+    - Concurrent misses for the same key share a single loader call.
+    - Re-indexing a tenant is atomic across all four index dicts: keys the
+      tenant no longer has (e.g. a rotated verify_token) are dropped.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        stale_ttl: float = 3600.0,
+        negative_ttl: float = 60.0,
+        negative_max: int = 10000,
+    ):
         self._by_verify_token: dict[str, TenantConfig] = {}
         self._by_phone_id: dict[str, TenantConfig] = {}
         self._by_waba_id: dict[str, TenantConfig] = {}
         self._by_tenant_id: dict[str, TenantConfig] = {}
         self._loader: Optional[TenantsLoader] = None
 
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.negative_max = negative_max
+        # tenant_id -> monotonic load time; absent = pinned (seeded, never expires)
+        self._loaded_at: dict[str, float] = {}
+        self._negative: OrderedDict[tuple[str, str], float] = OrderedDict()
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+        self.loader_calls = 0
+        self._listeners: list[TenantChangeListener] = []
+
+    def add_listener(self, listener: TenantChangeListener):
+        """Called synchronously whenever a tenant is added, changed or removed."""
+        self._listeners.append(listener)
+
+    def _notify(self, tenant_id: str, old, new):
+        for listener in self._listeners:
+            try:
+                listener(tenant_id, old, new)
+            except Exception as e:
+                logger.error(
+                    "[tenants] change listener failed for %s: %s", tenant_id, e
+                )
+
     def set_loader(self, loader: TenantsLoader):
         self._loader = loader
+        self._negative.clear()
+
+    def _indexes(self) -> dict[str, dict[str, TenantConfig]]:
+        return {
+            "verify_token": self._by_verify_token,
+            "phone_number_id": self._by_phone_id,
+            "waba_id": self._by_waba_id,
+        }
+
+    def _unindex(self, cfg: TenantConfig):
+        for kind, index in self._indexes().items():
+            key = getattr(cfg, _KINDS[kind][0])
+            if key and index.get(str(key)) is not None:
+                if index[str(key)].tenant_id == cfg.tenant_id:
+                    del index[str(key)]
+        if self._by_tenant_id.get(cfg.tenant_id) is cfg:
+            del self._by_tenant_id[cfg.tenant_id]
 
-    def _index(self, t: dict | TenantConfig):
+    def _index(self, t: dict | TenantConfig, pinned: bool = False) -> TenantConfig:
         cfg = t if isinstance(t, TenantConfig) else TenantConfig(**t)
+        # No awaits below: the swap is atomic with respect to other coroutines
+        old = self._by_tenant_id.get(str(cfg.tenant_id))
+        if old is not None:
+            self._unindex(old)
         self._by_verify_token[str(cfg.verify_token)] = cfg
         self._by_phone_id[str(cfg.phone_number_id)] = cfg
         if cfg.waba_id:
             self._by_waba_id[str(cfg.waba_id)] = cfg
         self._by_tenant_id[str(cfg.tenant_id)] = cfg
+        if pinned:
+            self._loaded_at.pop(str(cfg.tenant_id), None)
+        else:
+            self._loaded_at[str(cfg.tenant_id)] = time.monotonic()
+        for kind in _KINDS:
+            key = getattr(cfg, _KINDS[kind][0])
+            if key:
+                self._negative.pop((kind, str(key)), None)
+        if old is None or old != cfg:
+            self._notify(str(cfg.tenant_id), old, cfg)
+        return cfg
+
+    def upsert(self, t: dict | TenantConfig, pinned: bool = False) -> TenantConfig:
+        return self._index(t, pinned=pinned)
+
+    def remove(self, tenant_id: str) -> Optional[TenantConfig]:
+        cfg = self._by_tenant_id.get(str(tenant_id))
+        if cfg is not None:
+            self._unindex(cfg)
+            self._loaded_at.pop(str(tenant_id), None)
+            self._notify(str(tenant_id), cfg, None)
+        return cfg
+
+    def all(self) -> list[TenantConfig]:
+        """Every tenant currently in the cache."""
+        return list(self._by_tenant_id.values())
 
     def seed_for_dev(self, tenants: list[dict]):
         for t in tenants:
@@ -45,42 +162,91 @@ class TenantsStore:
             for k in ("phone_number_id", "waba_id", "verify_token", "tenant_id"):
                 if k in t and t[k] is not None:
                     t[k] = str(t[k])
-            self._index(t)
+            self._index(t, pinned=True)
 
-    async def get_by_verify_token(self, verify_token: str) -> Optional[TenantConfig]:
-        verify_token = str(verify_token)
-        if verify_token in self._by_verify_token:
-            return self._by_verify_token[verify_token]
-        if self._loader:
-            t = await self._loader.by_verify_token(verify_token)
-            if t:
-                self._index(t)
-                return self._by_verify_token[verify_token]
+    # --- negative cache ---
+
+    def _is_negative(self, kind: str, key: str) -> bool:
+        expires = self._negative.get((kind, key))
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        del self._negative[(kind, key)]
+        return False
+
+    def _remember_negative(self, kind: str, key: str):
+        self._negative[(kind, key)] = time.monotonic() + self.negative_ttl
+        self._negative.move_to_end((kind, key))
+        while len(self._negative) > self.negative_max:
+            self._negative.popitem(last=False)
+
+    # --- loading ---
+
+    def _load(self, kind: str, key: str) -> asyncio.Task:
+        """Single-flight: one loader call per (kind, key) at a time."""
+        task = self._inflight.get((kind, key))
+        if task is None:
+            task = asyncio.create_task(self._load_now(kind, key))
+            self._inflight[(kind, key)] = task
+            task.add_done_callback(lambda _: self._inflight.pop((kind, key), None))
+        return task
+
+    async def _load_now(self, kind: str, key: str) -> Optional[TenantConfig]:
+        self.loader_calls += 1
+        t = await getattr(self._loader, _KINDS[kind][1])(key)
+        if t:
+            return self._index(t)
+        # gone at the source: drop any cached tenant for this key
+        cached = self._indexes()[kind].get(key)
+        if cached is not None:
+            self.remove(cached.tenant_id)
+        self._remember_negative(kind, key)
         return None
 
+    def _refresh_in_background(self, kind: str, key: str):
+        if (kind, key) in self._inflight:
+            return
+
+        def _log_failure(task: asyncio.Task):
+            if not task.cancelled() and task.exception():
+                logger.warning(
+                    "[tenants] background refresh %s=%s failed: %s",
+                    kind,
+                    key,
+                    task.exception(),
+                )
+
+        self._load(kind, key).add_done_callback(_log_failure)
+
+    async def _get(self, kind: str, key: str) -> Optional[TenantConfig]:
+        key = str(key)
+        cfg = self._indexes()[kind].get(key)
+        if cfg is not None:
+            loaded_at = self._loaded_at.get(cfg.tenant_id)
+            if loaded_at is None or not self._loader:
+                return cfg
+            age = time.monotonic() - loaded_at
+            if age < self.ttl:
+                return cfg
+            if age < self.ttl + self.stale_ttl:
+                self._refresh_in_background(kind, key)
+                return cfg
+            return await asyncio.shield(self._load(kind, key))
+        if not self._loader or self._is_negative(kind, key):
+            return None
+        return await asyncio.shield(self._load(kind, key))
+
+    async def get_by_verify_token(self, verify_token: str) -> Optional[TenantConfig]:
+        return await self._get("verify_token", verify_token)
+
     async def get_by_phone_number_id(
         self, phone_number_id: str
     ) -> Optional[TenantConfig]:
-        phone_number_id = str(phone_number_id)
-        if phone_number_id in self._by_phone_id:
-            return self._by_phone_id[phone_number_id]
-        if self._loader:
-            t = await self._loader.by_phone_number_id(phone_number_id)
-            if t:
-                self._index(t)
-                return self._by_phone_id[phone_number_id]
-        return None
+        return await self._get("phone_number_id", phone_number_id)
 
     async def get_by_waba_id(self, waba_id: str) -> Optional[TenantConfig]:
-        waba_id = str(waba_id)
-        if waba_id in self._by_waba_id:
-            return self._by_waba_id[waba_id]
-        if self._loader:
-            t = await self._loader.by_waba_id(waba_id)
-            if t:
-                self._index(t)
-                return self._by_waba_id[waba_id]
-        return None
+        return await self._get("waba_id", waba_id)
 
     def resolve_for_send(
         self, tenant_id: str | None, phone_number_id: str | None
@@ -91,5 +257,18 @@ class TenantsStore:
             return self._by_phone_id[str(phone_number_id)]
         return None
 
+    def stats(self) -> dict:
+        return {
+            "tenants": len(self._by_tenant_id),
+            "negative_cached": len(self._negative),
+            "loads_in_flight": len(self._inflight),
+            "loader_calls": self.loader_calls,
+        }
+
 
-tenants_store = TenantsStore()
+tenants_store = TenantsStore(
+    ttl=settings.TENANT_CACHE_TTL,
+    stale_ttl=settings.TENANT_STALE_TTL,
+    negative_ttl=settings.TENANT_NEGATIVE_TTL,
+    negative_max=settings.TENANT_NEGATIVE_MAX,
+)
@@ -0,0 +1,17 @@
+# gunicorn -c gunicorn.conf.py main:app
+import os
+
+from core.config import settings
+from services.engines.backends import preload_sdks
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Engine SDKs are otherwise imported lazily per worker (services.engines.backends).
+# Importing the ones most tenants use here, in the master, lets every worker
+# share them copy-on-write instead of each paying the import time and memory.
+# The app itself is not preloaded: its logging thread would not survive the fork.
+if settings.ENGINE_PRELOAD:
+    preload_sdks(settings.ENGINE_PRELOAD)
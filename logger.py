@@ -1,27 +1,165 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from core.config import settings
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields (tenant_id, message_id, ...) included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Thins out high-volume INFO/DEBUG lines by `extra={"category": ...}`:
+    keeps a `sample_rates[category]` share of them, then at most
+    `rate_limits[category]` per second. The next line that gets through
+    carries `suppressed=<n>`. Warnings and errors always pass.
+    """
+
+    def __init__(self, sample_rates: dict[str, float], rate_limits: dict[str, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limits = rate_limits
+        self._windows: dict[str, list] = {}  # category -> [second, count]
+        self._suppressed: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, "category", None)
+        if category is None or record.levelno >= logging.WARNING:
+            return True
+        rate = self.sample_rates.get(category, 1.0)
+        limit = self.rate_limits.get(category)
+        with self._lock:
+            keep = rate >= 1.0 or random.random() < rate
+            if keep and limit is not None:
+                now = int(time.monotonic())
+                window = self._windows.get(category)
+                if window is None or window[0] != now:
+                    window = self._windows[category] = [now, 0]
+                keep = window[1] < limit
+                if keep:
+                    window[1] += 1
+            if not keep:
+                self._suppressed[category] = self._suppressed.get(category, 0) + 1
+                return False
+            suppressed = self._suppressed.pop(category, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread untouched: formatting (and the %-args
+    merge) happens there, not on the event loop. Drops records when the
+    queue is full instead of blocking the caller.
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _ForwardHandler(logging.Handler):
+    """Emits through another logger's current handlers (shared, not copied)."""
+
+    def __init__(self, target: logging.Logger):
+        super().__init__()
+        self.target = target
+
+    def emit(self, record: logging.LogRecord):
+        self.target.callHandlers(record)
+
+
+_listener: QueueListener | None = None
+_queue_handler: NonBlockingQueueHandler | None = None
+
+
+def _start_writer(handlers: list[logging.Handler]) -> NonBlockingQueueHandler:
+    global _listener, _queue_handler
+    q: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler = NonBlockingQueueHandler(q)
+    _listener = QueueListener(q, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # flush what's queued on shutdown
+    return _queue_handler
+
+
+def _formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+
+
+def logger_stats() -> dict:
+    if _queue_handler is None:
+        return {}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
 
 
 def configure_logger():
+    sampling = SamplingFilter(settings.LOG_SAMPLE_RATES, settings.LOG_RATE_LIMITS)
+    # httpx logs an INFO "HTTP Request:" line per Graph/LLM call
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
     if "gunicorn" in sys.modules:
-        # When running with Gunicorn
+        # When running with Gunicorn: write through Gunicorn's handlers,
+        # from the background thread
         gunicorn_logger = logging.getLogger("gunicorn.error")
         logger = logging.getLogger("my_app")
         logging.getLogger("logger").setLevel(logging.WARNING)
-        logger.handlers = gunicorn_logger.handlers  # Use Gunicorn handlers
-        logger.setLevel(logging.INFO)  # Use Gunicorn log level
+        if settings.LOG_FORMAT == "json":
+            for handler in gunicorn_logger.handlers:
+                handler.setFormatter(_formatter())
+        logger.handlers = [_start_writer([_ForwardHandler(gunicorn_logger)])]
+        logger.setLevel(settings.LOG_LEVEL)
     else:
         # For local development or when running without Gunicorn
         logging.getLogger("logger").setLevel(logging.WARNING)
+        handlers: list[logging.Handler] = [logging.StreamHandler()]  # Logs to console
+        if settings.LOG_FILE:
+            handlers.append(logging.FileHandler(settings.LOG_FILE, mode="a"))
+        for handler in handlers:
+            handler.setFormatter(_formatter())
         logging.basicConfig(
-            level=logging.INFO,  # Set to INFO or WARNING in production
-            format="%(asctime)s - %(levelname)s - %(message)s",
-            handlers=[
-                logging.StreamHandler(),  # Logs to console
-                logging.FileHandler("app.log", mode="a"),  # Logs to file
-            ],
+            level=settings.LOG_LEVEL, handlers=[_start_writer(handlers)]
         )
         logger = logging.getLogger("my_app")
+    logger.addFilter(sampling)
     return logger
 
 
@@ -1,26 +1,165 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from logger import logger
 from contextlib import asynccontextmanager
 from concurrent.futures import ThreadPoolExecutor
 import json
 import asyncio
-from routers.whatsapp import router as whatsapp_router
+from functools import partial
+from routers.whatsapp import router as whatsapp_router, process_job
 from core.config import settings
 from data.tenants_store import tenants_store
+from data.tenant_sources import FileTenantsSource
+from services.engines.registry import engine_registry
+from services.http_pool import aclose_graph_http, aclose_llm_http
+from services.queue import QueueConsumers, build_queue
+from services.send_scheduler import send_scheduler
+from services.status_tracker import status_tracker
+from services.conversation_memory import conversation_memory
+from services.circuit_breaker import circuit_breakers
+from services.fair_scheduler import fair_scheduler
+from services.metrics import metrics
+from services.admission import admission
+from services.media import media_store
+from services.whatsapp_client import invalidate_client
 
 asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
 
 
+def on_tenant_change(tenant_id: str, old, new):
+    # Drop caches built from the previous config (engine, Graph client/token)
+    engine_registry.invalidate(tenant_id)
+    if old is not None:
+        invalidate_client(old.phone_number_id)
+
+
+def tenant_job_limit(store, tenant_id: str):
+    tenant = store.resolve_for_send(tenant_id, None)
+    return (tenant.limits or {}).get("jobs") if tenant else None
+
+
+def saturation_gauges(app: FastAPI):
+    """Gauges read at scrape time: executor, work queue, fair pools, sends, breakers."""
+
+    async def collect():
+        executor = app.state.executor
+        consumers = await app.state.queue_consumers.stats()
+        samples = [
+            (
+                "app_executor_threads",
+                "Default executor threads started",
+                {},
+                len(executor._threads),
+            ),
+            (
+                "app_executor_max_threads",
+                "Default executor size",
+                {},
+                executor._max_workers,
+            ),
+            (
+                "app_executor_queued",
+                "Default executor calls waiting for a thread",
+                {},
+                executor._work_queue.qsize(),
+            ),
+            (
+                "app_queue_consumers_busy",
+                "Queue consumers running a job",
+                {},
+                consumers["busy"],
+            ),
+            ("app_queue_consumers", "Queue consumers", {}, consumers["consumers"]),
+            (
+                "app_queue_deferred",
+                "Jobs handed back to the queue over a tenant's cap, since start",
+                {},
+                consumers["deferred"],
+            ),
+        ]
+        for state in ("ready", "leased", "delayed"):
+            samples.append(
+                (
+                    "app_queue_jobs",
+                    "Work queue jobs by state",
+                    {"state": state},
+                    consumers[state],
+                )
+            )
+        for name, pool in fair_scheduler.stats().items():
+            labels = {"pool": name}
+            samples.append(
+                (
+                    "app_fair_in_flight",
+                    "Fair pool slots in use",
+                    labels,
+                    pool["in_flight"],
+                )
+            )
+            samples.append(
+                ("app_fair_queued", "Fair pool waiters", labels, pool["queued"])
+            )
+            samples.append(
+                ("app_fair_capacity", "Fair pool size", labels, pool["capacity"])
+            )
+        for pnid, lane in send_scheduler.stats()["numbers"].items():
+            labels = {"phone_number_id": pnid}
+            samples.append(
+                ("app_send_queued", "Sends waiting per number", labels, lane["queued"])
+            )
+            samples.append(
+                (
+                    "app_send_in_flight",
+                    "Sends in flight per number",
+                    labels,
+                    lane["in_flight"],
+                )
+            )
+        samples += [
+            (
+                "app_admission_level",
+                "0 ok, 1 degraded, 2 overloaded",
+                {},
+                admission.level,
+            ),
+            (
+                "app_admission_pressure",
+                "Largest signal / its limit",
+                {},
+                admission.pressure,
+            ),
+            (
+                "app_event_loop_lag_seconds",
+                "Smoothed event-loop lag",
+                {},
+                admission.loop_lag,
+            ),
+        ]
+        for provider, b in circuit_breakers.stats().items():
+            samples.append(
+                (
+                    "app_breaker_open",
+                    "1 while a provider's circuit breaker is open",
+                    {"provider": provider},
+                    int(b["state"] == "open"),
+                )
+            )
+        return samples
+
+    return collect
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Thread pool for sync heyoo calls
+    # Thread pool for remaining sync work (e.g. sync LLM SDK calls)
     loop = asyncio.get_running_loop()
     app.state.executor = ThreadPoolExecutor(max_workers=32)
     loop.set_default_executor(app.state.executor)
 
     # Make tenant store available to routers
     app.state.tenants_store = tenants_store
+    tenants_store.add_listener(on_tenant_change)
 
     # Dev seeding (optional)
     if settings.APP_ENV != "production":
@@ -30,21 +169,78 @@ async def lifespan(app: FastAPI):
                 with open(settings.TENANT_DEV_SEED_FILE, "r", encoding="utf-8") as f:
                     tenants = json.load(f)
         except Exception as e:
-            logger.error(f"Failed to parse TENANT_DEV_SEED: {e}")
+            logger.error("Failed to parse TENANT_DEV_SEED: %s", e)
 
         if tenants:
             tenants_store.seed_for_dev(tenants)
-            logger.info(f"[DEV] Seeded {len(tenants)} tenants")
+            logger.info("[DEV] Seeded %s tenants", len(tenants))
             logger.info(
-                f"[DEV] phone_ids={list(getattr(tenants_store, '_by_phone_id', {}).keys())}"
+                "[DEV] phone_ids=%s", [t.phone_number_id for t in tenants_store.all()]
             )
+            if settings.ENGINE_PREWARM:
+                warmed = await engine_registry.prewarm(tenants)
+                logger.info("[DEV] Pre-warmed %s/%s engines", warmed, len(tenants))
         else:
             logger.warning("[DEV] No tenants seeded")
 
+    # Hot-reloadable tenants file (any env): changes apply without a restart
+    app.state.tenant_source = None
+    if settings.TENANT_WATCH_FILE:
+        source = FileTenantsSource(
+            settings.TENANT_WATCH_FILE,
+            tenants_store,
+            poll_interval=settings.TENANT_WATCH_INTERVAL,
+        )
+        await source.start()
+        tenants_store.set_loader(source)
+        app.state.tenant_source = source
+        logger.info("Watching tenants file %s", settings.TENANT_WATCH_FILE)
+        if settings.ENGINE_PREWARM:
+            await engine_registry.prewarm([t.as_dict for t in tenants_store.all()])
+
     # TODO (prod): attach real loader (Cosmos/KeyVault) here via tenants_store.set_loader(...)
+
+    # Webhook work queue + fixed consumer pool
+    app.state.work_queue = build_queue()
+    app.state.queue_consumers = QueueConsumers(
+        app.state.work_queue,
+        partial(process_job, tenants_store),
+        concurrency=settings.QUEUE_CONSUMERS,
+        max_attempts=settings.QUEUE_MAX_ATTEMPTS,
+        retry_base=settings.QUEUE_RETRY_BASE,
+        retry_max=settings.QUEUE_RETRY_MAX,
+        tenant_limit=settings.QUEUE_TENANT_CONCURRENCY,
+        limit_for=partial(tenant_job_limit, tenants_store),
+        admit=admission.admit,
+    )
+    app.state.queue_consumers.start()
+    gauges = saturation_gauges(app)
+    metrics.add_collector(gauges)
+    status_tracker.start()
+    media_store.start()
+    admission.start(app.state.executor)
+    logger.info(
+        "Work queue: backend=%s consumers=%s",
+        settings.QUEUE_BACKEND,
+        settings.QUEUE_CONSUMERS,
+    )
+
     yield
 
     # Cleanup
+    metrics.remove_collector(gauges)
+    await admission.stop()
+    if app.state.tenant_source:
+        await app.state.tenant_source.stop()
+    await app.state.queue_consumers.stop()
+    await app.state.work_queue.close()
+    await status_tracker.stop()
+    await media_store.stop()
+    await conversation_memory.close()
+    await send_scheduler.close()
+    engine_registry.clear()
+    await aclose_graph_http()
+    await aclose_llm_http()
     app.state.executor.shutdown(wait=True)
 
 
@@ -63,4 +259,19 @@ app.add_middleware(
 
 @app.get("/")
 async def health_check():
+    # liveness only: the process is up (see /ready for load)
     return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def readiness():
+    """503 while overloaded, so the load balancer sends traffic elsewhere."""
+    stats = admission.stats()
+    return JSONResponse(stats, status_code=503 if admission.overloaded else 200)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(
+        await metrics.render(), media_type="text/plain; version=0.0.4"
+    )
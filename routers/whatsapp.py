@@ -1,11 +1,52 @@
-from fastapi import APIRouter, Request, Header, HTTPException, Query, BackgroundTasks
-from fastapi.responses import PlainTextResponse
-from typing import Tuple, Optional
-from services.engines.factory import get_engine
+from fastapi import APIRouter, Request, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+import asyncio
+import json
+import time
+import uuid
+from services.engines.registry import engine_registry
 from services.whatsapp_client import get_client_for
-from services.utils import compute_signature_ok
-from schemas.whatsapp import SendMessageRequest
-from logger import logger
+from services.utils import compute_signature_ok, loads, scan_status_only
+from services.dedup import message_dedup
+from services.keyed_locks import conversation_locks
+from services.send_scheduler import send_scheduler
+from services.status_tracker import status_tracker
+from services.conversation_memory import conversation_memory
+from services.reply_cache import reply_cache
+from services.circuit_breaker import circuit_breakers
+from services.fair_scheduler import fair_scheduler
+from services.coalescer import coalesce_window, commit_batch, reply_coalescer
+from services.text_chunker import chunk_stream
+from services.media import (
+    MEDIA_TYPES,
+    download_enabled,
+    media_ids,
+    media_store,
+)
+from services.admission import admission
+from services.queue import Job
+from services.metrics import (
+    DEGRADED,
+    ENGINE_FIRST_CHUNK,
+    ENGINE_REPLY,
+    MESSAGES,
+    PROCESS_STAGE,
+    SHED_JOBS,
+    WEBHOOK_STAGE,
+    WEBHOOKS,
+    metrics,
+)
+from core.config import settings
+from schemas.whatsapp import SendMessageRequest, SendBatchRequest
+from services.batch_sender import (
+    BatchJob,
+    RecipientSpool,
+    TooManyBatches,
+    batch_jobs,
+    run_batch,
+)
+from logger import logger, logger_stats
 
 router = APIRouter(prefix="/whatsapp", tags=["whatsapp"])
 
@@ -15,21 +56,42 @@ def get_store(request: Request):
     return request.app.state.tenants_store
 
 
-def extract_ids(payload: dict) -> Tuple[Optional[str], Optional[str]]:
+def get_queue(request: Request):
+    # Provided by app lifespan: app.state.work_queue = build_queue()
+    return request.app.state.work_queue
+
+
+def extract_units(payload: dict) -> list[dict]:
     """
-    Returns (phone_number_id, waba_id). Scans all entries/changes.
+    Splits a webhook into one unit per entry/change:
+    {"phone_number_id", "waba_id", "field", "value"}.
+    Meta batches several changes (and phone numbers) into one delivery.
     """
-    phone_number_id = None
-    waba_id = None
-    for entry in payload.get("entry", []):
-        if not waba_id:
-            waba_id = entry.get("id")  # WABA ID
-        for change in entry.get("changes", []):
+    units = []
+    for entry in payload.get("entry", []) or []:
+        waba_id = entry.get("id")  # WABA ID
+        for change in entry.get("changes", []) or []:
             value = change.get("value", {}) or {}
             meta = value.get("metadata", {}) or {}
-            if meta.get("phone_number_id"):
-                phone_number_id = str(meta["phone_number_id"])
-    return phone_number_id, (str(waba_id) if waba_id else None)
+            pnid = meta.get("phone_number_id")
+            units.append(
+                {
+                    "phone_number_id": str(pnid) if pnid else None,
+                    "waba_id": str(waba_id) if waba_id else None,
+                    "field": change.get("field"),
+                    "value": value,
+                }
+            )
+    return units
+
+
+async def resolve_tenant(store, phone_number_id: str | None, waba_id: str | None):
+    tenant = None
+    if phone_number_id:
+        tenant = await store.get_by_phone_number_id(phone_number_id)  # <- await
+    if not tenant and waba_id:
+        tenant = await store.get_by_waba_id(waba_id)  # <- await
+    return tenant
 
 
 @router.get("/webhook")
@@ -52,93 +114,452 @@ async def verify(
 @router.post("/webhook")
 async def receive_webhook(
     request: Request,
-    background: BackgroundTasks,
     x_hub_signature_256: str | None = Header(default=None),
 ):
     raw = await request.body()
-    payload = await request.json()
+    return await ingest_webhook(
+        get_store(request), get_queue(request), raw, x_hub_signature_256
+    )
 
-    phone_number_id, waba_id = extract_ids(payload)
-    logger.info(f"Resolved IDs: phone_number_id={phone_number_id}, waba_id={waba_id}")
 
-    store = get_store(request)
-    tenant = None
-    if phone_number_id:
-        tenant = await store.get_by_phone_number_id(phone_number_id)  # <- await
-    if not tenant and waba_id:
-        tenant = await store.get_by_waba_id(waba_id)  # <- await
+async def ingest_webhook(store, queue, raw: bytes, signature: str | None) -> dict:
+    """
+    Verifies and enqueues one webhook delivery. The body is parsed once;
+    status-only deliveries (the bulk of the traffic) are recognised by a
+    shallow scan and acked inline, without a queue job.
+    """
+    start = time.perf_counter()
+    try:
+        payload = loads(raw)
+    except ValueError:
+        metrics.inc(WEBHOOKS, ("invalid",))
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    metrics.observe(WEBHOOK_STAGE, start, ("parse", "any"))
 
-    if not tenant:
-        logger.error(f"Unknown phone_number_id={phone_number_id} (waba_id={waba_id})")
+    scan = scan_status_only(payload) if isinstance(payload, dict) else None
+    if scan is not None:
+        t = time.perf_counter()
+        tenant = await store.get_by_phone_number_id(scan.phone_number_id)
+        metrics.observe(WEBHOOK_STAGE, t, ("tenant_lookup", "status"))
+        if tenant:
+            t = time.perf_counter()
+            if tenant.app_secret and not compute_signature_ok(
+                raw, signature, tenant.app_secret
+            ):
+                metrics.inc(WEBHOOKS, ("forbidden",))
+                raise HTTPException(status_code=403, detail="Invalid signature")
+            metrics.observe(WEBHOOK_STAGE, t, ("signature", "status"))
+            handle_statuses(tenant, scan.statuses)
+            metrics.inc(WEBHOOKS, ("status",))
+            metrics.observe(WEBHOOK_STAGE, start, ("total", "status"))
+            return {"status": "EVENT_RECEIVED"}
+        # unknown number: full path below (waba_id fallback, logging)
+
+    t = time.perf_counter()
+    resolved: dict[tuple, object] = {}  # (phone_number_id, waba_id) -> tenant
+    jobs = []
+    for unit in extract_units(payload):
+        key = (unit["phone_number_id"], unit["waba_id"])
+        if key not in resolved:
+            resolved[key] = await resolve_tenant(store, *key)
+        tenant = resolved[key]
+        if not tenant:
+            logger.error(
+                "Unknown phone_number_id=%s (waba_id=%s)",
+                unit["phone_number_id"],
+                unit["waba_id"],
+            )
+            continue
+        jobs.append(
+            {
+                "tenant_id": tenant.tenant_id,
+                "phone_number_id": tenant.phone_number_id,
+                "value": unit["value"],
+            }
+        )
+    metrics.observe(WEBHOOK_STAGE, t, ("tenant_lookup", "events"))
+
+    if not jobs:
+        metrics.inc(WEBHOOKS, ("ignored",))
         return {"status": "IGNORED"}  # don't 4xx to avoid webhook disablement
 
-    # Per-tenant signature verification (if app_secret present)
-    if tenant.app_secret:
-        if not compute_signature_ok(raw, x_hub_signature_256, tenant.app_secret):
+    # Per-tenant signature verification (if app_secret present); the signature
+    # covers the whole body, so every tenant in the batch must accept it
+    t = time.perf_counter()
+    verified = set()
+    for tenant in resolved.values():
+        if not tenant or not tenant.app_secret or tenant.tenant_id in verified:
+            continue
+        if not compute_signature_ok(raw, signature, tenant.app_secret):
+            metrics.inc(WEBHOOKS, ("forbidden",))
             raise HTTPException(status_code=403, detail="Invalid signature")
+        verified.add(tenant.tenant_id)
+    metrics.observe(WEBHOOK_STAGE, t, ("signature", "events"))
 
-    # Process in background (don’t block webhook)
-    background.add_task(process_events, tenant, payload)
+    # Enqueue one job per (tenant, change) and ack; consumers run process_events.
+    # A full queue doesn't hold the ack (Meta would retry and pile on): the job
+    # is dead-lettered instead, where it can be inspected and replayed.
+    t = time.perf_counter()
+    shed = 0
+    for job in jobs:
+        if await queue.try_put(job) is None:
+            shed += 1
+            metrics.inc(SHED_JOBS, (job["tenant_id"],))
+            await queue.dead_letter(Job(uuid.uuid4().hex, job), "queue full at ingest")
+    if shed:
+        logger.error(
+            "[queue] full: %s of %s webhook jobs dead-lettered",
+            shed,
+            len(jobs),
+        )
+    metrics.observe(WEBHOOK_STAGE, t, ("enqueue", "events"))
+    metrics.inc(WEBHOOKS, ("shed" if shed else "events",))
+    metrics.observe(WEBHOOK_STAGE, start, ("total", "events"))
     return {"status": "EVENT_RECEIVED"}
 
 
-async def process_events(tenant, payload: dict):
+async def process_job(store, job: dict):
     """
-    tenant: TenantConfig (Pydantic) – use attributes (tenant.phone_number_id, tenant.access_token)
+    Queue handler: re-resolves the tenant (config may have changed since enqueue)
+    and runs process_events. Raising makes the queue retry the job.
     """
-    value = payload["entry"][0]["changes"][0]["value"]
-    engine = await get_engine(
-        tenant.model_dump()
-    )  # pass as dict if your engine expects dict
-    client = get_client_for(tenant.phone_number_id, tenant.access_token)
+    tenant = store.resolve_for_send(job.get("tenant_id"), job.get("phone_number_id"))
+    if not tenant and job.get("phone_number_id"):
+        tenant = await store.get_by_phone_number_id(job["phone_number_id"])
+    if not tenant:
+        logger.error("[queue] dropping job for unknown tenant=%s", job.get("tenant_id"))
+        return
+    if "payload" in job:
+        # job enqueued before per-change fan-out: expand it here
+        for unit in extract_units(job["payload"]):
+            if unit["phone_number_id"] in (None, tenant.phone_number_id):
+                await process_events(tenant, unit["value"])
+        return
+    await process_events(tenant, job["value"])
+
+
+async def process_events(tenant, value: dict):
+    """
+    tenant: TenantConfig (Pydantic) – use attributes (tenant.phone_number_id, tenant.access_token)
+    value: one change's `value` object (see extract_units)
 
+    Messages are grouped by sender: each conversation is handled in order,
+    different conversations run concurrently.
+    """
+    start = time.perf_counter()
+    by_sender: dict[str, list[dict]] = {}
     for msg in value.get("messages", []):
-        wa_id = msg.get("from")
-        # optional: log raw types
-        await handle_message(value, msg)
-        reply_text = await engine.reply(tenant.model_dump(), msg)
-        if reply_text:
-            await client.send(wa_id, "text", {"body": reply_text})
+        by_sender.setdefault(msg.get("from"), []).append(msg)
+
+    results = []
+    if by_sender:
+        # warm, per-tenant engine (rebuilt only when tenant.engine changes)
+        tenant_cfg = tenant.as_dict
+        t = time.perf_counter()
+        engine = await engine_registry.get(tenant_cfg)
+        if admission.degraded:
+            # under load: rules replies instead of new LLM calls
+            cheap = await engine_registry.degraded(tenant_cfg)
+            if cheap is not None:
+                engine = cheap
+                admission.degraded_conversations += len(by_sender)
+                metrics.inc(DEGRADED, (tenant.tenant_id,), len(by_sender))
+        metrics.observe(PROCESS_STAGE, t, ("engine_lookup", tenant.tenant_id))
+        client = get_client_for(tenant.phone_number_id, tenant.access_token)
+        t = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                process_conversation(tenant_cfg, engine, client, value, wa_id, msgs)
+                for wa_id, msgs in by_sender.items()
+            ),
+            return_exceptions=True,
+        )
+        metrics.observe(PROCESS_STAGE, t, ("conversations", tenant.tenant_id))
 
     for status in value.get("statuses", []):
-        logger.info(f"[{tenant.tenant_id}] status: {status}")
+        await handle_status(tenant, status)
+    metrics.observe(PROCESS_STAGE, start, ("total", tenant.tenant_id))
+
+    # surface the first failure so the queue retries (dedup skips the rest)
+    for r in results:
+        if isinstance(r, BaseException):
+            raise r
+
+
+async def process_conversation(
+    tenant_cfg: dict, engine, client, value: dict, wa_id: str, msgs: list[dict]
+):
+    window, max_wait = coalesce_window(tenant_cfg)
+    if window > 0:
+        await coalesce_conversation(
+            tenant_cfg, engine, client, value, wa_id, msgs, window, max_wait
+        )
+        return
+    async with conversation_locks.hold((tenant_cfg["tenant_id"], wa_id)):
+        for msg in msgs:
+            msg_id = msg.get("id")
+            # Meta retries slow acks: drop repeats before any engine work
+            if msg_id and not await message_dedup.claim(msg_id):
+                logger.info(
+                    "[%s] duplicate message %s skipped",
+                    tenant_cfg["tenant_id"],
+                    msg_id,
+                    extra={"tenant_id": tenant_cfg["tenant_id"], "message_id": msg_id},
+                )
+                continue
+            try:
+                # optional: log raw types
+                await handle_message(value, msg, tenant_cfg["tenant_id"])
+                await attach_media(tenant_cfg, client, msg)
+                await reply_and_send(tenant_cfg, engine, client, wa_id, msg)
+            except BaseException:
+                # let the queue retry this message instead of treating it as seen
+                if msg_id:
+                    await message_dedup.release(msg_id)
+                raise
+            if msg_id:
+                await message_dedup.complete(msg_id)
+
+
+async def attach_media(tenant_cfg: dict, client, msg: dict):
+    """
+    Downloads an inbound image/audio/video/document/sticker and adds
+    "local_path" and "file_size" to msg[type] for the engine. A download that
+    fails (too large, Graph or network error) is logged and skipped: the
+    message is still answered, without the file.
+    """
+    msg_type = msg.get("type")
+    media = msg.get(msg_type) if msg_type in MEDIA_TYPES else None
+    if not media or not media.get("id") or not download_enabled(tenant_cfg):
+        return
+    try:
+        f = await media_store.download(
+            client,
+            tenant_cfg["tenant_id"],
+            media["id"],
+            media.get("mime_type"),
+            media.get("sha256"),
+        )
+    except Exception as e:
+        logger.warning(
+            "[%s] media %s not downloaded: %s: %s",
+            tenant_cfg["tenant_id"],
+            media["id"],
+            type(e).__name__,
+            e,
+            extra={"tenant_id": tenant_cfg["tenant_id"], "message_id": msg.get("id")},
+        )
+        return
+    media["local_path"] = f.path
+    media["file_size"] = f.size
+
+
+def engine_labels(tenant_cfg: dict, msg: dict) -> tuple[str, str, str]:
+    """(tenant, engine type, message type) metric labels."""
+    engine_type = (tenant_cfg.get("engine") or {}).get("type") or "unknown"
+    return tenant_cfg["tenant_id"], engine_type, msg.get("type") or "unknown"
+
+
+async def timed_reply(tenant_cfg: dict, engine, msg: dict) -> str | None:
+    """engine.reply, recorded in whatsapp_engine_reply_seconds."""
+    labels = engine_labels(tenant_cfg, msg)
+    start = time.perf_counter()
+    try:
+        reply_text = await engine.reply(tenant_cfg, msg)
+    except Exception:
+        metrics.observe(ENGINE_REPLY, start, (*labels, "error"))
+        raise
+    metrics.observe(ENGINE_REPLY, start, (*labels, "ok" if reply_text else "empty"))
+    return reply_text
+
+
+async def reply_and_send(tenant_cfg: dict, engine, client, wa_id: str, msg: dict):
+    """
+    Generates the reply to `msg` and sends it. Streaming engines send each
+    sentence/paragraph chunk as its own text as soon as it is complete.
+    """
+    if not engine.streaming:
+        reply_text = await timed_reply(tenant_cfg, engine, msg)
+        if reply_text:
+            await send_scheduler.send(
+                client, wa_id, "text", {"body": reply_text}, tenant=tenant_cfg
+            )
+        return
+    labels = engine_labels(tenant_cfg, msg)
+    chunks = chunk_stream(
+        engine.stream_reply(tenant_cfg, msg), min_chars=settings.STREAM_MIN_CHUNK_CHARS
+    )
+    start = time.perf_counter()
+    sent = 0
+    try:
+        async for chunk in chunks:
+            if not sent:
+                metrics.observe(ENGINE_FIRST_CHUNK, start, labels[:2])
+            await commit_batch()
+            await send_scheduler.send(
+                client, wa_id, "text", {"body": chunk}, tenant=tenant_cfg
+            )
+            sent += 1
+    except Exception as e:
+        metrics.observe(ENGINE_REPLY, start, (*labels, "error"))
+        if not sent:
+            raise
+        # part of the answer is out: a retry would repeat it
+        logger.error(
+            "[%s] streamed reply to %s cut after %s chunks: %s",
+            tenant_cfg["tenant_id"],
+            wa_id,
+            sent,
+            e,
+            extra={"tenant_id": tenant_cfg["tenant_id"], "message_id": msg.get("id")},
+        )
+        return
+    metrics.observe(ENGINE_REPLY, start, (*labels, "ok" if sent else "empty"))
+
+
+async def coalesce_conversation(
+    tenant_cfg: dict,
+    engine,
+    client,
+    value: dict,
+    wa_id: str,
+    msgs: list[dict],
+    window: float,
+    max_wait: float,
+):
+    """
+    Like process_conversation, but messages are handed to the reply coalescer:
+    a burst from the same user (across webhooks) gets one engine call and one
+    send. The coalescer orders work per conversation, so no lock is held.
+    """
+    tenant_id = tenant_cfg["tenant_id"]
+
+    async def generate(merged: dict):
+        if engine.streaming:
+            # sends its own chunks (commits the batch before the first one)
+            await reply_and_send(tenant_cfg, engine, client, wa_id, merged)
+            return None
+        return await timed_reply(tenant_cfg, engine, merged)
+
+    async def deliver(reply_text: str):
+        await send_scheduler.send(
+            client, wa_id, "text", {"body": reply_text}, tenant=tenant_cfg
+        )
+
+    key = (tenant_id, wa_id)
+    claimed: list[str | None] = []
+    replies: list[asyncio.Future] = []  # one per claimed message handed over
+    try:
+        for msg in msgs:
+            msg_id = msg.get("id")
+            if msg_id and not await message_dedup.claim(msg_id):
+                logger.info(
+                    "[%s] duplicate message %s skipped",
+                    tenant_id,
+                    msg_id,
+                    extra={"tenant_id": tenant_id, "message_id": msg_id},
+                )
+                continue
+            claimed.append(msg_id)
+            await handle_message(value, msg, tenant_id)
+            await attach_media(tenant_cfg, client, msg)
+            replies.append(
+                reply_coalescer.add(key, msg, generate, deliver, window, max_wait)
+            )
+        await asyncio.gather(*(asyncio.shield(fut) for fut in replies))
+    except BaseException:
+        for i, msg_id in enumerate(claimed):
+            fut = replies[i] if i < len(replies) else None
+            answered = False
+            if fut is not None and not fut.done():
+                # already in a batch that will reply: keep the claim so the
+                # queue's retry doesn't answer it a second time
+                answered = not reply_coalescer.withdraw(key, fut)
+            elif fut is not None:
+                answered = not fut.cancelled() and fut.exception() is None
+            if not msg_id:
+                continue
+            if answered:
+                await message_dedup.complete(msg_id)
+            else:
+                # let the queue retry this message instead of treating it as seen
+                await message_dedup.release(msg_id)
+        raise
+    for msg_id in claimed:
+        if msg_id:
+            await message_dedup.complete(msg_id)
 
 
-async def handle_message(context: dict, msg: dict):
+async def handle_message(context: dict, msg: dict, tenant_id: str | None = None):
     from_ = msg.get("from")
     msg_type = msg.get("type")
+    metrics.inc(MESSAGES, (tenant_id or "unknown", msg_type or "unknown"))
+    # message content: sampled / rate-limited as the "payload" log category
+    extra = {
+        "category": "payload",
+        "tenant_id": tenant_id,
+        "message_id": msg.get("id"),
+        "wa_id": from_,
+    }
 
     if msg_type == "text":
         body = msg["text"]["body"]
-        logger.info(f"[text] from {from_}: {body}")
+        logger.info("[text] from %s: %s", from_, body, extra=extra)
     elif msg_type in {"image", "audio", "video", "document", "sticker"}:
         media = msg[msg_type]
-        logger.info(f"[{msg_type}] from {from_}: {media}")
+        logger.info("[%s] from %s: %s", msg_type, from_, media, extra=extra)
     elif msg_type == "location":
         loc = msg["location"]
-        logger.info(f"[location] from {from_}: ({loc['latitude']}, {loc['longitude']})")
+        logger.info(
+            "[location] from %s: (%s, %s)",
+            from_,
+            loc["latitude"],
+            loc["longitude"],
+            extra=extra,
+        )
     elif msg_type == "contacts":
-        logger.info(f"[contacts] from {from_}: {msg['contacts']}")
+        logger.info("[contacts] from %s: %s", from_, msg["contacts"], extra=extra)
     elif msg_type == "interactive":
         i = msg["interactive"]
         if "button_reply" in i:
             br = i["button_reply"]
             logger.info(
-                f"[interactive-button] from {from_}: id={br['id']} title={br['title']}"
+                "[interactive-button] from %s: id=%s title=%s",
+                from_,
+                br["id"],
+                br["title"],
+                extra=extra,
             )
         elif "list_reply" in i:
             lr = i["list_reply"]
             logger.info(
-                f"[interactive-list] from {from_}: id={lr['id']} title={lr['title']}"
+                "[interactive-list] from %s: id=%s title=%s",
+                from_,
+                lr["id"],
+                lr["title"],
+                extra=extra,
             )
         else:
-            logger.info(f"[interactive] from {from_}: {i}")
+            logger.info("[interactive] from %s: %s", from_, i, extra=extra)
     else:
-        logger.info(f"[unknown] type={msg_type} full={msg}")
+        logger.info("[unknown] type=%s full=%s", msg_type, msg, extra=extra)
 
 
-async def handle_status(context: dict, status: dict):
-    logger.info(f"[status] {status}")
+async def handle_status(tenant, status: dict):
+    if status.get("status") == "failed":
+        logger.warning(
+            "[%s] delivery failed: %s",
+            tenant.tenant_id,
+            status,
+            extra={"tenant_id": tenant.tenant_id, "message_id": status.get("id")},
+        )
+    status_tracker.record_status(tenant.tenant_id, status)
+
+
+def handle_statuses(tenant, statuses: list[dict]):
+    """Fast path for status-only webhooks (no errors, see scan_status_only)."""
+    for status in statuses:
+        status_tracker.record_status(tenant.tenant_id, status)
 
 
 @router.post("/send")
@@ -152,14 +573,184 @@ async def send_message(request: Request, req: SendMessageRequest):
 
     client = get_client_for(tenant.phone_number_id, tenant.access_token)
     try:
-        result = await client.send(req.to, req.type, req.content)
+        result = await send_scheduler.send(
+            client, req.to, req.type, req.content, tenant=tenant.as_dict
+        )
         return {"ok": True, "tenant": tenant.tenant_id, "result": result}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+async def _read_ndjson_batch(
+    request: Request,
+) -> tuple[SendBatchRequest, RecipientSpool]:
+    """
+    NDJSON body: first line is the batch header (SendBatchRequest without
+    recipients), every following line is a recipient: "521..." or {"to": ...}.
+    Read chunk by chunk; recipient lines go to a RecipientSpool rather than a
+    list, so a large batch isn't held in memory.
+    """
+    header = None
+    buf = bytearray()
+    spool = RecipientSpool()
+    try:
+        async for chunk in request.stream():
+            if header is not None:
+                await spool.write(chunk)
+                continue
+            buf += chunk
+            while header is None and (end := buf.find(b"\n")) >= 0:
+                line = buf[:end]
+                del buf[: end + 1]
+                if line.strip():
+                    header = json.loads(line)
+            if header is not None:
+                await spool.write(bytes(buf))
+                buf.clear()
+        if header is None:
+            if not buf.strip():
+                raise HTTPException(status_code=400, detail="Empty NDJSON body")
+            header = json.loads(buf)
+        return SendBatchRequest.model_validate(header), spool
+    except BaseException:
+        spool.close()
+        raise
+
+
+@router.post("/send/batch")
+async def send_batch(request: Request, mode: str = Query("stream")):
+    """
+    Bulk send of one message to many recipients (JSON SendBatchRequest or NDJSON).
+    mode=stream: NDJSON response, one line per recipient then a summary line.
+    mode=job: returns {"job_id"}; poll GET /whatsapp/send/batch/{job_id}.
+    """
+    if mode not in ("stream", "job"):
+        raise HTTPException(status_code=400, detail="mode must be 'stream' or 'job'")
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            req, recipients = await _read_ndjson_batch(request)
+        else:
+            req = SendBatchRequest.model_validate(await request.json())
+            recipients = req.recipients
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    store = get_store(request)
+    tenant = store.resolve_for_send(req.tenant_id, req.phone_number_id)
+    if not tenant:
+        if isinstance(recipients, RecipientSpool):
+            recipients.close()
+        raise HTTPException(status_code=404, detail="Tenant not found")
+
+    client = get_client_for(tenant.phone_number_id, tenant.access_token)
+    job = BatchJob(tenant.tenant_id, req.type)
+    try:
+        batch_jobs.add(job)
+    except TooManyBatches as e:
+        if isinstance(recipients, RecipientSpool):
+            recipients.close()
+        raise HTTPException(status_code=429, detail=str(e))
+    batch = run_batch(
+        job, client, req.content, recipients, req.concurrency, tenant.as_dict
+    )
+
+    if mode == "job":
+        batch_jobs.start(job, batch)
+        return {"job_id": job.id, "status": job.status}
+
+    async def _ndjson():
+        async for result in batch:
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(
+        _ndjson(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Job-Id": job.id},
+    )
+
+
+@router.get("/send/batch/{job_id}")
+async def get_batch(job_id: str, failures: bool = Query(False)):
+    job = batch_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    result = job.summary()
+    if failures:
+        result["failures"] = job.failures
+    return result
+
+
+@router.get("/statuses")
+async def delivery_stats(tenant_id: str | None = Query(None)):
+    """Per-tenant status counts, failure codes and sent->delivered/read latency."""
+    return status_tracker.stats(tenant_id)
+
+
+@router.get("/statuses/{tenant_id}/{message_id}")
+async def delivery_state(tenant_id: str, message_id: str):
+    state = status_tracker.get(tenant_id, message_id)
+    if not state:
+        raise HTTPException(status_code=404, detail="Message not tracked")
+    return state
+
+
 @router.get("/_debug/tenants")
 async def debug_tenants(request: Request):
     store = get_store(request)
     phone_keys = list(getattr(store, "_by_phone_id", {}).keys())
-    return {"phone_ids": phone_keys}
+    return {"phone_ids": phone_keys, **store.stats()}
+
+
+@router.get("/_debug/queue")
+async def debug_queue(request: Request):
+    return await request.app.state.queue_consumers.stats()
+
+
+@router.get("/_debug/dedup")
+async def debug_dedup():
+    return message_dedup.stats()
+
+
+@router.get("/_debug/send-scheduler")
+async def debug_send_scheduler():
+    return send_scheduler.stats()
+
+
+@router.get("/_debug/engines")
+async def debug_engines():
+    return engine_registry.stats()
+
+
+@router.get("/_debug/fair-scheduler")
+async def debug_fair_scheduler():
+    return fair_scheduler.stats()
+
+
+@router.get("/_debug/breakers")
+async def debug_breakers():
+    return circuit_breakers.stats()
+
+
+@router.get("/_debug/reply-cache")
+async def debug_reply_cache(tenant_id: str | None = Query(None)):
+    return reply_cache.stats(tenant_id)
+
+
+@router.get("/_debug/memory")
+async def debug_memory():
+    return conversation_memory.stats()
+
+
+@router.get("/_debug/coalescer")
+async def debug_coalescer():
+    return reply_coalescer.stats()
+
+
+@router.get("/_debug/media")
+async def debug_media():
+    return {"inbound": media_store.stats(), "outbound": media_ids.stats()}
+
+
+@router.get("/_debug/logging")
+async def debug_logging():
+    return logger_stats()
@@ -15,7 +15,7 @@ MessageType = Literal[
 ]
 
 
-class SendMessageRequest(BaseModel):
+class TenantSelector(BaseModel):
     tenant_id: str | None = Field(
         default=None, description="Preferred way to select tenant"
     )
@@ -23,12 +23,30 @@ class SendMessageRequest(BaseModel):
         default=None, description="Alternative if no tenant_id"
     )
 
-    to: str = Field(..., description="Recipient in E.164 without +, e.g. 5218112345678")
-    type: MessageType
-    content: dict[str, Any]
-
     @model_validator(mode="after")
     def _require_tenant_hint(self):
         if not self.tenant_id and not self.phone_number_id:
             raise ValueError("Provide either tenant_id or phone_number_id")
         return self
+
+
+class SendMessageRequest(TenantSelector):
+    to: str = Field(..., description="Recipient in E.164 without +, e.g. 5218112345678")
+    type: MessageType
+    content: dict[str, Any]
+
+
+class BatchRecipient(BaseModel):
+    to: str
+    content: dict[str, Any] | None = Field(
+        default=None, description="Per-recipient content; replaces the batch content"
+    )
+
+
+class SendBatchRequest(TenantSelector):
+    type: MessageType
+    content: dict[str, Any]
+    recipients: list[str | BatchRecipient] = Field(
+        default_factory=list, description="Duplicates (same `to`) are sent once"
+    )
+    concurrency: int = Field(default=16, ge=1, le=256)
@@ -0,0 +1,202 @@
+"""
+Admission control. A sampler task measures event-loop lag, the default
+executor's backlog and engine calls in flight (or waiting for a slot), each
+as a fraction of its limit; the largest is the worker's `pressure`.
+
+  ok          pressure < 1
+  degraded    pressure >= 1: replies come from a RulesEngine instead of the
+              tenant's LLM (engine_registry.degraded), so no new LLM calls
+  overloaded  pressure >= ADMISSION_SHED_FACTOR: additionally only the first
+              ADMISSION_SHED_CONSUMERS queue consumers take new jobs (the rest
+              stay queued), and /ready answers 503
+
+Webhooks are acked in every state. A level is left only after pressure has
+stayed below ADMISSION_RECOVER_FACTOR x its threshold for ADMISSION_MIN_HOLD
+seconds, so the worker doesn't flap.
+"""
+
+from __future__ import annotations
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from core.config import settings
+from services.fair_scheduler import fair_scheduler
+from logger import logger
+
+OK, DEGRADED, OVERLOADED = 0, 1, 2
+LEVEL_NAMES = ("ok", "degraded", "overloaded")
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        enabled: bool = True,
+        interval: float = 0.1,
+        max_loop_lag: float = 0.2,
+        max_executor_queue: int = 64,
+        max_engine_calls: int = 256,
+        shed_factor: float = 2.0,
+        recover_factor: float = 0.7,
+        min_hold: float = 5.0,
+        shed_consumers: int = 2,
+    ):
+        self.enabled = enabled
+        self.interval = interval
+        self.max_loop_lag = max_loop_lag
+        self.max_executor_queue = max_executor_queue
+        self.max_engine_calls = max_engine_calls
+        self.shed_factor = shed_factor
+        self.recover_factor = recover_factor
+        self.min_hold = min_hold
+        self.shed_consumers = shed_consumers
+        self.level = OK
+        self.pressure = 0.0
+        self.loop_lag = 0.0  # seconds, smoothed
+        self.executor_queue = 0
+        self.engine_calls = 0
+        self.degraded_conversations = 0
+        self.deferred = 0  # consumers that waited for the overload to pass
+        self.transitions = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._below_since: Optional[float] = None
+        self._admitted = asyncio.Event()
+        self._admitted.set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def degraded(self) -> bool:
+        return self.level >= DEGRADED
+
+    @property
+    def overloaded(self) -> bool:
+        return self.level >= OVERLOADED
+
+    def _sample(self, lag: float):
+        # smoothed over ~1s of samples: a single stall (GC, first import of an
+        # SDK) shouldn't degrade the worker, sustained lag does
+        self.loop_lag = self.loop_lag * 0.7 + lag * 0.3
+        executor = self._executor
+        self.executor_queue = executor._work_queue.qsize() if executor else 0
+        pool = fair_scheduler.engine
+        self.engine_calls = pool.in_flight + pool.queued
+        self.pressure = max(
+            self.loop_lag / self.max_loop_lag if self.max_loop_lag > 0 else 0.0,
+            (
+                self.executor_queue / self.max_executor_queue
+                if self.max_executor_queue > 0
+                else 0.0
+            ),
+            (
+                self.engine_calls / self.max_engine_calls
+                if self.max_engine_calls > 0
+                else 0.0
+            ),
+        )
+        self._update(time.monotonic())
+
+    def _update(self, now: float):
+        target = OK
+        if self.pressure >= self.shed_factor:
+            target = OVERLOADED
+        elif self.pressure >= 1.0:
+            target = DEGRADED
+        if target > self.level:
+            self._set(target)
+            return
+        # step down one level once pressure has stayed well below its threshold
+        threshold = self.shed_factor if self.level == OVERLOADED else 1.0
+        if self.level == OK or self.pressure >= threshold * self.recover_factor:
+            self._below_since = None
+            return
+        if self._below_since is None:
+            self._below_since = now
+        elif now - self._below_since >= self.min_hold:
+            self._set(self.level - 1)
+
+    def _set(self, level: int):
+        previous, self.level = self.level, level
+        self._below_since = None
+        self.transitions += 1
+        if level == OVERLOADED:
+            self._admitted.clear()
+        else:
+            self._admitted.set()
+        log = logger.warning if level > previous else logger.info
+        log(
+            "[admission] %s -> %s (pressure=%.2f lag=%.0fms executor_queue=%s "
+            "engine_calls=%s)",
+            LEVEL_NAMES[previous],
+            LEVEL_NAMES[level],
+            self.pressure,
+            self.loop_lag * 1000,
+            self.executor_queue,
+            self.engine_calls,
+            extra={"category": "admission"},
+        )
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            try:
+                self._sample(max(loop.time() - expected, 0.0))
+            except Exception as e:
+                logger.error("[admission] sample failed: %s", e)
+
+    async def admit(self, consumer: int):
+        """Queue consumer gate: while overloaded, only the first few take jobs."""
+        if consumer < self.shed_consumers or self._admitted.is_set():
+            return
+        self.deferred += 1
+        await self._admitted.wait()
+
+    def start(self, executor: Optional[ThreadPoolExecutor] = None):
+        self._executor = executor
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.level = OK
+        self._admitted.set()
+
+    def stats(self) -> dict:
+        return {
+            "state": LEVEL_NAMES[self.level],
+            "pressure": round(self.pressure, 3),
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "executor_queue": self.executor_queue,
+            "engine_calls": self.engine_calls,
+            "limits": {
+                "loop_lag_ms": self.max_loop_lag * 1000,
+                "executor_queue": self.max_executor_queue,
+                "engine_calls": self.max_engine_calls,
+                "shed_factor": self.shed_factor,
+            },
+            "degraded_conversations": self.degraded_conversations,
+            "deferred": self.deferred,
+            "transitions": self.transitions,
+        }
+
+
+admission = AdmissionController(
+    enabled=settings.ADMISSION_ENABLED,
+    interval=settings.ADMISSION_SAMPLE_INTERVAL,
+    max_loop_lag=settings.ADMISSION_LOOP_LAG_MS / 1000,
+    max_executor_queue=settings.ADMISSION_EXECUTOR_QUEUE,
+    max_engine_calls=settings.ADMISSION_ENGINE_CALLS
+    or settings.FAIR_ENGINE_CONCURRENCY,
+    shed_factor=settings.ADMISSION_SHED_FACTOR,
+    recover_factor=settings.ADMISSION_RECOVER_FACTOR,
+    min_hold=settings.ADMISSION_MIN_HOLD,
+    shed_consumers=settings.ADMISSION_SHED_CONSUMERS,
+)
@@ -0,0 +1,272 @@
+from __future__ import annotations
+import asyncio
+import json
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterable, AsyncIterator, Iterable
+
+from services.send_scheduler import PRIORITY_BULK, send_scheduler
+from services.whatsapp_client import WhatsAppClient
+
+_DONE = object()
+
+
+class InvalidRecipient(ValueError):
+    """One recipient line/item that can't be sent to; the batch goes on."""
+
+
+class TooManyBatches(RuntimeError):
+    """Every slot of the BatchJobs registry holds a running batch."""
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return InvalidRecipient(f"invalid JSON: {e}")
+
+
+def _recipient(item: Any) -> tuple[str, dict | None]:
+    if isinstance(item, InvalidRecipient):
+        raise item
+    if isinstance(item, dict):
+        to, content = item.get("to"), item.get("content")
+        if content is not None and not isinstance(content, dict):
+            raise InvalidRecipient('"content" must be an object')
+    elif hasattr(item, "to"):
+        to, content = item.to, item.content
+    else:
+        to, content = item, None
+    if not isinstance(to, (str, int)) or isinstance(to, bool) or not str(to):
+        raise InvalidRecipient(f"not a recipient: {str(item)[:100]}")
+    return str(to), content
+
+
+def iter_recipients(items: Iterable[Any]) -> Iterable[tuple[str, dict | None]]:
+    """Accepts "521..." strings, {"to": ..., "content": ...} dicts or models."""
+    for item in items:
+        yield _recipient(item)
+
+
+async def _aiter(items: Iterable[Any] | AsyncIterable[Any]) -> AsyncIterator[Any]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class RecipientSpool:
+    """
+    Raw NDJSON recipient lines of a batch request in a temp file (in memory up
+    to `max_memory` bytes). The request body is read in full before the
+    response starts (the server stops delivering it after that); the batch
+    then parses the recipients back one chunk of lines at a time.
+    """
+
+    def __init__(self, max_memory: int = 1 << 20, chunk_size: int = 1 << 16):
+        self.chunk_size = chunk_size
+        self.size = 0
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self._buf = bytearray()
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def write(self, data: bytes):
+        self._buf += data
+        self.size += len(data)
+        if len(self._buf) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self):
+        if self._buf:
+            data, self._buf = bytes(self._buf), bytearray()
+            await self._run(self._file.write, data)
+
+    def close(self):
+        self._file.close()
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        """
+        Each non-blank line, JSON-decoded (an InvalidRecipient for a line that
+        isn't JSON); closes the spool when done.
+        """
+        try:
+            await self.flush()
+            await self._run(self._file.seek, 0)
+            buf = bytearray()
+            while chunk := await self._run(self._file.read, self.chunk_size):
+                buf += chunk
+                start = 0
+                while (end := buf.find(b"\n", start)) >= 0:
+                    line = buf[start:end]
+                    start = end + 1
+                    if line.strip():
+                        yield _parse_line(line)
+                del buf[:start]
+            if buf.strip():
+                yield _parse_line(buf)
+        finally:
+            self.close()
+
+
+class BatchJob:
+    """Progress of one batch send; only the first failures are kept in full."""
+
+    max_failures = 1000
+
+    def __init__(self, tenant_id: str, type_: str):
+        self.id = uuid.uuid4().hex
+        self.tenant_id = tenant_id
+        self.type = type_
+        self.status = "running"
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.invalid = 0  # recipients that couldn't be read (also in `failed`)
+        self.failures: list[dict] = []
+        self.task: asyncio.Task | None = None
+
+    def fail(self, failure: dict):
+        self.failed += 1
+        if len(self.failures) < self.max_failures:
+            self.failures.append(failure)
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.id,
+            "tenant": self.tenant_id,
+            "status": self.status,
+            "queued": self.queued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "elapsed_s": round((self.finished_at or time.time()) - self.created_at, 3),
+        }
+
+
+async def run_batch(
+    job: BatchJob,
+    client: WhatsAppClient,
+    content: dict[str, Any],
+    recipients: Iterable[Any] | AsyncIterable[Any],
+    concurrency: int = 16,
+    tenant: dict | None = None,
+) -> AsyncIterator[dict]:
+    """
+    Sends `content` to every unique recipient with at most `concurrency` sends
+    in flight (the send scheduler still applies per-number rate limits).
+    Yields one result dict per recipient, then the job summary.
+    A failed or malformed recipient is reported (malformed ones by their
+    1-based position: {"recipient": n, "ok": false, "error": ...}) and never
+    aborts the batch.
+    """
+    todo: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        seen: set[str] = set()
+        n = 0
+        async for item in _aiter(recipients):
+            n += 1
+            try:
+                to, override = _recipient(item)
+            except InvalidRecipient as e:
+                job.invalid += 1
+                failure = {"recipient": n, "ok": False, "error": str(e)}
+                job.fail(failure)
+                await results.put(failure)
+                continue
+            if to in seen:
+                job.duplicates += 1
+                continue
+            seen.add(to)
+            job.queued += 1
+            await todo.put((to, override or content))
+        for _ in range(concurrency):
+            await todo.put(_DONE)
+
+    async def work():
+        while (item := await todo.get()) is not _DONE:
+            to, body = item
+            try:
+                resp = await send_scheduler.send(
+                    client, to, job.type, body, priority=PRIORITY_BULK, tenant=tenant
+                )
+                job.sent += 1
+                message_id = ((resp or {}).get("messages") or [{}])[0].get("id")
+                await results.put({"to": to, "ok": True, "message_id": message_id})
+            except Exception as e:
+                failure = {"to": to, "ok": False, "error": str(e)}
+                job.fail(failure)
+                await results.put(failure)
+
+    async def drive():
+        try:
+            await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+        finally:
+            await results.put(_DONE)
+
+    driver = asyncio.create_task(drive())
+    try:
+        while (r := await results.get()) is not _DONE:
+            yield r
+        await driver  # re-raise producer errors (e.g. the spool can't be read)
+        job.status = "done"
+    except (GeneratorExit, asyncio.CancelledError):
+        # response stream closed by the client
+        job.status = "cancelled"
+        driver.cancel()
+        raise
+    except Exception:
+        job.status = "failed"
+        driver.cancel()
+        raise
+    finally:
+        job.finished_at = time.time()
+    yield {"done": True, **job.summary()}
+
+
+class BatchJobs:
+    """
+    Bounded registry of batch jobs for the polling API. Running batches are
+    never evicted: the oldest finished one makes room, and a new batch is
+    refused (TooManyBatches) while all `max_jobs` are running.
+    """
+
+    def __init__(self, max_jobs: int = 200):
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, BatchJob] = OrderedDict()
+
+    def add(self, job: BatchJob):
+        if len(self._jobs) >= self.max_jobs:
+            finished = next(
+                (k for k, j in self._jobs.items() if j.status != "running"), None
+            )
+            if finished is None:
+                raise TooManyBatches(f"{self.max_jobs} batches already running")
+            self._jobs.pop(finished)
+        self._jobs[job.id] = job
+
+    def get(self, job_id: str) -> BatchJob | None:
+        return self._jobs.get(job_id)
+
+    def start(self, job: BatchJob, batch: AsyncIterator[dict]):
+        """Drains `batch` in the background; `job` must be add()'ed already."""
+
+        async def _drain():
+            async for _ in batch:
+                pass
+
+        job.task = asyncio.create_task(_drain())
+
+
+batch_jobs = BatchJobs()
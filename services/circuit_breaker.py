@@ -0,0 +1,174 @@
+from __future__ import annotations
+import time
+from collections import deque
+
+from core.config import settings
+from logger import logger
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def counts_against_provider(exc: BaseException) -> bool:
+    """
+    Timeouts, connection errors, 5xx and 429 say the provider is unwell;
+    other 4xx (bad key, bad request) are the tenant's problem.
+    """
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500:
+        return status in (408, 429)
+    return True
+
+
+class CircuitBreaker:
+    """
+    Count-based breaker over the last `window` calls to one provider.
+
+    Opens once at least `min_calls` are in the window and either the failure
+    share reaches `error_rate` or the share of calls slower than `slow_call_s`
+    reaches `slow_rate`. While open, calls are rejected; after `cooldown`
+    seconds one probe call is let through (half-open) and its outcome closes
+    or re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call_s: float = 8.0,
+        slow_rate: float = 0.8,
+        cooldown: float = 30.0,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._window: deque[tuple[bool, bool]] = deque(maxlen=window)  # (failed, slow)
+        self._failed = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self.fallbacks = 0  # replies served by another engine after this one
+        self.hedges = 0  # secondary requests started while this one was slow
+        self.hedge_wins = 0  # ... that answered first
+
+    def allow(self) -> bool:
+        """Whether a call may start now; pair with record() or release()."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+        if self._probing:
+            self.rejected += 1
+            return False
+        self._probing = True
+        return True
+
+    def release(self):
+        """The call ended without a verdict (cancelled, or not the provider's fault)."""
+        self._probing = False
+
+    def record(self, ok: bool, latency: float):
+        self.calls += 1
+        slow = latency >= self.slow_call_s
+        if not ok:
+            self.failures += 1
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if ok and not slow:
+                self._close()
+            else:
+                self._open()
+            return
+        if len(self._window) == self._window.maxlen:
+            old_failed, old_slow = self._window[0]
+            self._failed -= old_failed
+            self._slow -= old_slow
+        self._window.append((not ok, slow))
+        self._failed += not ok
+        self._slow += slow
+        n = len(self._window)
+        if self.state == CLOSED and n >= self.min_calls:
+            if self._failed / n >= self.error_rate or self._slow / n >= self.slow_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        logger.warning(
+            "[breaker] %s open: %s/%s failed, %s/%s slow in window",
+            self.name,
+            self._failed,
+            len(self._window),
+            self._slow,
+            len(self._window),
+            extra={"provider": self.name},
+        )
+
+    def _close(self):
+        self.state = CLOSED
+        self._window.clear()
+        self._failed = self._slow = 0
+        logger.info("[breaker] %s closed", self.name, extra={"provider": self.name})
+
+    def stats(self) -> dict:
+        n = len(self._window)
+        return {
+            "state": self.state,
+            "window_calls": n,
+            "window_error_rate": round(self._failed / n, 3) if n else 0.0,
+            "window_slow_rate": round(self._slow / n, 3) if n else 0.0,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": (
+                round(self.fallbacks / (self.calls + self.rejected), 3)
+                if self.calls + self.rejected
+                else 0.0
+            ),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+class CircuitBreakers:
+    """One breaker per provider ("mistral", "openai", ...), shared by all tenants."""
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, provider: str) -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers[provider] = CircuitBreaker(
+                provider,
+                window=settings.ENGINE_BREAKER_WINDOW,
+                min_calls=settings.ENGINE_BREAKER_MIN_CALLS,
+                error_rate=settings.ENGINE_BREAKER_ERROR_RATE,
+                slow_call_s=settings.ENGINE_BREAKER_SLOW_CALL_MS / 1000,
+                slow_rate=settings.ENGINE_BREAKER_SLOW_RATE,
+                cooldown=settings.ENGINE_BREAKER_COOLDOWN,
+            )
+        return breaker
+
+    def stats(self) -> dict:
+        return {name: b.stats() for name, b in self._breakers.items()}
+
+
+circuit_breakers = CircuitBreakers()
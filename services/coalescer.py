@@ -0,0 +1,233 @@
+from __future__ import annotations
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Hashable, Optional
+
+from core.config import settings
+
+Generate = Callable[[dict], Awaitable[Optional[str]]]
+Deliver = Callable[[str], Awaitable[object]]
+
+
+def coalesce_window(tenant_cfg: dict) -> tuple[float, float]:
+    """(quiet window, max wait) in seconds from engine.config, else settings."""
+    cfg = (tenant_cfg.get("engine") or {}).get("config") or {}
+    window = cfg.get("coalesce_window_ms", settings.COALESCE_WINDOW_MS)
+    max_wait = cfg.get("coalesce_max_wait_ms", settings.COALESCE_MAX_WAIT_MS)
+    return float(window) / 1000, float(max_wait) / 1000
+
+
+class _Batch:
+    __slots__ = ("conv", "task", "committed", "locked")
+
+    def __init__(self, conv: "_Conversation", task: asyncio.Task):
+        self.conv = conv
+        self.task = task
+        self.committed = False
+        self.locked = False
+
+    async def commit(self):
+        """Final from here on: not cancelled by new messages, sends in order."""
+        if self.committed:
+            return
+        self.committed = True
+        if self.conv.task is self.task:
+            self.conv.task = None
+        await self.conv.send_lock.acquire()
+        self.locked = True
+
+
+_current_batch: ContextVar[Optional[_Batch]] = ContextVar(
+    "coalesced_batch", default=None
+)
+
+
+async def commit_batch():
+    """
+    Called by a generate() that sends on its own (e.g. streamed chunks) before
+    its first send. No-op outside the coalescer.
+    """
+    batch = _current_batch.get()
+    if batch is not None:
+        await batch.commit()
+
+
+def merge_messages(msgs: list[dict]) -> dict:
+    """One message carrying the text of all `msgs` (newline-joined)."""
+    if len(msgs) == 1:
+        return msgs[0]
+    texts = [
+        m["text"]["body"]
+        for m in msgs
+        if m.get("type") == "text" and (m.get("text") or {}).get("body")
+    ]
+    if not texts:
+        return msgs[-1]
+    merged = {**msgs[-1], "type": "text", "text": {"body": "\n".join(texts)}}
+    merged["coalesced_ids"] = [m.get("id") for m in msgs]
+    return merged
+
+
+class _Conversation:
+    __slots__ = ("items", "first_at", "batch_first_at", "task", "waiting", "send_lock")
+
+    def __init__(self):
+        self.items: list[tuple[dict, asyncio.Future]] = []
+        self.first_at = 0.0
+        self.batch_first_at = 0.0  # first_at of the batch being generated
+        # the batch still open to new messages (sleeping or generating)
+        self.task: Optional[asyncio.Task] = None
+        self.waiting = False  # task hasn't taken the items yet
+        self.send_lock = asyncio.Lock()
+
+
+class ReplyCoalescer:
+    """
+    Per-conversation debounce in front of ResponseEngine.reply.
+
+    Messages submitted for the same key wait until the conversation has been
+    quiet for `window` seconds (at most `max_wait` after the first one), then
+    are merged into one message, answered with one engine call and one send.
+    A message arriving while the reply is still being generated cancels that
+    generation (until the batch is `max_wait` old); its messages are answered
+    together with the new one. Replies already being sent are never
+    cancelled, and sends stay in order.
+    """
+
+    def __init__(self):
+        self._conversations: dict[Hashable, _Conversation] = {}
+        self.batches = 0
+        self.messages = 0
+        self.cancelled = 0
+
+    async def submit(
+        self,
+        key: Hashable,
+        msg: dict,
+        generate: Generate,
+        deliver: Deliver,
+        window: float,
+        max_wait: float,
+    ) -> Optional[str]:
+        """Resolves with the reply sent for the batch `msg` ended up in."""
+        fut = self.add(key, msg, generate, deliver, window, max_wait)
+        return await asyncio.shield(fut)
+
+    def add(
+        self,
+        key: Hashable,
+        msg: dict,
+        generate: Generate,
+        deliver: Deliver,
+        window: float,
+        max_wait: float,
+    ) -> asyncio.Future:
+        """submit() without waiting: the future resolves like submit()."""
+        conv = self._conversations.get(key)
+        if conv is None:
+            conv = self._conversations[key] = _Conversation()
+        now = time.monotonic()
+        if not conv.items:
+            conv.first_at = now
+        fut = asyncio.get_running_loop().create_future()
+        conv.items.append((msg, fut))
+        self.messages += 1
+
+        task = conv.task
+        if task and not task.done():
+            # restart with the new message included, unless the running
+            # generation has already waited max_wait (it finishes; this
+            # message starts the next batch)
+            if conv.waiting or now - conv.batch_first_at < max_wait:
+                task.cancel()
+        delay = max(0.0, min(window, conv.first_at + max_wait - now))
+        self._schedule(key, conv, delay, generate, deliver)
+        return fut
+
+    def withdraw(self, key: Hashable, fut: asyncio.Future) -> bool:
+        """
+        Takes the message behind `fut` (from add()) out of the conversation if
+        no batch has picked it up yet, and cancels `fut`. False if a batch
+        already has it: that batch answers it.
+        """
+        conv = self._conversations.get(key)
+        if conv is None:
+            return False
+        for i, (_, item_fut) in enumerate(conv.items):
+            if item_fut is fut:
+                del conv.items[i]
+                self.messages -= 1
+                fut.cancel()
+                return True
+        return False
+
+    def _schedule(self, key, conv: _Conversation, delay: float, generate, deliver):
+        conv.waiting = True
+        conv.task = asyncio.create_task(self._run(key, conv, delay, generate, deliver))
+
+    async def _run(
+        self,
+        key: Hashable,
+        conv: _Conversation,
+        delay: float,
+        generate: Generate,
+        deliver: Deliver,
+    ):
+        me = asyncio.current_task()
+        batch = _Batch(conv, me)
+        _current_batch.set(batch)
+        items: list[tuple[dict, asyncio.Future]] = []
+        try:
+            await asyncio.sleep(delay)
+            if conv.task is me:
+                conv.waiting = False
+            conv.batch_first_at = conv.first_at
+            items, conv.items = conv.items, []
+            if not items:
+                return
+            reply = await generate(merge_messages([m for m, _ in items]))
+            # the batch is final now: later messages start a new one
+            await batch.commit()
+            if reply:
+                await deliver(reply)
+            self.batches += 1
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_result(reply)
+        except asyncio.CancelledError:
+            if items and not batch.committed:
+                # superseded by a newer message: answer these with it
+                self.cancelled += 1
+                conv.items[:0] = items
+                conv.first_at = conv.batch_first_at
+                if not (conv.task and conv.waiting):
+                    self._schedule(key, conv, 0.0, generate, deliver)
+            else:
+                for _, fut in items:
+                    if not fut.done():
+                        fut.cancel()
+            raise
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            if batch.locked:
+                conv.send_lock.release()
+            if conv.task is me:
+                conv.task = None
+            if not conv.items and conv.task is None and not conv.send_lock.locked():
+                self._conversations.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "pending_conversations": len(self._conversations),
+            "messages": self.messages,
+            "batches": self.batches,
+            "engine_calls_saved": max(0, self.messages - self.batches),
+            "cancelled_generations": self.cancelled,
+        }
+
+
+reply_coalescer = ReplyCoalescer()
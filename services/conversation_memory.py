@@ -0,0 +1,270 @@
+from __future__ import annotations
+import asyncio
+import json
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from core.config import settings
+from logger import logger
+
+USER, ASSISTANT = 0, 1
+_ROLES = ("user", "assistant")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 chars per token for Latin-script text; good enough for budgeting
+    return len(text) // 4 + 1
+
+
+class _Conversation:
+    __slots__ = ("turns", "tokens", "summary", "last_used")
+
+    def __init__(self, max_turns: int):
+        self.turns: deque[tuple[int, str]] = deque(maxlen=max_turns)
+        self.tokens = 0
+        self.summary = ""
+        self.last_used = time.monotonic()
+
+    def dump(self) -> str:
+        return json.dumps(
+            {"s": self.summary, "t": list(self.turns)}, ensure_ascii=False
+        )
+
+
+class ConversationMemory:
+    """
+    Recent turns per (tenant_id, wa_id), for LLM context.
+
+    - Each conversation is a ring of at most `max_turns` (role, text) tuples,
+      texts clipped to `max_chars`.
+    - When the turns exceed `max_tokens`, the oldest are folded into a short
+      rolling digest (first words of each, capped at `summary_chars`).
+    - At most `max_conversations` stay in memory (LRU); conversations idle for
+      `idle_ttl` seconds are dropped first. With `spill_path`, dropped
+      conversations go to SQLite and are loaded back on their next message;
+      rows untouched for `retention` seconds are purged.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 12,
+        max_tokens: int = 1200,
+        max_chars: int = 1000,
+        summary_chars: int = 400,
+        max_conversations: int = 20000,
+        idle_ttl: float = 3600.0,
+        spill_path: str | None = None,
+        retention: float = 7 * 86400.0,
+        spill_batch: int = 256,
+    ):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.max_chars = max_chars
+        self.summary_chars = summary_chars
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self.spill_path = spill_path
+        self.retention = retention
+        self._hot: OrderedDict[tuple[str, str], _Conversation] = OrderedDict()
+        # evicted, not yet written; still served from here
+        self._pending: dict[tuple[str, str], _Conversation] = {}
+        self.spill_batch = spill_batch
+        self._io: ThreadPoolExecutor | None = None
+        self._conn: sqlite3.Connection | None = None
+        if spill_path:
+            # one thread: spills and loads for the same key stay ordered
+            self._io = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="conv-spill"
+            )
+        self.evicted = 0
+        self.spilled = 0
+        self.restored = 0
+
+    # --- SQLite spill (runs on self._io) ---
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.spill_path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations (tenant_id TEXT, wa_id TEXT, "
+                "data TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (tenant_id, wa_id))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS conversations_updated "
+                "ON conversations (updated_at)"
+            )
+            conn.execute(
+                "DELETE FROM conversations WHERE updated_at < ?",
+                (time.time() - self.retention,),
+            )
+            self._conn = conn
+        return self._conn
+
+    def _spill_sync(self, rows: list[tuple[str, str, str, float]]):
+        try:
+            self._db().executemany(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?)", rows
+            )
+        except sqlite3.Error as e:
+            logger.error("[memory] spill of %s conversations failed: %s", len(rows), e)
+
+    def _load_sync(self, key: tuple[str, str]) -> Optional[str]:
+        db = self._db()
+        row = db.execute(
+            "SELECT data FROM conversations WHERE tenant_id = ? AND wa_id = ?", key
+        ).fetchone()
+        if row:
+            db.execute(
+                "DELETE FROM conversations WHERE tenant_id = ? AND wa_id = ?", key
+            )
+        return row[0] if row else None
+
+    def _close_sync(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _spill(self, items: list[tuple[tuple[str, str], _Conversation]]):
+        """Queues evicted conversations; written to SQLite in batches."""
+        if self._io is None:
+            return
+        for key, conv in items:
+            if conv.turns or conv.summary:
+                self._pending[key] = conv
+        if len(self._pending) >= self.spill_batch:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        now = time.time()
+        rows = [(k[0], k[1], c.dump(), now) for k, c in self._pending.items()]
+        self._pending.clear()
+        self.spilled += len(rows)
+        self._io.submit(self._spill_sync, rows)
+
+    # --- hot set ---
+
+    def _evict(self):
+        dropped = []
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._hot:
+            key, conv = next(iter(self._hot.items()))
+            if len(self._hot) <= self.max_conversations and conv.last_used >= cutoff:
+                break
+            self._hot.popitem(last=False)
+            dropped.append((key, conv))
+        self.evicted += len(dropped)
+        self._spill(dropped)
+
+    async def _get(self, key: tuple[str, str], create: bool) -> Optional[_Conversation]:
+        conv = self._hot.get(key) or self._pending.pop(key, None)
+        if conv is not None:
+            self._hot[key] = conv
+        elif self._io is not None:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self._io, self._load_sync, key)
+            conv = self._hot.get(key)  # may have been created meanwhile
+            if conv is None and data:
+                conv = _Conversation(self.max_turns)
+                raw = json.loads(data)
+                conv.summary = raw.get("s") or ""
+                for role, text in raw.get("t") or []:
+                    conv.turns.append((role, text))
+                    conv.tokens += estimate_tokens(text)
+                self._hot[key] = conv
+                self.restored += 1
+        if conv is None and create:
+            conv = self._hot[key] = _Conversation(self.max_turns)
+        if conv is not None:
+            conv.last_used = time.monotonic()
+            self._hot.move_to_end(key)
+        return conv
+
+    def _fold(self, conv: _Conversation):
+        role, text = conv.turns.popleft()
+        conv.tokens -= estimate_tokens(text)
+        words = " ".join(text.split()[:12])
+        parts = [conv.summary] if conv.summary else []
+        parts.append(f"{_ROLES[role]}: {words}")
+        digest = " | ".join(parts)
+        # keep the most recent part of the digest
+        start = max(0, len(digest) - self.summary_chars)
+        conv.summary = digest[start:]
+
+    # --- API ---
+
+    async def append(self, tenant_id: str, wa_id: str, role: int, text: str):
+        if not text:
+            return
+        text = text[: self.max_chars]
+        conv = await self._get((str(tenant_id), str(wa_id)), create=True)
+        if len(conv.turns) == self.max_turns:
+            self._fold(conv)
+        conv.turns.append((role, text))
+        conv.tokens += estimate_tokens(text)
+        while conv.tokens > self.max_tokens and len(conv.turns) > 1:
+            self._fold(conv)
+        self._evict()
+
+    async def history(self, tenant_id: str, wa_id: str) -> list[dict]:
+        """Chat messages ({"role", "content"}) oldest first; digest first if any."""
+        conv = await self._get((str(tenant_id), str(wa_id)), create=False)
+        if conv is None:
+            return []
+        out = []
+        if conv.summary:
+            out.append(
+                {
+                    "role": "system",
+                    "content": f"Earlier in this conversation: {conv.summary}",
+                }
+            )
+        out.extend({"role": _ROLES[r], "content": t} for r, t in conv.turns)
+        return out
+
+    async def clear(self, tenant_id: str, wa_id: str):
+        key = (str(tenant_id), str(wa_id))
+        self._hot.pop(key, None)
+        self._pending.pop(key, None)
+        if self._io is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                self._io, self._load_sync, key
+            )
+
+    def stats(self) -> dict:
+        return {
+            "conversations": len(self._hot),
+            "max_conversations": self.max_conversations,
+            "evicted": self.evicted,
+            "spilled": self.spilled,
+            "spill_pending": len(self._pending),
+            "restored": self.restored,
+            "spill_path": self.spill_path,
+        }
+
+    async def close(self):
+        """Spills the hot set (if spilling is enabled) and waits for pending writes."""
+        if self._io is None:
+            return
+        self._spill(list(self._hot.items()))
+        self._hot.clear()
+        self._flush_pending()
+        await asyncio.get_running_loop().run_in_executor(self._io, self._close_sync)
+        self._io.shutdown(wait=True)
+
+
+conversation_memory = ConversationMemory(
+    max_turns=settings.MEMORY_MAX_TURNS,
+    max_tokens=settings.MEMORY_MAX_TOKENS,
+    max_chars=settings.MEMORY_MAX_CHARS,
+    max_conversations=settings.MEMORY_MAX_CONVERSATIONS,
+    idle_ttl=settings.MEMORY_IDLE_TTL,
+    spill_path=settings.MEMORY_SPILL_PATH,
+)
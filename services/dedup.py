@@ -0,0 +1,256 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import math
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import settings
+
+
+class MessageDeduplicator(ABC):
+    """
+    Seen-set for inbound WhatsApp message IDs (wamid...).
+
+    claim(id) returns True the first time an ID is seen within the window and
+    False for repeats. Once the message is handled, complete(id); if processing
+    fails, release(id) forgets the claim so the queue's retry is not dropped as
+    a duplicate.
+    """
+
+    @abstractmethod
+    async def claim(self, message_id: str) -> bool: ...
+
+    async def complete(self, message_id: str) -> None:
+        return None
+
+    async def release(self, message_id: str) -> None:
+        return None
+
+    def stats(self) -> dict:
+        return {}
+
+
+class NoDedup(MessageDeduplicator):
+    async def claim(self, message_id: str) -> bool:
+        return True
+
+
+class LRUDedup(MessageDeduplicator):
+    """Per-process LRU with TTL. O(1) claim; memory bounded by max_entries."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._seen: OrderedDict[str, float] = OrderedDict()  # id -> expires_at
+        self.duplicates = 0
+
+    async def claim(self, message_id: str) -> bool:
+        now = time.monotonic()
+        expires = self._seen.get(message_id)
+        if expires is not None and expires > now:
+            self.duplicates += 1
+            return False
+        self._seen[message_id] = now + self.ttl
+        self._seen.move_to_end(message_id)
+        # insertion order == expiry order (constant ttl), so trim from the front
+        while self._seen:
+            oldest_id, oldest_exp = next(iter(self._seen.items()))
+            if oldest_exp > now and len(self._seen) <= self.max_entries:
+                break
+            self._seen.pop(oldest_id)
+        return True
+
+    async def release(self, message_id: str) -> None:
+        self._seen.pop(message_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "size": len(self._seen),
+            "duplicates": self.duplicates,
+        }
+
+
+class RotatingBloomDedup(MessageDeduplicator):
+    """
+    Two Bloom filters, each covering ttl/2; the older one is dropped on rotation,
+    so an ID is remembered for between ttl/2 and ttl. Fixed memory regardless of
+    volume; false positives (a new message dropped) occur at ~error_rate.
+    Bloom filters cannot forget, so an ID is only added on complete(); until
+    then it is held in an in-flight set that release() removes it from.
+    """
+
+    def __init__(self, ttl: float, capacity: int, error_rate: float):
+        self.window = ttl / 2
+        self.m = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self._current = bytearray((self.m + 7) // 8)
+        self._previous = bytearray((self.m + 7) // 8)
+        self._rotated_at = time.monotonic()
+        self._in_flight: set[str] = set()
+        self.duplicates = 0
+
+    def _positions(self, message_id: str) -> list[int]:
+        digest = hashlib.blake2b(message_id.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    @staticmethod
+    def _has(bits: bytearray, positions: list[int]) -> bool:
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    async def claim(self, message_id: str) -> bool:
+        now = time.monotonic()
+        if now - self._rotated_at >= self.window:
+            self._previous = self._current
+            self._current = bytearray(len(self._previous))
+            self._rotated_at = now
+        if message_id in self._in_flight:
+            self.duplicates += 1
+            return False
+        positions = self._positions(message_id)
+        if self._has(self._current, positions) or self._has(self._previous, positions):
+            self.duplicates += 1
+            return False
+        self._in_flight.add(message_id)
+        return True
+
+    async def complete(self, message_id: str) -> None:
+        if message_id in self._in_flight:
+            self._in_flight.discard(message_id)
+            for p in self._positions(message_id):
+                self._current[p >> 3] |= 1 << (p & 7)
+
+    async def release(self, message_id: str) -> None:
+        self._in_flight.discard(message_id)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "bloom",
+            "bits": self.m,
+            "hashes": self.k,
+            "in_flight": len(self._in_flight),
+            "duplicates": self.duplicates,
+        }
+
+
+class SQLiteDedup(MessageDeduplicator):
+    """
+    Seen-set in a SQLite (WAL) file shared by all gunicorn workers on a host.
+    INSERT OR IGNORE makes claim atomic across processes.
+
+    A claim is a lease of `lease` seconds until complete() marks the message
+    done (kept for `ttl`): if the worker dies in between, the queue's
+    redelivery can claim it again once the lease has run out.
+    """
+
+    def __init__(
+        self, path: str, ttl: float, lease: float = 120.0, purge_every: int = 1000
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.lease = lease
+        self.purge_every = purge_every
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-dedup")
+        self._conn: sqlite3.Connection | None = None
+        self._claims = 0
+        self.duplicates = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_messages "
+                "(id TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS seen_expires ON seen_messages (expires_at)"
+            )
+            columns = {
+                row[1] for row in conn.execute("PRAGMA table_info(seen_messages)")
+            }
+            if "done" not in columns:
+                # files from before leases: their rows count as done
+                conn.execute(
+                    "ALTER TABLE seen_messages ADD COLUMN done INTEGER NOT NULL DEFAULT 1"
+                )
+            self._conn = conn
+        return self._conn
+
+    def _claim_sync(self, message_id: str, now: float) -> bool:
+        db = self._db()
+        self._claims += 1
+        if self._claims % self.purge_every == 0:
+            db.execute("DELETE FROM seen_messages WHERE expires_at <= ?", (now,))
+        # an expired row (done past its ttl, or a lapsed claim) counts as unseen
+        db.execute(
+            "DELETE FROM seen_messages WHERE id = ? AND expires_at <= ?",
+            (message_id, now),
+        )
+        cur = db.execute(
+            "INSERT OR IGNORE INTO seen_messages (id, expires_at, done) VALUES (?, ?, 0)",
+            (message_id, now + self.lease),
+        )
+        return cur.rowcount == 1
+
+    def _complete_sync(self, message_id: str, now: float):
+        self._db().execute(
+            "UPDATE seen_messages SET done = 1, expires_at = ? WHERE id = ?",
+            (now + self.ttl, message_id),
+        )
+
+    def _release_sync(self, message_id: str):
+        self._db().execute("DELETE FROM seen_messages WHERE id = ?", (message_id,))
+
+    async def claim(self, message_id: str) -> bool:
+        loop = asyncio.get_running_loop()
+        fresh = await loop.run_in_executor(
+            self._io, self._claim_sync, message_id, time.time()
+        )
+        if not fresh:
+            self.duplicates += 1
+        return fresh
+
+    async def complete(self, message_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._io, self._complete_sync, message_id, time.time()
+        )
+
+    async def release(self, message_id: str) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._io, self._release_sync, message_id)
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "path": self.path, "duplicates": self.duplicates}
+
+
+def build_dedup() -> MessageDeduplicator:
+    backend = settings.DEDUP_BACKEND
+    if backend == "memory":
+        return LRUDedup(settings.DEDUP_TTL_SECONDS, settings.DEDUP_MAX_ENTRIES)
+    if backend == "bloom":
+        return RotatingBloomDedup(
+            settings.DEDUP_TTL_SECONDS,
+            settings.DEDUP_BLOOM_CAPACITY,
+            settings.DEDUP_BLOOM_ERROR_RATE,
+        )
+    if backend == "sqlite":
+        return SQLiteDedup(
+            settings.DEDUP_SQLITE_PATH,
+            settings.DEDUP_TTL_SECONDS,
+            lease=settings.DEDUP_CLAIM_LEASE,
+        )
+    if backend == "none":
+        return NoDedup()
+    raise ValueError(f"Unsupported dedup backend: {backend}")
+
+
+message_dedup = build_dedup()
@@ -0,0 +1,64 @@
+"""
+Engine type -> implementation, imported on first use.
+
+Provider SDKs (openai, langchain + mistralai) cost seconds of import time and
+tens of MB per process; a worker only pays for the types its tenants use.
+This module imports nothing from the app, so gunicorn.conf.py can preload
+SDKs in the master (see preload_sdks) without starting app threads.
+"""
+
+from __future__ import annotations
+import asyncio
+import importlib
+import time
+from typing import Any
+
+# type -> ("module:Class", SDK modules worth preloading in the gunicorn master)
+ENGINE_BACKENDS: dict[str, tuple[str, tuple[str, ...]]] = {
+    "rules": ("services.engines.rules_engine:RulesEngine", ()),
+    "openai": ("services.engines.openai_engine:OpenAIEngine", ("openai",)),
+    "azure_openai": (
+        "services.engines.openai_engine:AzureOpenAIEngine",
+        ("openai",),
+    ),
+    "mistral": (
+        "services.engines.mistral_engine:MistralLangChainEngine",
+        ("langchain_core.prompts", "langchain_mistralai.chat_models"),
+    ),
+}
+
+_classes: dict[str, Any] = {}
+import_times: dict[str, float] = {}  # type -> seconds spent importing it
+
+
+def _import(etype: str):
+    target, _ = ENGINE_BACKENDS[etype]
+    module_name, _, attr = target.partition(":")
+    start = time.perf_counter()
+    cls = getattr(importlib.import_module(module_name), attr)
+    import_times[etype] = round(time.perf_counter() - start, 3)
+    return cls
+
+
+async def load_backend(etype: str):
+    """Engine class for `etype`; the first import runs off the event loop."""
+    cls = _classes.get(etype)
+    if cls is None:
+        if etype not in ENGINE_BACKENDS:
+            raise ValueError(f"Unsupported engine type: {etype}")
+        cls = _classes[etype] = await asyncio.to_thread(_import, etype)
+    return cls
+
+
+def loaded_backends() -> dict[str, float]:
+    return dict(import_times)
+
+
+def preload_sdks(types: list[str]) -> list[str]:
+    """Imports the provider SDKs of `types` (e.g. in the gunicorn master)."""
+    loaded = []
+    for etype in types:
+        for module_name in ENGINE_BACKENDS.get(etype, ("", ()))[1]:
+            importlib.import_module(module_name)
+            loaded.append(module_name)
+    return loaded
@@ -1,6 +1,38 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
+
+from services.conversation_memory import ASSISTANT, USER, conversation_memory
 
 
 class ResponseEngine(ABC):
+    # LLM engines set this from their config ("history": true by default)
+    use_history: bool = False
+    # send replies in chunks as they are generated (engine config "stream")
+    streaming: bool = False
+
     @abstractmethod
     async def reply(self, tenant_cfg: dict, message: dict) -> str | None: ...
+
+    async def stream_reply(self, tenant_cfg: dict, message: dict) -> AsyncIterator[str]:
+        """Reply text deltas as they are generated; by default the whole reply."""
+        reply = await self.reply(tenant_cfg, message)
+        if reply:
+            yield reply
+
+    async def history(self, tenant_cfg: dict, message: dict) -> list[dict]:
+        """Earlier turns of this conversation as {"role", "content"} dicts."""
+        if not self.use_history or not message.get("from"):
+            return []
+        return await conversation_memory.history(
+            tenant_cfg["tenant_id"], message["from"]
+        )
+
+    async def remember(
+        self, tenant_cfg: dict, message: dict, text: str, reply: str | None
+    ):
+        if not self.use_history or not message.get("from"):
+            return
+        tenant_id, wa_id = tenant_cfg["tenant_id"], message["from"]
+        await conversation_memory.append(tenant_id, wa_id, USER, text)
+        if reply:
+            await conversation_memory.append(tenant_id, wa_id, ASSISTANT, reply)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, AsyncIterator, Optional
+
+from .base import ResponseEngine
+from core.config import settings
+from services.reply_cache import fuzzy_key, normalize_text, reply_cache
+
+
+class CachedEngine(ResponseEngine):
+    """
+    Serves repeated questions from the reply cache in front of `inner`.
+
+    Opt-in per tenant with engine.config "cache": true, or a dict:
+      - ttl: seconds a reply stays cached (REPLY_CACHE_TTL)
+      - fuzzy: also match on order-insensitive normalized tokens (false)
+      - max_chars: longer messages are never cached (REPLY_CACHE_MAX_CHARS)
+      - context: "bypass" (default) skips the cache once the conversation has
+        history, so answers that depend on earlier turns aren't reused;
+        "ignore" caches regardless
+    Only text messages are cached. Concurrent misses for the same key share
+    one engine call.
+    """
+
+    def __init__(
+        self, inner: ResponseEngine, fingerprint: str, cache_cfg: dict[str, Any]
+    ):
+        self.inner = inner
+        self.fingerprint = fingerprint
+        self.ttl = float(cache_cfg.get("ttl", settings.REPLY_CACHE_TTL))
+        self.fuzzy = bool(cache_cfg.get("fuzzy", False))
+        self.max_chars = int(cache_cfg.get("max_chars", settings.REPLY_CACHE_MAX_CHARS))
+        self.bypass_with_context = cache_cfg.get("context", "bypass") != "ignore"
+        self.use_history = inner.use_history
+        self.streaming = inner.streaming
+        self._inflight: dict[tuple[str, str, str], asyncio.Future] = {}
+
+    async def _keys(self, tenant_cfg: dict, message: dict) -> Optional[list]:
+        """Cache keys to try for `message`, or None to go straight to the engine."""
+        text = (message.get("text") or {}).get("body")
+        if not text or len(text) > self.max_chars:
+            return None
+        tenant_id = str(tenant_cfg["tenant_id"])
+        if self.bypass_with_context and self.inner.use_history:
+            if await self.inner.history(tenant_cfg, message):
+                reply_cache.count(tenant_id, "bypassed")
+                return None
+        normalized = normalize_text(text)
+        if not normalized:
+            return None
+        keys = [(tenant_id, self.fingerprint, normalized)]
+        if self.fuzzy:
+            keys.append((tenant_id, self.fingerprint, "~" + fuzzy_key(normalized)))
+        return keys
+
+    def _lookup(self, keys: list) -> Optional[str]:
+        tenant_id = keys[0][0]
+        for i, key in enumerate(keys):
+            reply = reply_cache.get(key)
+            if reply is not None:
+                reply_cache.count(tenant_id, "fuzzy_hits" if i else "hits")
+                return reply
+        return None
+
+    def _store(self, keys: list, reply: str | None):
+        if reply:
+            for key in keys:
+                reply_cache.set(key, reply, self.ttl)
+
+    async def _remember(self, tenant_cfg: dict, message: dict, reply: str):
+        # the inner engine didn't see this turn; keep the conversation whole
+        text = message["text"]["body"]
+        await self.inner.remember(tenant_cfg, message, text, reply)
+
+    async def reply(self, tenant_cfg: dict, message: dict) -> str | None:
+        keys = await self._keys(tenant_cfg, message)
+        if keys is None:
+            return await self.inner.reply(tenant_cfg, message)
+        cached = self._lookup(keys)
+        if cached is not None:
+            await self._remember(tenant_cfg, message, cached)
+            return cached
+
+        while (pending := self._inflight.get(keys[0])) is not None:
+            try:
+                reply = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():
+                    # the leading call was cancelled, not this one: try again
+                    # (this call may lead the next attempt)
+                    continue
+                raise
+            reply_cache.count(keys[0][0], "hits")
+            if reply:
+                await self._remember(tenant_cfg, message, reply)
+            return reply
+
+        reply_cache.count(keys[0][0], "misses")
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[keys[0]] = fut
+        try:
+            reply = await self.inner.reply(tenant_cfg, message)
+        except asyncio.CancelledError:
+            fut.cancel()  # waiters retry rather than being cancelled with it
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved; waiters re-raise it themselves
+            raise
+        finally:
+            self._inflight.pop(keys[0], None)
+        self._store(keys, reply)
+        fut.set_result(reply)
+        return reply
+
+    async def stream_reply(self, tenant_cfg: dict, message: dict) -> AsyncIterator[str]:
+        keys = await self._keys(tenant_cfg, message)
+        cached = self._lookup(keys) if keys is not None else None
+        if cached is not None:
+            await self._remember(tenant_cfg, message, cached)
+            yield cached
+            return
+        if keys is not None:
+            reply_cache.count(keys[0][0], "misses")
+        parts = []
+        async for delta in self.inner.stream_reply(tenant_cfg, message):
+            parts.append(delta)
+            yield delta
+        if keys is not None:
+            self._store(keys, "".join(parts).strip())
+
+
+def with_reply_cache(
+    engine: ResponseEngine, engine_cfg: dict | None, fingerprint: str
+) -> ResponseEngine:
+    """Wraps `engine` in a CachedEngine if the tenant turned the cache on."""
+    cache_cfg = ((engine_cfg or {}).get("config") or {}).get("cache")
+    if not cache_cfg:
+        return engine
+    return CachedEngine(
+        engine, fingerprint, cache_cfg if isinstance(cache_cfg, dict) else {}
+    )
@@ -1,16 +1,32 @@
-from .rules_engine import RulesEngine
-from .openai_engine import OpenAIEngine
-from .mistral_engine import MistralLangChainEngine
+from .backends import load_backend
+from .resilient_engine import ResilientEngine, resilience_options
 
 
-async def get_engine(tenant_cfg: dict):
-    etype = tenant_cfg["engine"]["type"]
-    cfg = tenant_cfg["engine"]["config"]
+async def _build(tenant_cfg: dict, engine_cfg: dict):
+    etype = engine_cfg["type"]
+    cfg = engine_cfg.get("config")
+    # the provider SDK is imported the first time its type is needed
+    engine_cls = await load_backend(etype)
     if etype == "rules":
-        return RulesEngine()
-    if etype == "openai":
-        return OpenAIEngine(cfg or {})
-    if etype == "mistral":
-        return MistralLangChainEngine(cfg or {})
-    # Add 'openai' / 'azure_openai' here later
-    raise ValueError(f"Unsupported engine type: {etype}")
+        fallback = (cfg or {}).get("fallback")
+        if fallback:
+            # unmatched messages go to an LLM engine built the same way
+            fallback = await get_engine({**tenant_cfg, "engine": fallback})
+        return engine_cls(cfg or {}, fallback=fallback)
+    return engine_cls(cfg or {})
+
+
+async def get_engine(tenant_cfg: dict):
+    engine_cfg = tenant_cfg["engine"]
+    engine = await _build(tenant_cfg, engine_cfg)
+    cfg = engine_cfg.get("config") or {}
+    fallbacks = cfg.get("fallbacks") or []
+    if engine_cfg["type"] == "rules" and not fallbacks:
+        return engine
+    # LLM engines get a deadline + circuit breaker, and the fallback chain
+    # from engine.config "fallbacks" (e.g. [{"type": "openai", ...}, {"type": "rules"}])
+    chain = [(engine_cfg["type"], engine)]
+    for fb in fallbacks:
+        chain.append((fb["type"], await _build(tenant_cfg, fb)))
+    deadline, hedge_after = resilience_options(cfg)
+    return ResilientEngine(chain, deadline=deadline, hedge_after=hedge_after)
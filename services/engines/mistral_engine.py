@@ -1,7 +1,7 @@
 from __future__ import annotations
-from typing import Any
+from typing import Any, AsyncIterator
 
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain_mistralai.chat_models import ChatMistralAI
 
@@ -15,6 +15,7 @@ class MistralLangChainEngine(ResponseEngine):
     - Uses ChatMistralAI via langchain-mistralai
     - Async via .ainvoke()
     - Only replies to text messages (others return None)
+    - Earlier turns come from conversation memory (config "history": false disables)
     """
 
     def __init__(self, cfg: dict[str, Any]):
@@ -26,6 +27,8 @@ class MistralLangChainEngine(ResponseEngine):
         temperature = float(cfg.get("temperature", 0.2))
         timeout = int(cfg.get("timeout", 20))
         max_retries = int(cfg.get("max_retries", 2))
+        self.use_history = bool(cfg.get("history", True))
+        self.streaming = bool(cfg.get("stream", settings.LLM_STREAM_REPLIES))
         system = (
             cfg.get("system_prompt")
             or "You are a helpful WhatsApp assistant. Answer briefly."
@@ -42,6 +45,7 @@ class MistralLangChainEngine(ResponseEngine):
         prompt = ChatPromptTemplate.from_messages(
             [
                 ("system", system),
+                MessagesPlaceholder("history", optional=True),
                 # You can include tenant metadata in the prompt if you want:
                 ("human", "{user_input}"),
             ]
@@ -56,5 +60,26 @@ class MistralLangChainEngine(ResponseEngine):
             return None
 
         # You could inject tenant info into the prompt here if desired
-        result = await self.chain.ainvoke({"user_input": text})
-        return (result or "").strip() or None
+        result = await self.chain.ainvoke(await self._inputs(tenant_cfg, message, text))
+        reply = (result or "").strip() or None
+        await self.remember(tenant_cfg, message, text, reply)
+        return reply
+
+    async def stream_reply(self, tenant_cfg: dict, message: dict) -> AsyncIterator[str]:
+        text = (message.get("text") or {}).get("body")
+        if not text:
+            return
+        parts = []
+        inputs = await self._inputs(tenant_cfg, message, text)
+        async for delta in self.chain.astream(inputs):
+            parts.append(delta)
+            yield delta
+        reply = "".join(parts).strip() or None
+        await self.remember(tenant_cfg, message, text, reply)
+
+    async def _inputs(self, tenant_cfg: dict, message: dict, text: str) -> dict:
+        history = await self.history(tenant_cfg, message)
+        return {
+            "user_input": text,
+            "history": [(m["role"], m["content"]) for m in history],
+        }
@@ -1,28 +1,59 @@
 from __future__ import annotations
-from typing import Any
-from starlette.concurrency import run_in_threadpool
-from openai import OpenAI
+import asyncio
+from typing import Any, AsyncIterator
+from openai import AsyncAzureOpenAI, AsyncOpenAI
 from .base import ResponseEngine
 from core.config import settings
+from services.http_pool import get_llm_http
 
 
 class OpenAIEngine(ResponseEngine):
+    """
+    Async OpenAI chat engine. All tenants' clients share one HTTP pool
+    (services.http_pool.get_llm_http), so concurrent calls cost sockets,
+    not executor threads.
+
+    Per-tenant config: api_key, model, system_prompt, base_url, timeout
+    (seconds), max_retries, max_concurrency (calls in flight for this tenant),
+    history, stream.
+    """
+
     def __init__(self, cfg: dict[str, Any]):
         # allow per-tenant override; fall back to env
-        api_key = cfg.get("api_key") or settings.model_dump().get("OPENAI_API_KEY")
-        model = (
-            cfg.get("model")
-            or settings.model_dump().get("OPENAI_MODEL")
-            or "gpt-4o-mini"
-        )
+        api_key = cfg.get("api_key") or settings.OPENAI_API_KEY
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY is required for OpenAIEngine")
-        self.client = OpenAI(api_key=api_key)
-        self.model = model
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=cfg.get("base_url"),
+            http_client=get_llm_http(),
+            **self._client_options(cfg),
+        )
+        self.model = cfg.get("model") or settings.OPENAI_MODEL or "gpt-4o-mini"
+        self._setup(cfg)
+
+    def _setup(self, cfg: dict[str, Any]):
         self.system = (
             cfg.get("system_prompt")
             or "You are a helpful WhatsApp assistant. Answer briefly."
         )
+        self.use_history = bool(cfg.get("history", True))
+        self.streaming = bool(cfg.get("stream", settings.LLM_STREAM_REPLIES))
+        limit = int(cfg.get("max_concurrency", settings.LLM_MAX_CONCURRENCY))
+        self._limit = asyncio.Semaphore(limit) if limit > 0 else None
+
+    @staticmethod
+    def _client_options(cfg: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "timeout": float(cfg.get("timeout", settings.LLM_HTTP_TIMEOUT)),
+            "max_retries": int(cfg.get("max_retries", settings.LLM_MAX_RETRIES)),
+        }
+
+    async def _create(self, **kwargs):
+        if self._limit is None:
+            return await self.client.chat.completions.create(model=self.model, **kwargs)
+        async with self._limit:
+            return await self.client.chat.completions.create(model=self.model, **kwargs)
 
     async def reply(self, tenant_cfg: dict, message: dict) -> str | None:
         # only reply to text; ignore others
@@ -30,14 +61,66 @@ class OpenAIEngine(ResponseEngine):
         if not text:
             return None
 
-        def _call():
-            return self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system},
-                    {"role": "user", "content": text},
-                ],
-            )
+        messages = await self._messages(tenant_cfg, message, text)
+        resp = await self._create(messages=messages)
+        reply = (resp.choices[0].message.content or "").strip()
+        await self.remember(tenant_cfg, message, text, reply)
+        return reply
+
+    async def stream_reply(self, tenant_cfg: dict, message: dict) -> AsyncIterator[str]:
+        text = (message.get("text") or {}).get("body")
+        if not text:
+            return
+
+        messages = await self._messages(tenant_cfg, message, text)
+        # the concurrency slot covers opening the stream, not reading it
+        stream = await self._create(messages=messages, stream=True)
+        parts = []
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            await stream.close()
+        reply = "".join(parts).strip()
+        await self.remember(tenant_cfg, message, text, reply)
+
+    async def _messages(self, tenant_cfg: dict, message: dict, text: str) -> list[dict]:
+        return [
+            {"role": "system", "content": self.system},
+            *(await self.history(tenant_cfg, message)),
+            {"role": "user", "content": text},
+        ]
+
 
-        resp = await run_in_threadpool(_call)
-        return (resp.choices[0].message.content or "").strip()
+class AzureOpenAIEngine(OpenAIEngine):
+    """
+    Same engine against an Azure OpenAI deployment. Config: api_key, endpoint,
+    deployment, api_version (falling back to the AZURE_OAI_* settings), plus
+    the OpenAIEngine options.
+    """
+
+    def __init__(self, cfg: dict[str, Any]):
+        api_key = cfg.get("api_key") or settings.AZURE_OAI_API_KEY
+        endpoint = cfg.get("endpoint") or settings.AZURE_OAI_ENDPOINT
+        deployment = cfg.get("deployment") or settings.AZURE_OAI_DEPLOYMENT
+        if not (api_key and endpoint and deployment):
+            raise RuntimeError(
+                "AZURE_OAI_API_KEY, AZURE_OAI_ENDPOINT and AZURE_OAI_DEPLOYMENT "
+                "are required for AzureOpenAIEngine"
+            )
+        self.client = AsyncAzureOpenAI(
+            api_key=api_key,
+            azure_endpoint=endpoint,
+            azure_deployment=deployment,
+            api_version=cfg.get("api_version")
+            or settings.AZURE_OAI_API_VERSION
+            or "2024-10-21",
+            http_client=get_llm_http(),
+            **self._client_options(cfg),
+        )
+        # the deployment picks the model; the field is still required
+        self.model = cfg.get("model") or deployment
+        self._setup(cfg)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any
+
+from .base import ResponseEngine
+from .backends import load_backend, loaded_backends
+from .cached_engine import with_reply_cache
+from .factory import get_engine
+from core.config import settings
+from logger import logger
+
+
+def engine_fingerprint(engine_cfg: dict[str, Any] | None) -> str:
+    """
+    Stable hash of a tenant's `engine` block. Any change to type/config
+    (model, prompt, api_key, ...) yields a new fingerprint.
+    """
+    raw = json.dumps(engine_cfg or {}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "engine", "last_used")
+
+    def __init__(self, fingerprint: str, engine: ResponseEngine):
+        self.fingerprint = fingerprint
+        self.engine = engine
+        self.last_used = time.monotonic()
+
+
+class EngineRegistry:
+    """
+    Keeps warm ResponseEngine instances (and their HTTP pools) keyed by tenant_id.
+    - Rebuilds when the tenant's engine fingerprint changes
+    - LRU-bounded by max_size; entries idle for longer than idle_ttl are evicted
+    - Concurrent misses for the same tenant build the engine only once
+    """
+
+    def __init__(self, max_size: int = 512, idle_ttl: float = 1800.0):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._building: dict[str, asyncio.Future] = {}
+        # tenant_id -> (fingerprint, rules engine used under overload)
+        self._degraded: dict[str, tuple[str, ResponseEngine]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, tenant_cfg: dict) -> ResponseEngine:
+        tenant_id = str(tenant_cfg["tenant_id"])
+        fp = engine_fingerprint(tenant_cfg.get("engine"))
+
+        entry = self._entries.get(tenant_id)
+        if entry and entry.fingerprint == fp:
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(tenant_id)
+            self.hits += 1
+            return entry.engine
+
+        self.misses += 1
+        key = f"{tenant_id}:{fp}"
+        while (pending := self._building.get(key)) is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if pending.cancelled():
+                    # the building call was cancelled, not this one: build
+                    # (or wait for whoever builds) again
+                    continue
+                raise
+
+        fut = asyncio.get_running_loop().create_future()
+        self._building[key] = fut
+        try:
+            engine = await get_engine(tenant_cfg)
+            engine = with_reply_cache(engine, tenant_cfg.get("engine"), fp)
+        except asyncio.CancelledError:
+            fut.cancel()  # waiters retry rather than hang or be cancelled
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved; waiters re-raise it themselves
+            raise
+        finally:
+            self._building.pop(key, None)
+
+        if entry:
+            logger.info("[engines] rebuilding engine for tenant=%s", tenant_id)
+        self._entries[tenant_id] = _Entry(fp, engine)
+        self._entries.move_to_end(tenant_id)
+        self._evict()
+        fut.set_result(engine)
+        return engine
+
+    async def degraded(self, tenant_cfg: dict) -> ResponseEngine | None:
+        """
+        Rules-only engine answering for the tenant while the worker is
+        degraded by load (services.admission), or None to keep the normal engine.
+        Rules come from engine.config "degraded" (false opts out), else the
+        tenant's own rules / "rules" fallback, else the built-in ones.
+        """
+        engine_cfg = tenant_cfg.get("engine") or {}
+        cfg = engine_cfg.get("config") or {}
+        rules_cfg = cfg.get("degraded")
+        if rules_cfg is False:
+            return None
+        if rules_cfg is None:
+            if engine_cfg.get("type") == "rules":
+                if not cfg.get("fallback"):
+                    return None  # already cheap
+                rules_cfg = cfg
+            else:
+                rules_cfg = next(
+                    (
+                        fb.get("config") or {}
+                        for fb in cfg.get("fallbacks") or []
+                        if fb.get("type") == "rules"
+                    ),
+                    {},
+                )
+        tenant_id = str(tenant_cfg["tenant_id"])
+        fp = engine_fingerprint(engine_cfg)
+        cached = self._degraded.get(tenant_id)
+        if cached and cached[0] == fp:
+            return cached[1]
+        rules_cls = await load_backend("rules")
+        # never the LLM fallback: that's the load being shed
+        rules_cfg = {k: v for k, v in rules_cfg.items() if k != "fallback"}
+        engine = rules_cls(rules_cfg, fallback=None)
+        self._degraded[tenant_id] = (fp, engine)
+        return engine
+
+    def invalidate(self, tenant_id: str) -> bool:
+        self._degraded.pop(str(tenant_id), None)
+        return self._entries.pop(str(tenant_id), None) is not None
+
+    def clear(self):
+        self._entries.clear()
+        self._degraded.clear()
+
+    def _evict(self):
+        if self.idle_ttl > 0:
+            cutoff = time.monotonic() - self.idle_ttl
+            # OrderedDict is in LRU order, so idle entries are at the front
+            while self._entries:
+                tenant_id, entry = next(iter(self._entries.items()))
+                if entry.last_used >= cutoff:
+                    break
+                self._entries.pop(tenant_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def prewarm(self, tenants: list[dict]) -> int:
+        warmed = 0
+        for t in tenants:
+            try:
+                await self.get(t)
+                warmed += 1
+            except Exception as e:
+                logger.warning(
+                    "[engines] prewarm failed for %s: %s", t.get("tenant_id"), e
+                )
+        return warmed
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "tenants": list(self._entries.keys()),
+            "backend_import_s": loaded_backends(),
+        }
+
+
+engine_registry = EngineRegistry(
+    max_size=settings.ENGINE_CACHE_MAX_SIZE, idle_ttl=settings.ENGINE_CACHE_IDLE_TTL
+)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from .base import ResponseEngine
+from core.config import settings
+from logger import logger
+from services.fair_scheduler import fair_scheduler
+from services.circuit_breaker import (
+    CircuitBreaker,
+    circuit_breakers,
+    counts_against_provider,
+)
+
+
+class EngineUnavailable(RuntimeError):
+    """Every engine in the chain is failing or has its breaker open."""
+
+
+class _Link:
+    __slots__ = ("provider", "engine", "breaker")
+
+    def __init__(self, provider: str, engine: ResponseEngine):
+        self.provider = provider
+        self.engine = engine
+        # rules engines can't be "down"
+        self.breaker: Optional[CircuitBreaker] = (
+            None if provider == "rules" else circuit_breakers.get(provider)
+        )
+
+    def allow(self) -> bool:
+        return self.breaker is None or self.breaker.allow()
+
+
+class ResilientEngine(ResponseEngine):
+    """
+    Runs an ordered chain of engines (e.g. mistral -> openai -> rules):
+
+    - each attempt is bounded by `deadline` seconds and reported to its
+      provider's circuit breaker; providers whose breaker is open are skipped
+    - on failure the next engine in the chain answers
+    - with `hedge_after`, if the current attempt hasn't answered after that
+      many seconds the next engine is started too and the first answer wins
+    Streams fall back only until their first delta; they are not hedged.
+    """
+
+    def __init__(
+        self,
+        chain: list[tuple[str, ResponseEngine]],
+        deadline: float,
+        hedge_after: float | None = None,
+    ):
+        self.chain = [_Link(provider, engine) for provider, engine in chain]
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        primary = self.chain[0].engine
+        self.use_history = primary.use_history
+        self.streaming = primary.streaming
+
+    @asynccontextmanager
+    async def _slot(self, link: _Link, tenant_cfg: dict):
+        """
+        Engine slot for an attempt that already holds its breaker permit
+        (link.allow()). If the wait for the slot fails or is cancelled
+        (superseded batch, losing hedge) the permit is given back, so a
+        half-open breaker isn't left probing forever.
+        """
+        entered = False
+        try:
+            async with fair_scheduler.engine_slot(tenant_cfg):
+                entered = True
+                yield
+        except BaseException:
+            if not entered and link.breaker:
+                link.breaker.release()
+            raise
+
+    async def _attempt(self, link: _Link, tenant_cfg: dict, message: dict):
+        async with self._slot(link, tenant_cfg):
+            return await self._call(link, tenant_cfg, message)
+
+    async def _call(self, link: _Link, tenant_cfg: dict, message: dict):
+        start = time.monotonic()
+        try:
+            reply = await asyncio.wait_for(
+                link.engine.reply(tenant_cfg, message), self.deadline
+            )
+        except asyncio.CancelledError:
+            if link.breaker:
+                link.breaker.release()
+            raise
+        except Exception as e:
+            if link.breaker:
+                if counts_against_provider(e):
+                    link.breaker.record(False, time.monotonic() - start)
+                else:
+                    link.breaker.release()
+            raise
+        if link.breaker:
+            link.breaker.record(True, time.monotonic() - start)
+        return reply
+
+    def _failed_over(self, winner: _Link, tenant_cfg: dict, reason):
+        primary = self.chain[0]
+        if primary.breaker:
+            primary.breaker.fallbacks += 1
+        # while a breaker is open this happens on every message: INFO, sampled
+        logger.log(
+            logging.WARNING if reason else logging.INFO,
+            "[%s] %s answered instead of %s: %s",
+            tenant_cfg["tenant_id"],
+            winner.provider,
+            primary.provider,
+            reason or "breaker open",
+            extra={
+                "tenant_id": tenant_cfg["tenant_id"],
+                "provider": winner.provider,
+                "category": "fallback",
+            },
+        )
+
+    async def reply(self, tenant_cfg: dict, message: dict) -> str | None:
+        links = iter(self.chain)
+        running: dict[asyncio.Task, _Link] = {}
+        last_error: Exception | None = None
+        hedged: Optional[_Link] = None  # the attempt that was too slow
+
+        def start_next() -> bool:
+            for link in links:
+                if link.allow():
+                    task = asyncio.create_task(self._attempt(link, tenant_cfg, message))
+                    running[task] = link
+                    return True
+            return False
+
+        try:
+            if not start_next():
+                raise EngineUnavailable("all engine breakers are open")
+            while running:
+                timeout = None
+                if self.hedge_after is not None and hedged is None:
+                    timeout = self.hedge_after
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = next(iter(running.values()))
+                    if start_next() and hedged.breaker:
+                        hedged.breaker.hedges += 1
+                    continue
+                for task in done:
+                    link = running.pop(task)
+                    if task.exception() is None:
+                        reason = last_error
+                        if hedged is not None and link is not hedged:
+                            reason = reason or f"{hedged.provider} slow, hedged"
+                            if hedged.breaker:
+                                hedged.breaker.hedge_wins += 1
+                        if link is not self.chain[0]:
+                            self._failed_over(link, tenant_cfg, reason)
+                        return task.result()
+                    last_error = task.exception()
+                if not running and not start_next():
+                    break
+        finally:
+            for task in running:
+                task.cancel()
+        if last_error is not None:
+            raise last_error
+        raise EngineUnavailable("all engine breakers are open")
+
+    async def stream_reply(self, tenant_cfg: dict, message: dict) -> AsyncIterator[str]:
+        last_error: Exception | None = None
+        for link in self.chain:
+            if not link.allow():
+                continue
+            # the engine slot is held for the whole stream
+            async with self._slot(link, tenant_cfg):
+                start = time.monotonic()
+                deltas = link.engine.stream_reply(tenant_cfg, message)
+                try:
+                    try:
+                        # time to first delta is what the deadline bounds here
+                        first = await asyncio.wait_for(
+                            anext(deltas, None), self.deadline
+                        )
+                    except asyncio.CancelledError:
+                        if link.breaker:
+                            link.breaker.release()
+                        raise
+                    except Exception as e:
+                        if link.breaker:
+                            if counts_against_provider(e):
+                                link.breaker.record(False, time.monotonic() - start)
+                            else:
+                                link.breaker.release()
+                        last_error = e
+                        continue
+                    if link.breaker:
+                        link.breaker.record(True, time.monotonic() - start)
+                    if link is not self.chain[0]:
+                        self._failed_over(link, tenant_cfg, last_error)
+                    if first is not None:
+                        yield first
+                        async for delta in deltas:
+                            yield delta
+                    return
+                finally:
+                    await deltas.aclose()
+        if last_error is not None:
+            raise last_error
+        raise EngineUnavailable("all engine breakers are open")
+
+
+def resilience_options(cfg: dict) -> tuple[float, float | None]:
+    """(deadline, hedge_after) in seconds from engine.config, else settings."""
+    deadline = float(cfg.get("deadline_ms", settings.ENGINE_DEADLINE_MS)) / 1000
+    hedge = cfg.get("hedge_after_ms")
+    return deadline, (float(hedge) / 1000 if hedge else None)
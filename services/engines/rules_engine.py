@@ -1,11 +1,185 @@
+from __future__ import annotations
+import json
+import re
+from functools import lru_cache
+from typing import Any, AsyncIterator, Optional
+
 from .base import ResponseEngine
+from services.reply_cache import normalize_text
+
+# Used when the tenant's engine.config has no "rules"
+DEFAULT_CONFIG: dict[str, Any] = {
+    "rules": [
+        {
+            "id": "greeting",
+            "exact": ["hola", "hello", "hi"],
+            "reply": "¡Hola de {display_name}! ¿En qué puedo ayudarte?",
+        },
+        {"id": "no-text", "types": ["*"], "reply": "Gracias, recibí tu mensaje."},
+    ],
+    "default_reply": "Entendido. Estoy procesando tu solicitud.",
+}
+
+
+class _Rule:
+    __slots__ = ("index", "id", "priority", "reply")
+
+    def __init__(self, index: int, raw: dict):
+        self.index = index
+        self.id = str(raw.get("id") or index)
+        self.priority = int(raw.get("priority", 0))
+        self.reply = raw["reply"]
+
+    def rank(self) -> tuple[int, int]:
+        # higher priority first, then earlier in the list
+        return (-self.priority, self.index)
+
+
+class RuleSet:
+    """
+    A tenant's rules compiled into lookup tables, so matching cost depends on
+    the message, not on the number of rules:
+      - exact: normalized whole message -> rules (dict)
+      - keywords: normalized word n-grams of the message -> rules (dict)
+      - reply_ids: interactive button/list reply id or template button payload
+      - types: message type ("image", "audio", ...; "*" = any non-text)
+      - regex: searched in the raw text (case-insensitive), in priority order,
+        only while they could still beat the best lookup match
+    The matching rule with the highest priority wins (ties: first listed).
+    (One combined alternation was ~10x slower than separate searches with
+    re: it tries every branch at every position.)
+    """
+
+    def __init__(self, rules: list[dict]):
+        self.rules = [_Rule(i, raw) for i, raw in enumerate(rules)]
+        self.exact: dict[str, list[_Rule]] = {}
+        self.keywords: dict[str, list[_Rule]] = {}
+        self.reply_ids: dict[str, list[_Rule]] = {}
+        self.types: dict[str, list[_Rule]] = {}
+        self.max_ngram = 0
+        regexes: list[tuple[_Rule, re.Pattern]] = []
+        for rule, raw in zip(self.rules, rules):
+            for phrase in raw.get("exact") or ():
+                self._add(self.exact, normalize_text(phrase), rule)
+            for phrase in raw.get("keywords") or ():
+                phrase = normalize_text(phrase)
+                self._add(self.keywords, phrase, rule)
+                self.max_ngram = max(self.max_ngram, len(phrase.split()))
+            for reply_id in raw.get("reply_ids") or ():
+                self._add(self.reply_ids, str(reply_id), rule)
+            for msg_type in raw.get("types") or ():
+                self._add(self.types, msg_type, rule)
+            if raw.get("regex"):
+                try:
+                    regexes.append((rule, re.compile(raw["regex"], re.IGNORECASE)))
+                except re.error as e:
+                    raise ValueError(f"rule {rule.id}: bad regex: {e}") from None
+        regexes.sort(key=lambda item: item[0].rank())
+        self.regexes = regexes
+
+    @staticmethod
+    def _add(table: dict[str, list[_Rule]], key: str, rule: _Rule):
+        if key:
+            table.setdefault(key, []).append(rule)
+
+    def _lookups(self, message: dict, text: str):
+        msg_type = message.get("type") or "text"
+        if msg_type != "text" or not text:
+            yield from self.types.get(msg_type, ())
+            yield from self.types.get("*", ())
+        reply_id = _reply_id(message)
+        if reply_id:
+            yield from self.reply_ids.get(reply_id, ())
+        if not text:
+            return
+        normalized = normalize_text(text)
+        yield from self.exact.get(normalized, ())
+        if self.keywords:
+            words = normalized.split()
+            for n in range(1, self.max_ngram + 1):
+                for gram in zip(*(words[i:] for i in range(n))):
+                    yield from self.keywords.get(" ".join(gram), ())
+
+    def match(self, message: dict) -> Optional[_Rule]:
+        text = (message.get("text") or {}).get("body") or ""
+        best = min(self._lookups(message, text), key=_Rule.rank, default=None)
+        if text:
+            for rule, regex in self.regexes:
+                if best is not None and best.rank() < rule.rank():
+                    break
+                if regex.search(text):
+                    return rule
+        return best
+
+
+def _reply_id(message: dict) -> Optional[str]:
+    if message.get("type") == "interactive":
+        i = message.get("interactive") or {}
+        chosen = i.get("button_reply") or i.get("list_reply") or {}
+        return chosen.get("id")
+    if message.get("type") == "button":
+        return (message.get("button") or {}).get("payload")
+    return None
+
+
+@lru_cache(maxsize=256)
+def _compile(rules_json: str) -> RuleSet:
+    return RuleSet(json.loads(rules_json))
+
+
+def compile_rules(rules: list[dict]) -> RuleSet:
+    """Compiled once per distinct rule list (tenants sharing rules share it)."""
+    return _compile(json.dumps(rules, sort_keys=True, ensure_ascii=False))
 
 
 class RulesEngine(ResponseEngine):
+    """
+    Deterministic replies from engine.config:
+      {"rules": [{"id", "priority", "reply", "exact" | "keywords" | "regex" |
+                  "reply_ids" | "types": [...]}, ...],
+       "default_reply": "...",  # when nothing matches and there is no fallback
+       "fallback": {"type": "mistral", "config": {...}}}
+    Replies may use {display_name}. Without "rules" the built-in greeting
+    rules apply.
+    """
+
+    def __init__(
+        self,
+        cfg: dict[str, Any] | None = None,
+        fallback: ResponseEngine | None = None,
+    ):
+        cfg = cfg if cfg and "rules" in cfg else {**DEFAULT_CONFIG, **(cfg or {})}
+        self.rules = compile_rules(cfg["rules"])
+        self.default_reply = cfg.get("default_reply")
+        self.fallback = fallback
+        # rule answers go into the fallback LLM's conversation memory too
+        self.use_history = bool(fallback and fallback.use_history)
+        self.streaming = bool(fallback and fallback.streaming)
+
+    async def _rule_reply(self, tenant_cfg: dict, message: dict) -> Optional[str]:
+        rule = self.rules.match(message)
+        if rule is None:
+            return None
+        reply = rule.reply.replace("{display_name}", tenant_cfg.get("display_name", ""))
+        text = (message.get("text") or {}).get("body")
+        if text:
+            await self.remember(tenant_cfg, message, text, reply)
+        return reply
+
     async def reply(self, tenant_cfg, message):
-        text = (message.get("text") or {}).get("body", "")
-        if not text:
-            return "Gracias, recibí tu mensaje."
-        if text.lower() in {"hola", "hello", "hi"}:
-            return f"¡Hola de {tenant_cfg['display_name']}! ¿En qué puedo ayudarte?"
-        return "Entendido. Estoy procesando tu solicitud."
+        reply = await self._rule_reply(tenant_cfg, message)
+        if reply is not None:
+            return reply
+        if self.fallback is not None:
+            return await self.fallback.reply(tenant_cfg, message)
+        return self.default_reply
+
+    async def stream_reply(self, tenant_cfg: dict, message: dict) -> AsyncIterator[str]:
+        reply = await self._rule_reply(tenant_cfg, message)
+        if reply is None and self.fallback is not None:
+            async for delta in self.fallback.stream_reply(tenant_cfg, message):
+                yield delta
+            return
+        reply = reply if reply is not None else self.default_reply
+        if reply:
+            yield reply
@@ -0,0 +1,178 @@
+from __future__ import annotations
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from core.config import settings
+from services.status_tracker import Histogram
+
+# seconds spent waiting for a slot
+WAIT_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def tenant_limits(tenant_cfg: Optional[dict]) -> dict:
+    """
+    TenantConfig.limits, e.g. {"weight": 2, "engine": 4, "sends": 16, "jobs": 8}:
+    share of contended capacity (weight) and per-tenant concurrency caps.
+    """
+    return (tenant_cfg or {}).get("limits") or {}
+
+
+class _Tenant:
+    __slots__ = ("waiters", "in_flight", "finish", "granted", "wait", "wait_max")
+
+    def __init__(self):
+        # (tag, queued at, future, limit)
+        self.waiters: deque[tuple[float, float, asyncio.Future, int]] = deque()
+        self.in_flight = 0
+        self.finish = 0.0  # virtual finish tag of its last request
+        self.granted = 0
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.wait_max = 0.0
+
+
+class FairPool:
+    """
+    `capacity` concurrent slots shared by tenants, at most `tenant_limit` per
+    tenant (TenantConfig.limits overrides it). When slots are contended each
+    tenant queues on its own, and freed slots go to tenants by start-time fair
+    queuing: a request is tagged max(virtual time, tenant's last tag) and
+    advances the tenant's tag by 1/weight; the lowest head tag goes next. A
+    tenant with a deep backlog therefore can't push others' requests back.
+    """
+
+    def __init__(self, name: str, capacity: int, tenant_limit: int):
+        self.name = name
+        self.capacity = capacity
+        self.tenant_limit = tenant_limit
+        self._tenants: dict[str, _Tenant] = {}
+        self._in_flight = 0
+        self._queued = 0
+        self._vtime = 0.0
+
+    def _tenant(self, key: str) -> _Tenant:
+        t = self._tenants.get(key)
+        if t is None:
+            t = self._tenants[key] = _Tenant()
+        return t
+
+    async def acquire(self, key: str, weight: float = 1.0, limit: int | None = None):
+        t = self._tenant(key)
+        limit = limit or self.tenant_limit
+        tag = max(self._vtime, t.finish)
+        t.finish = tag + 1.0 / max(weight, 0.01)
+        fut = asyncio.get_running_loop().create_future()
+        t.waiters.append((tag, time.monotonic(), fut, limit))
+        self._queued += 1
+        self._dispatch()
+        if fut.done():
+            return
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(key)  # granted just as we were cancelled
+            else:
+                for i, waiter in enumerate(t.waiters):
+                    if waiter[2] is fut:
+                        del t.waiters[i]
+                        self._queued -= 1
+                        break
+            raise
+
+    def _grant(self, t: _Tenant, tag: float, waited: float):
+        self._vtime = max(self._vtime, tag)
+        t.in_flight += 1
+        t.granted += 1
+        self._in_flight += 1
+        t.wait.observe(waited)
+        t.wait_max = max(t.wait_max, waited)
+
+    def release(self, key: str):
+        t = self._tenants[key]
+        t.in_flight -= 1
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._queued and self._in_flight < self.capacity:
+            best = None
+            for t in self._tenants.values():
+                if t.waiters and t.in_flight < t.waiters[0][3]:
+                    if best is None or t.waiters[0][0] < best.waiters[0][0]:
+                        best = t
+            if best is None:
+                return  # everyone waiting is at their own cap
+            tag, since, fut, _ = best.waiters.popleft()
+            self._queued -= 1
+            self._grant(best, tag, now - since)
+            fut.set_result(None)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @asynccontextmanager
+    async def slot(self, key: str, weight: float = 1.0, limit: int | None = None):
+        await self.acquire(key, weight, limit)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def stats(self) -> dict:
+        tenants = {}
+        for key, t in self._tenants.items():
+            count = t.wait.count
+            tenants[key] = {
+                "in_flight": t.in_flight,
+                "queued": len(t.waiters),
+                "granted": t.granted,
+                "wait_avg_ms": round(t.wait.sum / count * 1000, 2) if count else 0.0,
+                "wait_max_ms": round(t.wait_max * 1000, 2),
+                "wait_s": t.wait.to_dict(),
+            }
+        return {
+            "capacity": self.capacity,
+            "tenant_limit": self.tenant_limit,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "tenants": tenants,
+        }
+
+
+class FairScheduler:
+    """Fair pools for engine calls and outbound sends."""
+
+    def __init__(self):
+        self.engine = FairPool(
+            "engine", settings.FAIR_ENGINE_CONCURRENCY, settings.FAIR_ENGINE_PER_TENANT
+        )
+        self.sends = FairPool(
+            "sends", settings.FAIR_SEND_CONCURRENCY, settings.FAIR_SEND_PER_TENANT
+        )
+
+    def engine_slot(self, tenant_cfg: dict):
+        limits = tenant_limits(tenant_cfg)
+        return self.engine.slot(
+            str(tenant_cfg["tenant_id"]),
+            limits.get("weight", 1.0),
+            limits.get("engine"),
+        )
+
+    def send_slot(self, key: str, tenant_cfg: Optional[dict] = None):
+        limits = tenant_limits(tenant_cfg)
+        return self.sends.slot(key, limits.get("weight", 1.0), limits.get("sends"))
+
+    def stats(self) -> dict:
+        return {"engine": self.engine.stats(), "sends": self.sends.stats()}
+
+
+fair_scheduler = FairScheduler()
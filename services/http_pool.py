@@ -0,0 +1,78 @@
+from __future__ import annotations
+import importlib.util
+from typing import Optional
+
+import httpx
+
+from core.config import settings
+
+# One keep-alive pool per process for all Graph API traffic (every tenant).
+# Auth is per request, so the pool itself carries no tenant state.
+_graph_client: Optional[httpx.AsyncClient] = None
+# Same for LLM provider APIs (OpenAI / Azure OpenAI clients of every tenant)
+_llm_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_async_client(
+    *,
+    max_connections: int,
+    max_keepalive: int,
+    timeout: float,
+    connect_timeout: float,
+    http2: bool = False,
+    base_url: str = "",
+) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=http2 and _http2_available(),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+
+
+def get_graph_http() -> httpx.AsyncClient:
+    global _graph_client
+    if _graph_client is None or _graph_client.is_closed:
+        _graph_client = build_async_client(
+            base_url=settings.GRAPH_API_BASE_URL.rstrip("/"),
+            max_connections=settings.GRAPH_HTTP_MAX_CONNECTIONS,
+            max_keepalive=settings.GRAPH_HTTP_MAX_KEEPALIVE,
+            timeout=settings.GRAPH_HTTP_TIMEOUT,
+            connect_timeout=settings.GRAPH_HTTP_CONNECT_TIMEOUT,
+            http2=settings.GRAPH_HTTP2,
+        )
+    return _graph_client
+
+
+def get_llm_http() -> httpx.AsyncClient:
+    global _llm_client
+    if _llm_client is None or _llm_client.is_closed:
+        _llm_client = build_async_client(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive=settings.LLM_HTTP_MAX_KEEPALIVE,
+            timeout=settings.LLM_HTTP_TIMEOUT,
+            connect_timeout=settings.LLM_HTTP_CONNECT_TIMEOUT,
+            http2=settings.LLM_HTTP2,
+        )
+    return _llm_client
+
+
+async def aclose_llm_http():
+    global _llm_client
+    if _llm_client is not None:
+        await _llm_client.aclose()
+        _llm_client = None
+
+
+async def aclose_graph_http():
+    global _graph_client
+    if _graph_client is not None:
+        await _graph_client.aclose()
+        _graph_client = None
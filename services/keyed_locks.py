@@ -0,0 +1,38 @@
+from __future__ import annotations
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Hashable
+
+
+class KeyedLocks:
+    """
+    One asyncio.Lock per key, created on demand and dropped when unused.
+    asyncio.Lock wakes waiters FIFO, so work for the same key runs in arrival order
+    while different keys proceed concurrently.
+    """
+
+    def __init__(self):
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+        self._users: dict[Hashable, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+# Serialises work per conversation: key = (tenant_id, wa_id)
+conversation_locks = KeyedLocks()
@@ -0,0 +1,565 @@
+"""
+Media in both directions, streamed in MEDIA_CHUNK_SIZE pieces (an asset is
+never held in memory whole).
+
+Inbound: media messages are downloaded to MEDIA_DIR/<tenant>/<media_id><ext>
+and the local path is added to the message for engines (media_store).
+
+Outbound: for tenants that opt in, a media send by link is uploaded once per
+phone number and the returned media ID is reused by every later send of the
+same content (media_ids), so Meta doesn't re-fetch the link for each
+recipient. The server fetches those links itself, so only https links to
+public addresses (every redirect hop and the connected peer) are fetched,
+optionally limited to a host allowlist; anything else is sent as a link.
+"""
+
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import ipaddress
+import mimetypes
+import os
+import socket
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
+from urllib.parse import urljoin, urlparse
+
+from core.config import settings
+from services.http_pool import get_graph_http
+from services.whatsapp_client import GraphAPIError, WhatsAppClient
+from logger import logger
+
+MEDIA_TYPES = frozenset({"image", "audio", "video", "document", "sticker"})
+
+# Graph errors for a media ID that is no longer usable (expired / deleted)
+STALE_MEDIA_CODES = {100, 131053}
+
+
+# redirect hops followed when fetching a link (each one is checked)
+MAX_REDIRECTS = 5
+
+
+class MediaTooLarge(ValueError):
+    pass
+
+
+class UnsafeMediaLink(ValueError):
+    """A link the server won't fetch: not https, not allowed or not public."""
+
+
+@dataclass
+class MediaFile:
+    path: str
+    mime_type: str
+    sha256: str  # hex
+    size: int
+
+
+def download_enabled(tenant_cfg: dict) -> bool:
+    """engine.config "download_media", else MEDIA_DOWNLOAD_INBOUND."""
+    cfg = (tenant_cfg.get("engine") or {}).get("config") or {}
+    return bool(cfg.get("download_media", settings.MEDIA_DOWNLOAD_INBOUND))
+
+
+def upload_options(tenant_cfg: dict | None, default: bool) -> tuple[bool, list[str]]:
+    """
+    (upload linked media?, host allowlist) from engine.config "upload_media"
+    (else `default`) and "upload_media_hosts" (else MEDIA_UPLOAD_HOSTS).
+    """
+    cfg = ((tenant_cfg or {}).get("engine") or {}).get("config") or {}
+    enabled = bool(cfg.get("upload_media", default))
+    hosts = cfg.get("upload_media_hosts", settings.MEDIA_UPLOAD_HOSTS) or []
+    return enabled, [h.lower().strip(".") for h in hosts]
+
+
+def _is_public(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+    except ValueError:
+        return False
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    # is_global excludes loopback, RFC1918, link-local (169.254.169.254), CGNAT
+    return ip.is_global and not ip.is_multicast
+
+
+def _check_link(url: str, hosts: list[str]) -> str:
+    """The link's host if it's https and allowed, else UnsafeMediaLink."""
+    parts = urlparse(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme != "https" or not host:
+        raise UnsafeMediaLink(f"not an https link: {url}")
+    if hosts and not any(host == h or host.endswith("." + h) for h in hosts):
+        raise UnsafeMediaLink(f"host {host} is not in the upload allowlist")
+    return host
+
+
+async def _check_public(url: str, hosts: list[str]):
+    host = _check_link(url, hosts)
+    port = urlparse(url).port or 443
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+    except OSError as e:
+        raise UnsafeMediaLink(f"can't resolve {host}: {e}") from e
+    for *_, sockaddr in infos:
+        if not _is_public(sockaddr[0]):
+            raise UnsafeMediaLink(f"{host} resolves to non-public {sockaddr[0]}")
+
+
+def _check_peer(response):
+    # the address actually connected to (guards against DNS rebinding)
+    stream = response.extensions.get("network_stream")
+    addr = stream.get_extra_info("server_addr") if stream is not None else None
+    if addr and not _is_public(str(addr[0])):
+        raise UnsafeMediaLink(f"connected to non-public {addr[0]}")
+
+
+def _extension(mime_type: str | None) -> str:
+    ext = mimetypes.guess_extension((mime_type or "").split(";")[0].strip())
+    return ext or ".bin"
+
+
+def _write_sync(f, digest, chunk: bytes):
+    f.write(chunk)
+    digest.update(chunk)
+
+
+async def _spool(
+    chunks: AsyncIterator[bytes], path: str, io: ThreadPoolExecutor, max_bytes: int
+) -> tuple[str, int]:
+    """Writes `chunks` to `path` off the event loop; returns (sha256 hex, size)."""
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    size = 0
+    f = await loop.run_in_executor(io, open, path, "wb")
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise MediaTooLarge(f"media larger than {max_bytes} bytes")
+            await loop.run_in_executor(io, _write_sync, f, digest, chunk)
+    except BaseException:
+        await loop.run_in_executor(io, f.close)
+        await loop.run_in_executor(io, _unlink, path)
+        raise
+    await loop.run_in_executor(io, f.close)
+    return digest.hexdigest(), size
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _sha256_matches(expected: str, hexdigest: str) -> bool:
+    # Meta documents a SHA-256 without fixing the encoding: accept hex or base64
+    b64 = base64.b64encode(bytes.fromhex(hexdigest)).decode()
+    return expected in (hexdigest, b64)
+
+
+class MediaStore:
+    """Inbound media on local disk; files older than `retention` are swept."""
+
+    def __init__(self, root: str, chunk_size: int, max_bytes: int, retention: float):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.retention = retention
+        self._io = ThreadPoolExecutor(max_workers=2, thread_name_prefix="media-io")
+        self._inflight: dict[str, asyncio.Future] = {}  # media_id -> download
+        self._task: Optional[asyncio.Task] = None
+        self.downloaded = 0
+        self.reused = 0
+        self.failed = 0
+        self.bytes = 0
+
+    async def download(
+        self,
+        client: WhatsAppClient,
+        tenant_id: str,
+        media_id: str,
+        mime_type: str | None = None,
+        sha256: str | None = None,
+    ) -> MediaFile:
+        """
+        Local copy of an inbound asset. Webhook retries and concurrent calls
+        for the same media_id share one download.
+        """
+        if not media_id.isalnum():
+            raise ValueError(f"unexpected media id {media_id!r}")
+        path = os.path.join(self.root, str(tenant_id), media_id + _extension(mime_type))
+        loop = asyncio.get_running_loop()
+        size = await loop.run_in_executor(self._io, _file_size, path)
+        if size is not None:
+            self.reused += 1
+            return MediaFile(path, mime_type or "", sha256 or "", size)
+        fut = self._inflight.get(media_id)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = self._inflight[media_id] = loop.create_future()
+        try:
+            result = await self._fetch(client, path, media_id, mime_type, sha256)
+        except BaseException as e:
+            self.failed += 1
+            fut.set_exception(e)
+            fut.exception()  # consumed here when nobody else waits
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(media_id, None)
+
+    async def _fetch(
+        self,
+        client: WhatsAppClient,
+        path: str,
+        media_id: str,
+        mime_type: str | None,
+        sha256: str | None,
+    ) -> MediaFile:
+        info = await client.media_info(media_id)
+        if int(info.get("file_size") or 0) > self.max_bytes:
+            raise MediaTooLarge(f"media {media_id} is {info['file_size']} bytes")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._io, lambda: os.makedirs(os.path.dirname(path), exist_ok=True)
+        )
+        tmp = f"{path}.{uuid.uuid4().hex}.part"
+        digest, size = await _spool(
+            client.iter_media(info["url"], self.chunk_size),
+            tmp,
+            self._io,
+            self.max_bytes,
+        )
+        expected = info.get("sha256") or sha256
+        if expected and not _sha256_matches(expected, digest):
+            logger.warning(
+                "[media] %s: sha256 differs from Meta's (%s)",
+                media_id,
+                expected,
+                extra={"media_id": media_id},
+            )
+        await loop.run_in_executor(self._io, os.replace, tmp, path)
+        self.downloaded += 1
+        self.bytes += size
+        return MediaFile(path, info.get("mime_type") or mime_type or "", digest, size)
+
+    # --- retention ---
+
+    def _prune_sync(self, now: float) -> int:
+        removed = 0
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                try:
+                    if now - os.path.getmtime(path) > self.retention:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    async def prune(self) -> int:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io, self._prune_sync, time.time())
+
+    async def _run(self):
+        interval = min(max(self.retention / 4, 1.0), 600.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self.prune()
+                if removed:
+                    logger.info("[media] removed %s expired files", removed)
+            except Exception as e:
+                logger.error("[media] prune failed: %s", e)
+
+    def start(self):
+        if self._task is None and self.retention > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "root": self.root,
+            "downloaded": self.downloaded,
+            "reused": self.reused,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "in_flight": len(self._inflight),
+        }
+
+
+def _file_size(path: str) -> int | None:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+async def _iter_url(
+    url: str, chunk_size: int, hosts: list[str], public_only: bool = True
+) -> AsyncIterator[bytes]:
+    # a public asset link: no Graph token goes with it. Redirects are followed
+    # here, not by httpx, so every hop gets the same checks
+    for _ in range(MAX_REDIRECTS + 1):
+        if public_only:
+            await _check_public(url, hosts)
+        async with get_graph_http().stream("GET", url, follow_redirects=False) as r:
+            if public_only:
+                _check_peer(r)
+            if r.is_redirect:
+                url = urljoin(url, r.headers["location"])
+                continue
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes(chunk_size):
+                yield chunk
+            return
+    raise UnsafeMediaLink(f"more than {MAX_REDIRECTS} redirects")
+
+
+class MediaIdCache:
+    """
+    Uploaded media IDs per (phone_number_id, content sha256), plus
+    link -> sha256 so a repeated link isn't fetched again. IDs are used for
+    `id_ttl` seconds (Meta keeps uploads for 30 days); an ID that Meta
+    rejects is dropped and the send goes out with the link.
+
+    Off unless the tenant opts in (upload_options); `public_only` is only
+    turned off by the benchmarks, which serve assets from localhost.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        id_ttl: float,
+        link_ttl: float,
+        chunk_size: int,
+        max_bytes: int,
+        enabled: bool = False,
+        retry_after: float = 60.0,
+        public_only: bool = True,
+    ):
+        self.enabled = enabled  # for tenants without engine.config "upload_media"
+        self.public_only = public_only
+        self.max_entries = max_entries
+        self.id_ttl = id_ttl
+        self.link_ttl = link_ttl
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.retry_after = retry_after
+        self._io = ThreadPoolExecutor(max_workers=2, thread_name_prefix="media-up")
+        # (phone_number_id, sha256) -> (media_id, expires_at)
+        self._ids: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+        # link -> (sha256, expires_at)
+        self._links: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+        # (phone_number_id, link) whose upload failed -> (True, retry_at)
+        self._failed: OrderedDict[tuple[str, str], tuple[bool, float]] = OrderedDict()
+        self.hits = 0
+        self.uploads = 0
+        self.upload_failures = 0
+        self.expired = 0
+        self.rejected = 0
+        self.refused = 0  # unsafe links, sent as links
+
+    @staticmethod
+    def _get(cache: OrderedDict, key, now: float):
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return entry[0]
+
+    def _put(self, cache: OrderedDict, key, value, ttl: float, now: float):
+        cache[key] = (value, now + ttl)
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def lookup(self, phone_number_id: str, link: str) -> str | None:
+        now = time.monotonic()
+        sha = self._get(self._links, link, now)
+        if sha is None:
+            return None
+        key = (phone_number_id, sha)
+        if key in self._ids and self._ids[key][1] <= now:
+            self.expired += 1
+        return self._get(self._ids, key, now)
+
+    async def resolve(
+        self,
+        client: WhatsAppClient,
+        type_: str,
+        content: dict[str, Any],
+        tenant: dict | None = None,
+    ) -> dict[str, Any] | None:
+        """
+        `content` with the link replaced by a media ID (uploaded now if
+        needed), or None to send it as it is.
+        """
+        link = content.get("link")
+        if type_ not in MEDIA_TYPES or not link or content.get("id"):
+            return None
+        enabled, hosts = upload_options(tenant, self.enabled)
+        if not enabled:
+            return None
+        if self.public_only:
+            try:
+                _check_link(link, hosts)
+            except UnsafeMediaLink as e:
+                self._refuse(link, e)
+                return None
+        pnid = client.phone_number_id
+        media_id = self.lookup(pnid, link)
+        if media_id is None:
+            key = (pnid, link)
+            if self._get(self._failed, key, time.monotonic()):
+                return None
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = self._inflight[key] = asyncio.ensure_future(
+                    self._upload(client, link, content.get("filename"), hosts)
+                )
+                fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+            media_id = await asyncio.shield(fut)
+            if media_id is None:
+                return None
+        else:
+            self.hits += 1
+        body = {k: v for k, v in content.items() if k != "link"}
+        body["id"] = media_id
+        return body
+
+    def _refuse(self, link: str, e: Exception):
+        self.refused += 1
+        logger.warning(
+            "[media] not fetching %s, sending the link: %s",
+            link,
+            e,
+            extra={"category": "media"},
+        )
+
+    async def _upload(
+        self, client: WhatsAppClient, link: str, filename: str | None, hosts: list[str]
+    ) -> str | None:
+        pnid = client.phone_number_id
+        loop = asyncio.get_running_loop()
+        tmp = os.path.join(tempfile.gettempdir(), f"wa-media-{uuid.uuid4().hex}")
+        try:
+            sha, size = await _spool(
+                _iter_url(link, self.chunk_size, hosts, self.public_only),
+                tmp,
+                self._io,
+                self.max_bytes,
+            )
+            now = time.monotonic()
+            self._put(self._links, link, sha, self.link_ttl, now)
+            media_id = self._get(self._ids, (pnid, sha), now)
+            if media_id is not None:
+                self.hits += 1  # same content behind another link
+                return media_id
+            path = urlparse(link).path
+            name = filename or os.path.basename(path) or "media"
+            mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            f = await loop.run_in_executor(self._io, open, tmp, "rb")
+            try:
+                media_id = await client.upload_media(f, mime_type, name)
+            finally:
+                await loop.run_in_executor(self._io, f.close)
+            self._put(self._ids, (pnid, sha), media_id, self.id_ttl, time.monotonic())
+            self.uploads += 1
+            logger.info(
+                "[media] uploaded %s for %s as %s (%s bytes)",
+                link,
+                pnid,
+                media_id,
+                size,
+                extra={"phone_number_id": pnid, "media_id": media_id},
+            )
+            return media_id
+        except Exception as e:
+            # the link still works for Meta: send with it, retry the upload later
+            self._put(
+                self._failed, (pnid, link), True, self.retry_after, time.monotonic()
+            )
+            if isinstance(e, UnsafeMediaLink):
+                self._refuse(link, e)
+                return None
+            self.upload_failures += 1
+            logger.warning(
+                "[media] upload of %s for %s failed, sending the link: %s",
+                link,
+                pnid,
+                e,
+                extra={"phone_number_id": pnid},
+            )
+            return None
+        finally:
+            await loop.run_in_executor(self._io, _unlink, tmp)
+
+    @staticmethod
+    def is_stale(e: Exception) -> bool:
+        return isinstance(e, GraphAPIError) and (
+            e.code in STALE_MEDIA_CODES or e.status_code == 404
+        )
+
+    def invalidate(self, phone_number_id: str, link: str):
+        self.rejected += 1
+        sha = self._links.pop(link, (None,))[0]
+        if sha is not None:
+            self._ids.pop((phone_number_id, sha), None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "media_ids": len(self._ids),
+            "links": len(self._links),
+            "failed_links": len(self._failed),
+            "hits": self.hits,
+            "uploads": self.uploads,
+            "upload_failures": self.upload_failures,
+            "expired": self.expired,
+            "rejected": self.rejected,
+            "refused": self.refused,
+            "in_flight": len(self._inflight),
+        }
+
+
+media_store = MediaStore(
+    settings.MEDIA_DIR,
+    chunk_size=settings.MEDIA_CHUNK_SIZE,
+    max_bytes=settings.MEDIA_MAX_BYTES,
+    retention=settings.MEDIA_RETENTION,
+)
+
+media_ids = MediaIdCache(
+    settings.MEDIA_ID_CACHE_MAX_ENTRIES,
+    id_ttl=settings.MEDIA_ID_TTL,
+    link_ttl=settings.MEDIA_LINK_TTL,
+    chunk_size=settings.MEDIA_CHUNK_SIZE,
+    max_bytes=settings.MEDIA_MAX_BYTES,
+    enabled=settings.MEDIA_UPLOAD_CACHE,
+)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+import time
+from typing import Awaitable, Callable, Iterable
+
+from core.config import settings
+from services.status_tracker import Histogram
+
+# seconds; covers sub-ms ingest stages up to slow LLM calls
+STAGE_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+)
+
+# (name, help, {label: value}, value) from a collector, read at scrape time
+GaugeSample = tuple[str, str, dict[str, str], float]
+Collector = Callable[[], Awaitable[Iterable[GaugeSample]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class HistogramFamily:
+    """Histograms keyed by a tuple of label values (in `labels` order)."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, Histogram] = {}
+
+    def observe(self, value: float, labels: tuple = ()):
+        h = self._series.get(labels)
+        if h is None:
+            h = self._series[labels] = Histogram(self.buckets)
+        h.observe(value)
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, h in self._series.items():
+            running = 0
+            for bound, n in zip((*h.buckets, "+Inf"), h.counts):
+                running += n
+                le = _labels(self.labels, values, f'le="{bound}"')
+                out.append(f"{self.name}_bucket{le} {running}")
+            base = _labels(self.labels, values)
+            out.append(f"{self.name}_sum{base} {h.sum}")
+            out.append(f"{self.name}_count{base} {h.count}")
+        return out
+
+
+class CounterFamily:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, n in self._series.items():
+            out.append(f"{self.name}{_labels(self.labels, values)} {n}")
+        return out
+
+
+class Metrics:
+    """
+    In-process metrics, rendered in Prometheus text format on /metrics.
+
+    Recording is a dict lookup plus a bisect on the event loop (no locks, no
+    label dicts); gauges (queue depth, executor, ...) are only computed when
+    scraped, by collectors registered at startup.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._families: list = []
+        self._collectors: list[Collector] = []
+
+    def histogram(
+        self, name: str, help: str, labels: tuple[str, ...] = (), buckets=STAGE_BUCKETS
+    ) -> HistogramFamily:
+        family = HistogramFamily(name, help, labels, buckets)
+        self._families.append(family)
+        return family
+
+    def counter(
+        self, name: str, help: str, labels: tuple[str, ...] = ()
+    ) -> CounterFamily:
+        family = CounterFamily(name, help, labels)
+        self._families.append(family)
+        return family
+
+    def observe(self, family: HistogramFamily, start: float, labels: tuple = ()):
+        """Records perf_counter() - `start` seconds."""
+        if self.enabled:
+            family.observe(time.perf_counter() - start, labels)
+
+    def inc(self, family: CounterFamily, labels: tuple = (), amount: float = 1):
+        if self.enabled:
+            family.inc(labels, amount)
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Collector):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    async def render(self) -> str:
+        lines: list[str] = []
+        for family in self._families:
+            lines.extend(family.render())
+        gauges: dict[str, tuple[str, list[str]]] = {}
+        for collector in self._collectors:
+            for name, help, labels, value in await collector():
+                series = gauges.setdefault(name, (help, []))[1]
+                names = tuple(labels)
+                series.append(f"{name}{_labels(names, tuple(labels.values()))} {value}")
+        for name, (help, series) in gauges.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(series)
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(enabled=settings.METRICS_ENABLED)
+
+WEBHOOK_STAGE = metrics.histogram(
+    "whatsapp_webhook_stage_seconds",
+    "receive_webhook stages: parse, tenant_lookup, signature, enqueue, total",
+    ("stage", "kind"),
+)
+WEBHOOKS = metrics.counter(
+    "whatsapp_webhooks_total",
+    "Webhook deliveries by outcome (status, events, shed, ignored, invalid, forbidden)",
+    ("outcome",),
+)
+SHED_JOBS = metrics.counter(
+    "whatsapp_webhook_jobs_shed_total",
+    "Webhook jobs dead-lettered at ingest because the work queue was full",
+    ("tenant",),
+)
+PROCESS_STAGE = metrics.histogram(
+    "whatsapp_process_stage_seconds",
+    "process_events stages: engine_lookup, conversations, total",
+    ("stage", "tenant"),
+)
+MESSAGES = metrics.counter(
+    "whatsapp_messages_total", "Inbound messages handled", ("tenant", "type")
+)
+DEGRADED = metrics.counter(
+    "whatsapp_degraded_conversations_total",
+    "Conversations answered by rules instead of the tenant's engine (admission)",
+    ("tenant",),
+)
+ENGINE_REPLY = metrics.histogram(
+    "whatsapp_engine_reply_seconds",
+    "ResponseEngine reply time (streams: until the last chunk)",
+    ("tenant", "engine", "type", "outcome"),
+)
+ENGINE_FIRST_CHUNK = metrics.histogram(
+    "whatsapp_engine_first_chunk_seconds",
+    "Streamed replies: time to the first sendable chunk",
+    ("tenant", "engine"),
+)
+GRAPH_SEND = metrics.histogram(
+    "whatsapp_graph_send_seconds",
+    "WhatsAppClient.send (Graph API call) time",
+    ("tenant", "type", "outcome"),
+)
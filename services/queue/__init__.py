@@ -0,0 +1,27 @@
+from core.config import settings
+from .base import Job, WorkQueue
+from .consumer import QueueConsumers
+from .memory import MemoryQueue
+from .sqlite import SQLiteQueue
+
+
+def build_queue() -> WorkQueue:
+    backend = settings.QUEUE_BACKEND
+    if backend == "memory":
+        return MemoryQueue(maxsize=settings.QUEUE_MAX_SIZE)
+    if backend == "sqlite":
+        return SQLiteQueue(
+            settings.QUEUE_SQLITE_PATH,
+            visibility_timeout=settings.QUEUE_VISIBILITY_TIMEOUT,
+        )
+    raise ValueError(f"Unsupported queue backend: {backend}")
+
+
+__all__ = [
+    "Job",
+    "WorkQueue",
+    "MemoryQueue",
+    "SQLiteQueue",
+    "QueueConsumers",
+    "build_queue",
+]
@@ -0,0 +1,58 @@
+from __future__ import annotations
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Collection
+
+
+@dataclass
+class Job:
+    id: str
+    payload: dict[str, Any]
+    attempts: int = 0  # deliveries so far, including the current one
+    enqueued_at: float = field(default_factory=time.time)
+
+
+class WorkQueue(ABC):
+    """
+    At-least-once work queue. A job handed out by get() stays leased until it
+    is ack()'d, nack()'d (redelivered after `delay`) or dead_letter()'d.
+    get() hands out the oldest ready job by enqueue time, so a job that comes
+    back (defer, retry) keeps its place ahead of newer ones.
+    """
+
+    @abstractmethod
+    async def put(self, payload: dict[str, Any]) -> str: ...
+
+    async def try_put(self, payload: dict[str, Any]) -> str | None:
+        """put() without waiting for room: None when a bounded queue is full."""
+        return await self.put(payload)
+
+    @abstractmethod
+    async def get(self, skip: Collection[str] = ()) -> Job:
+        """Leases the oldest ready job whose payload "tenant_id" isn't in
+        `skip`. `skip` is re-read whenever the wait is woken (see wake())."""
+
+    @abstractmethod
+    async def ack(self, job: Job) -> None: ...
+
+    @abstractmethod
+    async def nack(self, job: Job, error: str, delay: float) -> None: ...
+
+    @abstractmethod
+    async def defer(self, job: Job, delay: float) -> None:
+        """Hands a leased job back unprocessed, redelivered after `delay`; the
+        delivery doesn't count as an attempt."""
+
+    @abstractmethod
+    async def dead_letter(self, job: Job, error: str) -> None: ...
+
+    @abstractmethod
+    async def stats(self) -> dict[str, Any]: ...
+
+    def wake(self) -> None:
+        """Makes waiting get() calls look again, e.g. after `skip` shrank."""
+        return None
+
+    async def close(self) -> None:
+        return None
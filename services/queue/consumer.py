@@ -0,0 +1,162 @@
+from __future__ import annotations
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from .base import Job, WorkQueue
+from logger import logger
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[None]]
+# tenant_id -> max jobs of that tenant in progress (None: the default)
+TenantLimit = Callable[[str], Optional[int]]
+# awaited by consumer N before it takes a job (admission control)
+Admit = Callable[[int], Awaitable[None]]
+
+
+class QueueConsumers:
+    """
+    Fixed pool of async consumers draining a WorkQueue.
+    - ack on success
+    - on failure: redeliver with exponential backoff + jitter, then dead-letter
+      after `max_attempts` deliveries
+    - with `tenant_limit`, at most that many jobs per tenant (payload
+      "tenant_id") run at once so one busy tenant can't occupy every consumer;
+      get() skips a tenant at its cap, so its jobs wait in the queue in
+      enqueue order (messages of one sender stay in order) until a slot frees
+    - with `admit`, each consumer awaits admit(index) before taking a job
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        handler: JobHandler,
+        concurrency: int = 16,
+        max_attempts: int = 5,
+        retry_base: float = 1.0,
+        retry_max: float = 300.0,
+        tenant_limit: int = 0,
+        limit_for: TenantLimit | None = None,
+        admit: Admit | None = None,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.tenant_limit = tenant_limit
+        self.limit_for = limit_for
+        self.admit = admit
+        self._tasks: list[asyncio.Task] = []
+        self._active: dict[str, int] = {}
+        self._full: set[str] = set()  # tenants at their cap, skipped by get()
+        self.deferred = 0
+        self.busy = 0
+        self.processed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.last_lag_s = 0.0  # enqueue -> start of processing, last job
+
+    def start(self):
+        for i in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._run(i), name=f"consumer-{i}"))
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.retry_max, self.retry_base * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _limit(self, tenant_id: str) -> int:
+        if self.limit_for is not None:
+            return self.limit_for(tenant_id) or self.tenant_limit
+        return self.tenant_limit
+
+    async def _run(self, index: int = 0):
+        while True:
+            if self.admit is not None:
+                await self.admit(index)
+            job = await self.queue.get(self._full)
+            tenant_id = job.payload.get("tenant_id")
+            if not self.tenant_limit or tenant_id is None:
+                await self._run_job(job)
+                continue
+            limit = self._limit(tenant_id)
+            active = self._active.get(tenant_id, 0)
+            if active >= limit:
+                # claimed before the tenant filled up (sqlite claims run off the
+                # loop) or its limit dropped: hand it back, it keeps its place
+                self.deferred += 1
+                self._full.add(tenant_id)
+                await self.queue.defer(job, 0)
+                continue
+            self._active[tenant_id] = active + 1
+            if active + 1 >= limit:
+                self._full.add(tenant_id)
+            try:
+                await self._run_job(job)
+            finally:
+                self._active[tenant_id] -= 1
+                if not self._active[tenant_id]:
+                    del self._active[tenant_id]
+                if tenant_id in self._full:
+                    self._full.discard(tenant_id)
+                    self.queue.wake()
+
+    async def _run_job(self, job: Job):
+        self.busy += 1
+        try:
+            await self._handle(job)
+        finally:
+            self.busy -= 1
+
+    async def _handle(self, job: Job):
+        self.last_lag_s = max(time.time() - job.enqueued_at, 0.0)
+        try:
+            await self.handler(job.payload)
+        except asyncio.CancelledError:
+            # shutting down: leave the lease to expire so the job is redelivered
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job.attempts >= self.max_attempts:
+                self.dead_lettered += 1
+                logger.error(
+                    "[queue] job %s dead-lettered after %s attempts: %s",
+                    job.id,
+                    job.attempts,
+                    error,
+                )
+                await self.queue.dead_letter(job, error)
+            else:
+                self.retried += 1
+                delay = self.backoff(job.attempts)
+                logger.warning(
+                    "[queue] job %s failed (attempt %s), retrying in %.1fs: %s",
+                    job.id,
+                    job.attempts,
+                    delay,
+                    error,
+                )
+                await self.queue.nack(job, error, delay)
+            return
+        self.processed += 1
+        await self.queue.ack(job)
+
+    async def stats(self) -> dict[str, Any]:
+        return {
+            **(await self.queue.stats()),
+            "consumers": self.concurrency,
+            "busy": self.busy,
+            "processed": self.processed,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "last_lag_s": round(self.last_lag_s, 3),
+            "deferred": self.deferred,
+            "tenants_at_cap": sum(n >= self._limit(t) for t, n in self._active.items()),
+        }
@@ -0,0 +1,125 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import time
+import uuid
+from collections import deque
+from typing import Any, Collection
+
+from .base import Job, WorkQueue
+
+
+class MemoryQueue(WorkQueue):
+    """
+    Bounded in-process queue. put() waits while `maxsize` jobs are in the system
+    (ready, leased or awaiting retry); try_put() returns None instead, so the
+    webhook can ack and shed rather than hang.
+    Not durable: pending jobs are lost on restart (use SQLiteQueue for that).
+    Ready jobs are kept per tenant, each a heap on enqueue order.
+    """
+
+    def __init__(self, maxsize: int = 10000, dead_letter_size: int = 1000):
+        self._ready: dict[Any, list[tuple[int, Job]]] = {}
+        self._ready_count = 0
+        self._changed = asyncio.Event()
+        self._seq = itertools.count()
+        self._order: dict[str, int] = {}  # job id -> enqueue sequence
+        self._slots = asyncio.Semaphore(maxsize)
+        self._leased: dict[str, Job] = {}
+        self._delayed = 0
+        self._dead: deque[dict[str, Any]] = deque(maxlen=dead_letter_size)
+        self._dead_total = 0
+
+    async def put(self, payload: dict[str, Any]) -> str:
+        await self._slots.acquire()
+        job = Job(id=uuid.uuid4().hex, payload=payload)
+        self._order[job.id] = next(self._seq)
+        self._push(job)
+        return job.id
+
+    async def try_put(self, payload: dict[str, Any]) -> str | None:
+        if self._slots.locked():
+            return None
+        return await self.put(payload)
+
+    def _push(self, job: Job):
+        tenant_id = job.payload.get("tenant_id")
+        heapq.heappush(
+            self._ready.setdefault(tenant_id, []), (self._order[job.id], job)
+        )
+        self._ready_count += 1
+        self._changed.set()
+
+    def _pop(self, skip: Collection[str]) -> Job | None:
+        first: list[tuple[int, Job]] | None = None
+        for tenant_id, heap in self._ready.items():
+            if tenant_id in skip:
+                continue
+            if first is None or heap[0][0] < first[0][0]:
+                first, key = heap, tenant_id
+        if first is None:
+            return None
+        _, job = heapq.heappop(first)
+        if not first:
+            del self._ready[key]
+        self._ready_count -= 1
+        return job
+
+    async def get(self, skip: Collection[str] = ()) -> Job:
+        while (job := self._pop(skip)) is None:
+            self._changed.clear()
+            await self._changed.wait()
+        job.attempts += 1
+        self._leased[job.id] = job
+        return job
+
+    def wake(self) -> None:
+        self._changed.set()
+
+    async def ack(self, job: Job) -> None:
+        if self._leased.pop(job.id, None):
+            self._order.pop(job.id, None)
+            self._slots.release()
+
+    async def nack(self, job: Job, error: str, delay: float) -> None:
+        self._redeliver(job, delay)
+
+    async def defer(self, job: Job, delay: float) -> None:
+        job.attempts -= 1
+        self._redeliver(job, delay)
+
+    def _redeliver(self, job: Job, delay: float):
+        self._leased.pop(job.id, None)
+        self._delayed += 1
+
+        def _requeue():
+            self._delayed -= 1
+            self._push(job)
+
+        # the job keeps its slot while it waits for redelivery
+        asyncio.get_running_loop().call_later(max(delay, 0.0), _requeue)
+
+    async def dead_letter(self, job: Job, error: str) -> None:
+        if self._leased.pop(job.id, None):
+            self._order.pop(job.id, None)
+            self._slots.release()
+        self._dead_total += 1
+        self._dead.append(
+            {
+                "id": job.id,
+                "attempts": job.attempts,
+                "error": error,
+                "payload": job.payload,
+                "dead_at": time.time(),
+            }
+        )
+
+    async def stats(self) -> dict[str, Any]:
+        return {
+            "backend": "memory",
+            "ready": self._ready_count,
+            "leased": len(self._leased),
+            "delayed": self._delayed,
+            "dead_letters": self._dead_total,
+        }
@@ -0,0 +1,236 @@
+from __future__ import annotations
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Collection
+
+from .base import Job, WorkQueue
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    payload      TEXT NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    enqueued_at  REAL NOT NULL,
+    available_at REAL NOT NULL,
+    leased       INTEGER NOT NULL DEFAULT 0,
+    last_error   TEXT,
+    tenant_id    TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_available ON jobs (available_at);
+CREATE INDEX IF NOT EXISTS jobs_enqueued ON jobs (enqueued_at);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id          TEXT PRIMARY KEY,
+    payload     TEXT NOT NULL,
+    attempts    INTEGER NOT NULL,
+    enqueued_at REAL NOT NULL,
+    dead_at     REAL NOT NULL,
+    error       TEXT
+);
+"""
+
+
+class SQLiteQueue(WorkQueue):
+    """
+    Durable queue on a SQLite file in WAL mode; survives restarts and can be
+    shared by several gunicorn workers on one host.
+
+    Leasing works like a visibility timeout: get() pushes `available_at` forward
+    by `visibility_timeout`, so a job whose worker died is redelivered once the
+    lease expires. ack() deletes the row.
+
+    All SQL runs on one dedicated thread, so the default executor is untouched.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: float = 300.0,
+        poll_interval: float = 1.0,
+    ):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-queue")
+        self._conn: sqlite3.Connection | None = None
+        self._wakeup = asyncio.Event()
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, fn, *args)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "tenant_id" not in columns:
+                # files from before per-tenant skipping; old rows are never skipped
+                conn.execute("ALTER TABLE jobs ADD COLUMN tenant_id TEXT")
+            self._conn = conn
+        return self._conn
+
+    # --- sync helpers (executor thread only) ---
+
+    def _put_sync(self, job_id: str, payload: str, tenant_id: str | None, now: float):
+        self._db().execute(
+            "INSERT INTO jobs (id, payload, tenant_id, enqueued_at, available_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (job_id, payload, tenant_id, now, now),
+        )
+
+    def _claim_sync(
+        self, now: float, skip: tuple[str, ...]
+    ) -> tuple[Job | None, float | None]:
+        sql = "SELECT id, payload, attempts, enqueued_at FROM jobs WHERE available_at <= ?"
+        if skip:
+            marks = ", ".join("?" * len(skip))
+            sql += f" AND (tenant_id IS NULL OR tenant_id NOT IN ({marks}))"
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                sql + " ORDER BY enqueued_at LIMIT 1", (now, *skip)
+            ).fetchone()
+            if row is None:
+                # ready jobs of skipped tenants wait for wake()
+                nxt = db.execute(
+                    "SELECT MIN(available_at) FROM jobs WHERE available_at > ?", (now,)
+                ).fetchone()[0]
+                db.execute("COMMIT")
+                return None, nxt
+            job_id, payload, attempts, enqueued_at = row
+            db.execute(
+                "UPDATE jobs SET attempts = attempts + 1, leased = 1, available_at = ? "
+                "WHERE id = ?",
+                (now + self.visibility_timeout, job_id),
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        job = Job(job_id, json.loads(payload), attempts + 1, enqueued_at)
+        return job, None
+
+    def _ack_sync(self, job_id: str):
+        self._db().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def _nack_sync(self, job_id: str, error: str, available_at: float):
+        self._db().execute(
+            "UPDATE jobs SET leased = 0, available_at = ?, last_error = ? WHERE id = ?",
+            (available_at, error, job_id),
+        )
+
+    def _defer_sync(self, job_id: str, available_at: float):
+        self._db().execute(
+            "UPDATE jobs SET leased = 0, available_at = ?, attempts = attempts - 1 "
+            "WHERE id = ?",
+            (available_at, job_id),
+        )
+
+    def _dead_letter_sync(self, job: Job, error: str, now: float):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO dead_letters "
+                "(id, payload, attempts, enqueued_at, dead_at, error) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    json.dumps(job.payload),
+                    job.attempts,
+                    job.enqueued_at,
+                    now,
+                    error,
+                ),
+            )
+            db.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _stats_sync(self, now: float) -> dict[str, Any]:
+        db = self._db()
+        ready, leased, delayed, oldest = db.execute(
+            "SELECT "
+            "COALESCE(SUM(leased = 0 AND available_at <= ?), 0), "
+            "COALESCE(SUM(leased = 1), 0), "
+            "COALESCE(SUM(leased = 0 AND available_at > ?), 0), "
+            "MIN(CASE WHEN leased = 0 THEN enqueued_at END) "
+            "FROM jobs",
+            (now, now),
+        ).fetchone()
+        dead = db.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "ready": ready,
+            "leased": leased,
+            "delayed": delayed,
+            "oldest_ready_age_s": round(now - oldest, 3) if oldest else 0.0,
+            "dead_letters": dead,
+        }
+
+    # --- WorkQueue ---
+
+    async def put(self, payload: dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        await self._run(
+            self._put_sync,
+            job_id,
+            json.dumps(payload),
+            payload.get("tenant_id"),
+            time.time(),
+        )
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, skip: Collection[str] = ()) -> Job:
+        while True:
+            self._wakeup.clear()
+            # copied here: the SQL runs on the executor thread
+            job, next_at = await self._run(self._claim_sync, time.time(), tuple(skip))
+            if job:
+                return job
+            # sleep until woken by put(), wake(), the next delayed job, or the
+            # poll interval (other processes may enqueue into the same file)
+            timeout = self.poll_interval
+            if next_at is not None:
+                timeout = min(timeout, max(next_at - time.time(), 0.0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    async def ack(self, job: Job) -> None:
+        await self._run(self._ack_sync, job.id)
+
+    async def nack(self, job: Job, error: str, delay: float) -> None:
+        await self._run(self._nack_sync, job.id, error, time.time() + delay)
+
+    async def defer(self, job: Job, delay: float) -> None:
+        await self._run(self._defer_sync, job.id, time.time() + delay)
+
+    async def dead_letter(self, job: Job, error: str) -> None:
+        await self._run(self._dead_letter_sync, job, error, time.time())
+
+    async def stats(self) -> dict[str, Any]:
+        return await self._run(self._stats_sync, time.time())
+
+    async def close(self) -> None:
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        await self._run(_close)
+        self._io.shutdown(wait=True)
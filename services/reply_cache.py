@@ -0,0 +1,111 @@
+from __future__ import annotations
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from core.config import settings
+
+_PUNCT = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+# dropped from fuzzy keys: they rarely change what is being asked
+_STOPWORDS = frozenset(
+    "a al con de del el en es la las lo los me mi para por que se su te tu un una y "
+    "an and are at do does for i is it me my of on the to what you your".split()
+)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, accents and punctuation stripped, whitespace collapsed."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _SPACES.sub(" ", _PUNCT.sub(" ", text)).strip()
+
+
+def fuzzy_key(normalized: str) -> str:
+    """
+    Order-insensitive key from the normalized tokens, minus stopwords and a
+    plural "s" ("¿Cuál es el horario?" / "horarios cual" -> "cual horario").
+    """
+    tokens = set()
+    for tok in normalized.split():
+        if tok in _STOPWORDS:
+            continue
+        if len(tok) > 3 and tok.endswith("s"):
+            tok = tok[:-1]
+        tokens.add(tok)
+    return " ".join(sorted(tokens))
+
+
+class ReplyCache:
+    """
+    TTL + LRU map of (tenant_id, engine fingerprint, key) -> reply text,
+    shared by all tenants' CachedEngines. Counters are kept per tenant.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str, str], tuple[float, str]] = (
+            OrderedDict()
+        )
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def count(self, tenant_id: str, what: str):
+        counters = self._stats.get(tenant_id)
+        if counters is None:
+            counters = self._stats[tenant_id] = {
+                "hits": 0,
+                "fuzzy_hits": 0,
+                "misses": 0,
+                "bypassed": 0,
+            }
+        counters[what] += 1
+
+    def get(self, key: tuple[str, str, str]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: tuple[str, str, str], reply: str, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tenant_id: str) -> int:
+        keys = [k for k in self._entries if k[0] == tenant_id]
+        for k in keys:
+            del self._entries[k]
+        return len(keys)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self, tenant_id: str | None = None) -> dict:
+        if tenant_id is not None:
+            return dict(self._stats.get(tenant_id) or {})
+        totals = {"hits": 0, "fuzzy_hits": 0, "misses": 0, "bypassed": 0}
+        for counters in self._stats.values():
+            for k, v in counters.items():
+                totals[k] += v
+        lookups = totals["hits"] + totals["fuzzy_hits"] + totals["misses"]
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            **totals,
+            "hit_ratio": (
+                round((totals["hits"] + totals["fuzzy_hits"]) / lookups, 3)
+                if lookups
+                else None
+            ),
+            "tenants": {t: dict(c) for t, c in self._stats.items()},
+        }
+
+
+reply_cache = ReplyCache(max_entries=settings.REPLY_CACHE_MAX_ENTRIES)
@@ -0,0 +1,298 @@
+from __future__ import annotations
+import asyncio
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from core.config import settings
+from services.fair_scheduler import fair_scheduler
+from services.keyed_locks import KeyedLocks
+from services.media import MEDIA_TYPES, media_ids
+from services.metrics import GRAPH_SEND, metrics
+from services.whatsapp_client import GraphAPIError, WhatsAppClient
+from logger import logger
+
+# Meta error codes that mean "slow down" (throughput / pair rate / spam rate)
+RATE_LIMIT_CODES = {4, 80007, 130429, 131048, 131056}
+
+PRIORITY_CONVERSATIONAL = 0
+PRIORITY_BULK = 10
+
+
+def is_rate_limited(e: Exception) -> bool:
+    return isinstance(e, GraphAPIError) and (
+        e.status_code == 429 or e.code in RATE_LIMIT_CODES
+    )
+
+
+class TokenBucket:
+    """Classic token bucket; `rate` tokens/s, up to `burst` stored."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until one token is available (0 if available now)."""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    async def acquire(self):
+        while (wait := self.delay()) > 0:
+            await asyncio.sleep(wait)
+        self.take()
+
+    def refund(self):
+        """Gives back a token taken for work that was dropped."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+@dataclass(order=True)
+class _SendItem:
+    priority: int
+    seq: int
+    client: WhatsAppClient = field(compare=False)
+    to: str = field(compare=False)
+    type_: str = field(compare=False)
+    content: dict[str, Any] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    tenant: dict | None = field(compare=False, default=None)
+    started: bool = field(compare=False, default=False)  # Graph call made
+
+
+class _NumberLane:
+    """Priority queue + token bucket + dispatcher task for one phone_number_id."""
+
+    def __init__(self, phone_number_id: str, rate: float, burst: float):
+        self.phone_number_id = phone_number_id
+        self.bucket = TokenBucket(rate, burst)
+        self.queue: asyncio.PriorityQueue[_SendItem] = asyncio.PriorityQueue()
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.cancelled = 0  # dropped before sending: the caller went away
+        self.task: asyncio.Task | None = None
+        self.sends: set[asyncio.Task] = set()
+
+
+class SendScheduler:
+    """
+    Outbound scheduler keyed by phone_number_id.
+    - per-number token bucket (Meta's messages/s ceiling)
+    - per-recipient pacing (pair rate limit); sends to one recipient stay in order
+    - conversational replies (priority 0) go ahead of bulk sends (priority 10)
+    - rate-limit responses are retried with jittered exponential backoff
+    """
+
+    def __init__(
+        self,
+        number_rate: float = 80.0,
+        number_burst: float = 80.0,
+        pair_rate: float = 1.0,
+        pair_burst: float = 10.0,
+        max_retries: int = 5,
+        retry_base: float = 1.0,
+        retry_max: float = 60.0,
+    ):
+        self.number_rate = number_rate
+        self.number_burst = number_burst
+        self.pair_rate = pair_rate
+        self.pair_burst = pair_burst
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._lanes: dict[str, _NumberLane] = {}
+        self._pairs: dict[tuple[str, str], TokenBucket] = {}
+        self._recipient_locks = KeyedLocks()
+        self._seq = itertools.count()
+
+    def _lane(self, phone_number_id: str) -> _NumberLane:
+        lane = self._lanes.get(phone_number_id)
+        if lane is None or lane.task is None or lane.task.done():
+            if lane is None:
+                lane = _NumberLane(phone_number_id, self.number_rate, self.number_burst)
+                self._lanes[phone_number_id] = lane
+            lane.task = asyncio.create_task(self._dispatch(lane))
+        return lane
+
+    def _pair(self, phone_number_id: str, to: str) -> TokenBucket:
+        key = (phone_number_id, to)
+        bucket = self._pairs.get(key)
+        if bucket is None:
+            if len(self._pairs) > 50000:
+                # drop recipients whose bucket is full again (nothing to pace)
+                self._pairs = {k: b for k, b in self._pairs.items() if not b.idle()}
+            bucket = self._pairs[key] = TokenBucket(self.pair_rate, self.pair_burst)
+        return bucket
+
+    async def send(
+        self,
+        client: WhatsAppClient,
+        to: str,
+        type_: str,
+        content: dict[str, Any],
+        priority: int = PRIORITY_CONVERSATIONAL,
+        tenant: dict | None = None,
+    ):
+        """
+        Queue a send and wait for its Graph API result (or exception).
+        `tenant` (tenant config) gives the send its tenant's fair share/limits.
+        Media sent by link go out by an uploaded media ID if the tenant opted
+        in (services.media).
+        """
+        if type_ in MEDIA_TYPES:
+            by_id = await media_ids.resolve(client, type_, content, tenant)
+            if by_id is not None:
+                try:
+                    return await self._send(client, to, type_, by_id, priority, tenant)
+                except Exception as e:
+                    if not media_ids.is_stale(e):
+                        raise
+                    media_ids.invalidate(client.phone_number_id, content["link"])
+        return await self._send(client, to, type_, content, priority, tenant)
+
+    async def _send(
+        self,
+        client: WhatsAppClient,
+        to: str,
+        type_: str,
+        content: dict[str, Any],
+        priority: int,
+        tenant: dict | None,
+    ):
+        pnid = client.phone_number_id
+        # one send at a time per recipient keeps chunks/replies ordered
+        async with self._recipient_locks.hold((pnid, to)):
+            await self._pair(pnid, to).acquire()
+            for attempt in range(self.max_retries + 1):
+                fut = asyncio.get_running_loop().create_future()
+                item = _SendItem(
+                    priority, next(self._seq), client, to, type_, content, fut, tenant
+                )
+                lane = self._lane(pnid)
+                lane.queue.put_nowait(item)
+                try:
+                    return await fut
+                except asyncio.CancelledError:
+                    if not item.started:
+                        # superseded before it went out: don't use up the pair
+                        self._pair(pnid, to).refund()
+                    raise
+                except Exception as e:
+                    if not is_rate_limited(e) or attempt >= self.max_retries:
+                        raise
+                    lane.rate_limited += 1
+                    delay = min(self.retry_max, self.retry_base * 2**attempt)
+                    delay *= random.uniform(0.5, 1.5)
+                    logger.warning(
+                        "[send] rate limited on %s (code=%s), retry %s in %.1fs",
+                        pnid,
+                        e.code,
+                        attempt + 1,
+                        delay,
+                    )
+                    await asyncio.sleep(delay)
+
+    async def _dispatch(self, lane: _NumberLane):
+        while True:
+            item = await lane.queue.get()
+            if item.future.cancelled():
+                lane.cancelled += 1
+                continue
+            wait = lane.bucket.delay()
+            if wait > 0:
+                # put it back so a higher-priority send that arrives while we
+                # wait for a token is picked first
+                lane.queue.put_nowait(item)
+                await asyncio.sleep(wait)
+                continue
+            lane.bucket.take()
+            lane.in_flight += 1
+            task = asyncio.create_task(self._execute(lane, item))
+            lane.sends.add(task)
+            task.add_done_callback(lane.sends.discard)
+
+    async def _execute(self, lane: _NumberLane, item: _SendItem):
+        key = str(item.tenant["tenant_id"]) if item.tenant else lane.phone_number_id
+        start = None
+        try:
+            async with fair_scheduler.send_slot(key, item.tenant):
+                if item.future.cancelled():
+                    # cancelled while waiting for a slot
+                    lane.cancelled += 1
+                    lane.bucket.refund()
+                    return
+                item.started = True
+                start = time.perf_counter()
+                result = await item.client.send(item.to, item.type_, item.content)
+        except Exception as e:
+            lane.failed += 1
+            limited = is_rate_limited(e)
+            if start is not None:
+                outcome = "rate_limited" if limited else "error"
+                metrics.observe(GRAPH_SEND, start, (key, item.type_, outcome))
+            if limited:
+                # back off the whole number, not just this recipient
+                lane.bucket.tokens = min(lane.bucket.tokens, 0.0)
+            if not item.future.done():
+                item.future.set_exception(e)
+        else:
+            metrics.observe(GRAPH_SEND, start, (key, item.type_, "ok"))
+            lane.sent += 1
+            if not item.future.done():
+                item.future.set_result(result)
+        finally:
+            lane.in_flight -= 1
+
+    async def close(self):
+        tasks = [lane.task for lane in self._lanes.values() if lane.task]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._lanes.clear()
+
+    def stats(self) -> dict:
+        return {
+            "numbers": {
+                pnid: {
+                    "queued": lane.queue.qsize(),
+                    "in_flight": lane.in_flight,
+                    "sent": lane.sent,
+                    "failed": lane.failed,
+                    "rate_limited": lane.rate_limited,
+                    "cancelled": lane.cancelled,
+                    "tokens": round(lane.bucket.tokens, 2),
+                }
+                for pnid, lane in self._lanes.items()
+            },
+            "recipients_paced": len(self._pairs),
+        }
+
+
+send_scheduler = SendScheduler(
+    number_rate=settings.SEND_RATE_PER_NUMBER,
+    number_burst=settings.SEND_BURST_PER_NUMBER,
+    pair_rate=settings.SEND_PAIR_RATE,
+    pair_burst=settings.SEND_PAIR_BURST,
+    max_retries=settings.SEND_MAX_RETRIES,
+    retry_base=settings.SEND_RETRY_BASE,
+)
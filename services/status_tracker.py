@@ -0,0 +1,223 @@
+from __future__ import annotations
+import asyncio
+import time
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from core.config import settings
+from logger import logger
+
+# lifecycle order; a later status never moves a message back
+STATUS_RANK = {"sent": 1, "delivered": 2, "read": 3, "failed": 4}
+
+# seconds from "sent" to "delivered"/"read"
+LATENCY_BUCKETS = (1, 2, 5, 10, 30, 60, 300, 900, 3600, 21600, 86400)
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus-style cumulative buckets on export)."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        cumulative, running = {}, 0
+        for bound, n in zip((*self.buckets, "+Inf"), self.counts):
+            running += n
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "count": self.count, "sum": round(self.sum, 3)}
+
+
+class _MessageState:
+    __slots__ = ("status", "recipient", "sent", "delivered", "read", "failed", "error")
+
+    def __init__(self):
+        self.status = ""
+        self.recipient: Optional[str] = None
+        self.sent: Optional[int] = None
+        self.delivered: Optional[int] = None
+        self.read: Optional[int] = None
+        self.failed: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class _TenantDeliveries:
+    def __init__(self):
+        self.messages: OrderedDict[str, _MessageState] = OrderedDict()
+        self.statuses: Counter = Counter()
+        self.failures: Counter = Counter()  # Graph error code -> count
+        self.latency = {"delivered": Histogram(), "read": Histogram()}
+        self.since_flush: Counter = Counter()
+        self.evicted = 0
+
+
+class StatusTracker:
+    """
+    Delivery state for outbound messages, fed by webhook status callbacks.
+
+    record() only appends to an in-memory buffer; the buffer is applied in
+    batches (every `flush_interval` seconds, or early once `max_buffer` events
+    are waiting) and one aggregate log line per tenant replaces the per-status
+    log lines. Per tenant, the state of the last `max_messages` message ids is
+    kept (oldest first out), so lookups are O(1) and memory is bounded.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = 100000,
+        flush_interval: float = 10.0,
+        max_buffer: int = 5000,
+    ):
+        self.max_messages = max_messages
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: list[tuple] = []
+        self._tenants: dict[str, _TenantDeliveries] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+
+    def record(
+        self,
+        tenant_id: str,
+        message_id: str,
+        status: str,
+        timestamp: int | str | None = None,
+        recipient: str | None = None,
+        error_code: str | int | None = None,
+    ):
+        self._buffer.append(
+            (tenant_id, message_id, status, timestamp, recipient, error_code)
+        )
+        self.recorded += 1
+        if len(self._buffer) >= self.max_buffer:
+            self.apply()
+
+    def record_status(self, tenant_id: str, status: dict):
+        """Records one raw `statuses[]` entry from a webhook."""
+        errors = status.get("errors") or []
+        self.record(
+            tenant_id,
+            status.get("id"),
+            status.get("status"),
+            status.get("timestamp"),
+            status.get("recipient_id"),
+            errors[0].get("code") if errors else None,
+        )
+
+    def apply(self):
+        """Folds buffered events into the per-message state and aggregates."""
+        batch, self._buffer = self._buffer, []
+        for tenant_id, message_id, status, ts, recipient, error_code in batch:
+            if not message_id or status not in STATUS_RANK:
+                continue
+            t = self._tenants.get(tenant_id)
+            if t is None:
+                t = self._tenants[tenant_id] = _TenantDeliveries()
+            state = t.messages.get(message_id)
+            if state is None:
+                state = t.messages[message_id] = _MessageState()
+                if len(t.messages) > self.max_messages:
+                    t.messages.popitem(last=False)
+                    t.evicted += 1
+            elif getattr(state, status) is not None:
+                continue  # Meta repeats callbacks
+            try:
+                ts = int(ts)
+            except (TypeError, ValueError):
+                ts = int(time.time())
+            setattr(state, status, ts)
+            if STATUS_RANK[status] > STATUS_RANK.get(state.status, 0):
+                state.status = status
+            if recipient:
+                state.recipient = recipient
+            if error_code is not None:
+                state.error = str(error_code)
+                t.failures[state.error] += 1
+            t.statuses[status] += 1
+            t.since_flush[status] += 1
+
+            # callbacks may arrive out of order: time each pair once, as soon
+            # as both ends are known
+            if status == "sent":
+                for kind in ("delivered", "read"):
+                    if getattr(state, kind) is not None:
+                        t.latency[kind].observe(max(0, getattr(state, kind) - ts))
+            elif status in ("delivered", "read") and state.sent is not None:
+                t.latency[status].observe(max(0, ts - state.sent))
+
+    def flush(self):
+        self.apply()
+        for tenant_id, t in self._tenants.items():
+            if t.since_flush:
+                counts = " ".join(f"{k}={v}" for k, v in sorted(t.since_flush.items()))
+                logger.info(
+                    "[%s] statuses: %s",
+                    tenant_id,
+                    counts,
+                    extra={"tenant_id": tenant_id},
+                )
+                t.since_flush.clear()
+
+    def get(self, tenant_id: str, message_id: str) -> Optional[dict]:
+        self.apply()
+        t = self._tenants.get(tenant_id)
+        state = t.messages.get(message_id) if t else None
+        return state.to_dict() if state else None
+
+    def stats(self, tenant_id: str | None = None) -> dict:
+        self.apply()
+        tenants = {}
+        for tid, t in self._tenants.items():
+            if tenant_id and tid != tenant_id:
+                continue
+            tenants[tid] = {
+                "tracked": len(t.messages),
+                "evicted": t.evicted,
+                "statuses": dict(t.statuses),
+                "failure_codes": dict(t.failures),
+                "latency_s": {k: h.to_dict() for k, h in t.latency.items()},
+            }
+        return {"recorded": self.recorded, "tenants": tenants}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("[statuses] flush failed: %s", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+
+status_tracker = StatusTracker(
+    max_messages=settings.STATUS_TRACK_MAX_MESSAGES,
+    flush_interval=settings.STATUS_FLUSH_INTERVAL,
+    max_buffer=settings.STATUS_MAX_BUFFER,
+)
@@ -0,0 +1,74 @@
+from __future__ import annotations
+import re
+from typing import AsyncIterator
+
+# WhatsApp text message body limit
+WHATSAPP_TEXT_MAX_CHARS = 4096
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+# end of sentence: terminal punctuation (plus closing quotes/brackets) + whitespace
+_SENTENCE = re.compile(r"[.!?…][\"')\]»]*\s+")
+
+
+class SentenceChunker:
+    """
+    Cuts a stream of text deltas into messages at paragraph breaks, or at
+    sentence ends once at least `min_chars` are buffered. Text running past
+    `max_chars` without a boundary is cut at the last whitespace.
+    """
+
+    def __init__(self, min_chars: int = 80, max_chars: int = WHATSAPP_TEXT_MAX_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buf = ""
+
+    def _cut(self) -> int | None:
+        """End offset of the next complete chunk in the buffer, if any."""
+        buf = self._buf
+        para = _PARAGRAPH.search(buf)
+        if para and para.start() <= self.max_chars:
+            return para.end()
+        for m in _SENTENCE.finditer(buf):
+            if m.end() > self.max_chars:
+                break
+            if m.end() >= self.min_chars:
+                return m.end()
+        if len(buf) > self.max_chars:
+            space = buf.rfind(" ", 0, self.max_chars)
+            return space + 1 if space > 0 else self.max_chars
+        return None
+
+    def feed(self, delta: str) -> list[str]:
+        self._buf = (self._buf + delta).lstrip()
+        out = []
+        while (end := self._cut()) is not None:
+            chunk, self._buf = self._buf[:end].strip(), self._buf[end:].lstrip()
+            if chunk:
+                out.append(chunk)
+        return out
+
+    def flush(self) -> list[str]:
+        rest, self._buf = self._buf.strip(), ""
+        out = []
+        while len(rest) > self.max_chars:
+            space = rest.rfind(" ", 0, self.max_chars)
+            end = space if space > 0 else self.max_chars
+            out.append(rest[:end].strip())
+            rest = rest[end:].strip()
+        if rest:
+            out.append(rest)
+        return out
+
+
+async def chunk_stream(
+    deltas: AsyncIterator[str],
+    min_chars: int = 80,
+    max_chars: int = WHATSAPP_TEXT_MAX_CHARS,
+) -> AsyncIterator[str]:
+    """Yields each message-sized chunk as soon as it is complete."""
+    chunker = SentenceChunker(min_chars, max_chars)
+    async for delta in deltas:
+        for chunk in chunker.feed(delta or ""):
+            yield chunk
+    for chunk in chunker.flush():
+        yield chunk
@@ -1,5 +1,26 @@
 import hmac
 import hashlib
+import json
+from functools import lru_cache
+from typing import NamedTuple
+
+try:  # several times faster than the stdlib decoder on webhook bodies
+    import orjson
+except ImportError:  # pragma: no cover - falls back to json
+    orjson = None
+
+
+def loads(raw: bytes | str):
+    """Parses a JSON body in one pass (orjson when installed). Raises ValueError."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+@lru_cache(maxsize=4096)
+def _hmac_for(app_secret: str) -> "hmac.HMAC":
+    # keyed inner/outer SHA-256 state, computed once per app secret
+    return hmac.new(app_secret.encode("utf-8"), digestmod=hashlib.sha256)
 
 
 def compute_signature_ok(
@@ -8,7 +29,37 @@ def compute_signature_ok(
     if not header_signature or not header_signature.startswith("sha256="):
         return False
     provided = header_signature.split("=", 1)[1]
-    expected = hmac.new(
-        app_secret.encode("utf-8"), raw_body, hashlib.sha256
-    ).hexdigest()
-    return hmac.compare_digest(expected, provided)
+    mac = _hmac_for(app_secret).copy()
+    mac.update(raw_body)
+    return hmac.compare_digest(mac.hexdigest(), provided)
+
+
+class StatusScan(NamedTuple):
+    phone_number_id: str
+    statuses: list[dict]  # raw `statuses[]` entries
+
+
+def scan_status_only(payload: dict) -> StatusScan | None:
+    """
+    Shallow walk of a parsed webhook (entry -> changes -> value keys only).
+    Returns the status entries when the delivery only carries message
+    statuses for one phone number and none reports errors; otherwise None.
+    """
+    phone_number_id = None
+    statuses = []
+    for entry in payload.get("entry") or ():
+        for change in entry.get("changes") or ():
+            value = change.get("value") or {}
+            if change.get("field") != "messages" or "messages" in value:
+                return None
+            pnid = (value.get("metadata") or {}).get("phone_number_id")
+            if not pnid or phone_number_id not in (None, pnid):
+                return None
+            phone_number_id = pnid
+            for st in value.get("statuses") or ():
+                if "errors" in st:
+                    return None
+                statuses.append(st)
+    if not statuses:
+        return None
+    return StatusScan(str(phone_number_id), statuses)
@@ -1,64 +1,165 @@
 from __future__ import annotations
-from functools import lru_cache
-from typing import Any, Optional
-from starlette.concurrency import run_in_threadpool
-from heyoo import WhatsApp
+from collections import OrderedDict
+from typing import Any, AsyncIterator, BinaryIO, Optional
+
+import httpx
+
+from core.config import settings
+from services.http_pool import get_graph_http
+
+
+class GraphAPIError(Exception):
+    """
+    Non-2xx response from the Graph API.
+    `code` is Meta's error code (e.g. 130429 = throughput limit), when present.
+    """
+
+    def __init__(self, status_code: int, payload: Any):
+        self.status_code = status_code
+        self.payload = payload
+        error = (payload or {}).get("error", {}) if isinstance(payload, dict) else {}
+        self.code: Optional[int] = error.get("code")
+        self.message: str = error.get("message") or str(payload)
+        super().__init__(f"Graph API {status_code} (code={self.code}): {self.message}")
 
 
 class WhatsAppClient:
     """
-    Wrapper around heyoo's (sync) WhatsApp client.
-    Methods are exposed as async by running the blocking calls in a thread pool.
+    Native async client for the WhatsApp Cloud API.
+    All instances share one keep-alive HTTP(/2) pool (services.http_pool);
+    an instance only holds its phone_number_id and bearer token.
     One instance per (phone_number_id, token).
     """
 
     def __init__(self, token: str, phone_number_id: str):
-        # per docs: WhatsApp(token, phone_number_id='...')
-        self.messenger = WhatsApp(token, phone_number_id=str(phone_number_id))
+        self.phone_number_id = str(phone_number_id)
+        self.version = settings.GRAPH_API_VERSION
+        self.messages_path = f"/{self.version}/{self.phone_number_id}/messages"
+        self.media_path = f"/{self.version}/{self.phone_number_id}/media"
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return get_graph_http()
+
+    async def _post_message(self, to: str, type_: str, body: Any):
+        data = {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": to,
+            "type": type_,
+            type_: body,
+        }
+        return await self._post(self.messages_path, data)
+
+    async def _post(self, path: str, data: dict[str, Any]):
+        r = await self.http.post(path, json=data, headers=self.headers)
+        return self._payload(r)
+
+    @staticmethod
+    def _payload(r: httpx.Response):
+        try:
+            payload = r.json()
+        except ValueError:
+            payload = {"raw": r.text}
+        if r.status_code >= 400:
+            raise GraphAPIError(r.status_code, payload)
+        return payload
 
-    # --- Typed helpers (async wrappers over sync heyoo) ---
+    @staticmethod
+    def _media(link: Optional[str], **extra: Optional[str]) -> dict[str, Any]:
+        # `media_id` (an uploaded asset) takes the place of the link
+        media_id = extra.pop("media_id", None)
+        body: dict[str, Any] = {"id": media_id} if media_id else {"link": link}
+        body.update({k: v for k, v in extra.items() if v is not None})
+        return body
 
-    async def send_text(self, to: str, body: str):
-        # heyoo README: send_message('Your message', '2557...')
-        return await run_in_threadpool(self.messenger.send_message, body, to)
+    # --- Media ---
 
-    async def send_image(self, to: str, link: str, caption: Optional[str] = None):
-        return await run_in_threadpool(
-            self.messenger.send_image, image=link, recipient_id=to, caption=caption
+    async def media_info(self, media_id: str) -> dict[str, Any]:
+        """{"url", "mime_type", "sha256", "file_size", "id"} of an inbound asset."""
+        r = await self.http.get(
+            f"/{self.version}/{media_id}",
+            params={"phone_number_id": self.phone_number_id},
+            headers=self.headers,
+        )
+        return self._payload(r)
+
+    async def iter_media(self, url: str, chunk_size: int) -> AsyncIterator[bytes]:
+        """Body of a media URL (from media_info) in chunks; never held whole."""
+        async with self.http.stream("GET", url, headers=self.headers) as r:
+            if r.status_code >= 400:
+                await r.aread()
+                self._payload(r)
+            async for chunk in r.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def upload_media(self, file: BinaryIO, mime_type: str, filename: str) -> str:
+        """Uploads an asset for this phone number; returns its media ID."""
+        r = await self.http.post(
+            self.media_path,
+            data={"messaging_product": "whatsapp", "type": mime_type},
+            files={"file": (filename, file, mime_type)},
+            headers=self.headers,
+        )
+        return self._payload(r)["id"]
+
+    # --- Typed helpers ---
+
+    async def send_text(self, to: str, body: str, preview_url: bool = True):
+        return await self._post_message(
+            to, "text", {"preview_url": preview_url, "body": body}
+        )
+
+    async def send_image(
+        self,
+        to: str,
+        link: Optional[str],
+        caption: Optional[str] = None,
+        media_id: Optional[str] = None,
+    ):
+        return await self._post_message(
+            to, "image", self._media(link, caption=caption, media_id=media_id)
         )
 
-    async def send_audio(self, to: str, link: str):
-        return await run_in_threadpool(
-            self.messenger.send_audio, audio=link, recipient_id=to
+    async def send_audio(
+        self, to: str, link: Optional[str], media_id: Optional[str] = None
+    ):
+        return await self._post_message(
+            to, "audio", self._media(link, media_id=media_id)
         )
 
-    async def send_video(self, to: str, link: str, caption: Optional[str] = None):
-        return await run_in_threadpool(
-            self.messenger.send_video, video=link, recipient_id=to, caption=caption
+    async def send_video(
+        self,
+        to: str,
+        link: Optional[str],
+        caption: Optional[str] = None,
+        media_id: Optional[str] = None,
+    ):
+        return await self._post_message(
+            to, "video", self._media(link, caption=caption, media_id=media_id)
         )
 
     async def send_document(
         self,
         to: str,
-        link: str,
+        link: Optional[str],
         filename: Optional[str] = None,
         caption: Optional[str] = None,
+        media_id: Optional[str] = None,
     ):
-        return await run_in_threadpool(
-            self.messenger.send_document,
-            document=link,
-            recipient_id=to,
-            filename=filename,
-            caption=caption,
+        return await self._post_message(
+            to,
+            "document",
+            self._media(link, filename=filename, caption=caption, media_id=media_id),
         )
 
-    async def send_sticker(self, to: str, link: str):
-        send_sticker = getattr(self.messenger, "send_sticker", None)
-        if not send_sticker:
-            raise NotImplementedError(
-                "send_sticker is not available in this heyoo version"
-            )
-        return await run_in_threadpool(send_sticker, sticker=link, recipient_id=to)
+    async def send_sticker(
+        self, to: str, link: Optional[str], media_id: Optional[str] = None
+    ):
+        return await self._post_message(
+            to, "sticker", self._media(link, media_id=media_id)
+        )
 
     async def send_location(
         self,
@@ -68,25 +169,36 @@ class WhatsAppClient:
         name: Optional[str] = None,
         address: Optional[str] = None,
     ):
-        # README uses lat/long keywords
-        return await run_in_threadpool(
-            self.messenger.send_location,
-            lat=latitude,
-            long=longitude,
-            name=name,
-            address=address,
-            recipient_id=to,
+        return await self._post_message(
+            to,
+            "location",
+            {
+                "latitude": latitude,
+                "longitude": longitude,
+                "name": name,
+                "address": address,
+            },
         )
 
+    async def send_contacts(self, to: str, contacts: list[dict[str, Any]]):
+        return await self._post_message(to, "contacts", contacts)
+
     async def send_button(self, to: str, button_payload: dict[str, Any]):
-        return await run_in_threadpool(
-            self.messenger.send_button, recipient_id=to, button=button_payload
-        )
+        # same shape heyoo's create_button() produced: a list message
+        interactive: dict[str, Any] = {
+            "type": "list",
+            "action": button_payload.get("action"),
+        }
+        if button_payload.get("header"):
+            interactive["header"] = {"type": "text", "text": button_payload["header"]}
+        if button_payload.get("body"):
+            interactive["body"] = {"text": button_payload["body"]}
+        if button_payload.get("footer"):
+            interactive["footer"] = {"text": button_payload["footer"]}
+        return await self._post_message(to, "interactive", interactive)
 
     async def send_reply_button(self, to: str, button_payload: dict[str, Any]):
-        return await run_in_threadpool(
-            self.messenger.send_reply_button, recipient_id=to, button=button_payload
-        )
+        return await self._post_message(to, "interactive", button_payload)
 
     async def send_template(
         self,
@@ -95,13 +207,10 @@ class WhatsAppClient:
         lang: str = "en_US",
         components: list[dict] | None = None,
     ):
-        # README: send_template("hello_world", "2557...", components=[], lang="en_US")
-        return await run_in_threadpool(
-            self.messenger.send_template,
-            name,
+        return await self._post_message(
             to,
-            components=components or [],
-            lang=lang,
+            "template",
+            {"name": name, "language": {"code": lang}, "components": components or []},
         )
 
     # --- Generic entrypoint used by the router (/send) ---
@@ -111,26 +220,33 @@ class WhatsAppClient:
             case "text":
                 return await self.send_text(to, content.get("body", ""))
 
+            # media: {"link": ...} or {"id": <uploaded media ID>}
             case "image":
                 return await self.send_image(
-                    to, content["link"], content.get("caption")
+                    to, content.get("link"), content.get("caption"), content.get("id")
                 )
 
             case "audio":
-                return await self.send_audio(to, content["link"])
+                return await self.send_audio(to, content.get("link"), content.get("id"))
 
             case "video":
                 return await self.send_video(
-                    to, content["link"], content.get("caption")
+                    to, content.get("link"), content.get("caption"), content.get("id")
                 )
 
             case "document":
                 return await self.send_document(
-                    to, content["link"], content.get("filename"), content.get("caption")
+                    to,
+                    content.get("link"),
+                    content.get("filename"),
+                    content.get("caption"),
+                    content.get("id"),
                 )
 
             case "sticker":
-                return await self.send_sticker(to, content["link"])
+                return await self.send_sticker(
+                    to, content.get("link"), content.get("id")
+                )
 
             case "location":
                 lat = content.get("latitude", content.get("lat"))
@@ -146,14 +262,7 @@ class WhatsAppClient:
                 )
 
             case "contacts":
-                send_contacts = getattr(self.messenger, "send_contacts", None)
-                if not send_contacts:
-                    raise NotImplementedError(
-                        "send_contacts is not available in this heyoo version"
-                    )
-                return await run_in_threadpool(
-                    send_contacts, contacts=content["contacts"], recipient_id=to
-                )
+                return await self.send_contacts(to, content["contacts"])
 
             case "interactive":
                 # Auto-pick reply vs list buttons
@@ -184,7 +293,25 @@ class WhatsAppClient:
                 raise ValueError(f"Unsupported message type: {type_}")
 
 
-@lru_cache(maxsize=256)
+# phone_number_id -> (token, client); a rotated token replaces the entry
+# instead of leaving the old one cached next to it
+_clients: OrderedDict[str, tuple[str, WhatsAppClient]] = OrderedDict()
+_MAX_CLIENTS = 1024
+
+
 def get_client_for(phone_number_id: str, token: str) -> WhatsAppClient:
     # normalize to strings to avoid cache key mismatches
-    return WhatsAppClient(token=str(token), phone_number_id=str(phone_number_id))
+    phone_number_id, token = str(phone_number_id), str(token)
+    cached = _clients.get(phone_number_id)
+    if cached and cached[0] == token:
+        _clients.move_to_end(phone_number_id)
+        return cached[1]
+    client = WhatsAppClient(token=token, phone_number_id=phone_number_id)
+    _clients[phone_number_id] = (token, client)
+    if len(_clients) > _MAX_CLIENTS:
+        _clients.popitem(last=False)
+    return client
+
+
+def invalidate_client(phone_number_id: str) -> bool:
+    return _clients.pop(str(phone_number_id), None) is not None
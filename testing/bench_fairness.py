@@ -0,0 +1,78 @@
+"""
+Noisy-neighbour check for services.fair_scheduler: one tenant floods the
+engine pool with calls while a quiet tenant sends a trickle. Prints the quiet
+tenant's wait for a slot under a plain shared semaphore (the old behaviour:
+first come, first served) and under FairPool.
+
+    python -m testing.bench_fairness --noisy 400 --quiet 20 --call-ms 50
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("APP_ENV", "bench")
+
+from services.fair_scheduler import FairPool  # noqa: E402
+
+
+async def run(pool_kind: str, args) -> dict[str, list[float]]:
+    waits: dict[str, list[float]] = {"noisy": [], "quiet": []}
+    if pool_kind == "fair":
+        pool = FairPool("bench", args.capacity, args.tenant_limit)
+
+        def slot(tenant):
+            return pool.slot(tenant)
+
+    else:
+        sem = asyncio.Semaphore(args.capacity)
+
+        def slot(tenant):
+            return sem
+
+    async def call(tenant: str):
+        start = time.perf_counter()
+        async with slot(tenant):
+            waits[tenant].append(time.perf_counter() - start)
+            await asyncio.sleep(args.call_ms / 1000)
+
+    async def quiet():
+        calls = []
+        for _ in range(args.quiet):
+            calls.append(asyncio.create_task(call("quiet")))
+            await asyncio.sleep(args.quiet_every_ms / 1000)
+        await asyncio.gather(*calls)
+
+    noisy = [asyncio.create_task(call("noisy")) for _ in range(args.noisy)]
+    await asyncio.sleep(0)  # the flood is queued first
+    await quiet()
+    await asyncio.gather(*noisy)
+    return waits
+
+
+def summary(waits: list[float]) -> str:
+    ms = sorted(w * 1000 for w in waits)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"avg {statistics.mean(ms):8.1f} ms  p95 {p95:8.1f} ms  max {ms[-1]:8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--noisy", type=int, default=400)
+    parser.add_argument("--quiet", type=int, default=20)
+    parser.add_argument("--quiet-every-ms", type=float, default=50)
+    parser.add_argument("--call-ms", type=float, default=50)
+    parser.add_argument("--capacity", type=int, default=24)
+    parser.add_argument("--tenant-limit", type=int, default=8)
+    args = parser.parse_args()
+    for kind in ("shared", "fair"):
+        waits = asyncio.run(run(kind, args))
+        print(f"{kind:6s} quiet: {summary(waits['quiet'])}")
+        print(f"{kind:6s} noisy: {summary(waits['noisy'])}")
+
+
+if __name__ == "__main__":
+    main()
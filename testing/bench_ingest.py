@@ -0,0 +1,209 @@
+"""
+Micro-benchmark of the webhook ingest path: the previous handler
+(body + request.json(), HMAC key schedule per request, full parse and a queue
+job for every delivery) vs routers.whatsapp.ingest_webhook.
+
+    python -m testing.bench_ingest --iterations 20000
+
+Runs in-process with no HTTP server: "handler" numbers time the ingest
+function alone, "asgi" numbers time a full request through FastAPI via
+httpx.ASGITransport (routing, header parsing, response serialisation).
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+
+os.environ.setdefault("APP_ENV", "bench")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI, Header, HTTPException, Request  # noqa: E402
+
+from data.tenants_store import TenantsStore  # noqa: E402
+from logger import logger  # noqa: E402
+from routers import whatsapp  # noqa: E402
+from testing.bench_webhook import message_payload, status_payload  # noqa: E402
+
+SECRET = "bench-secret"
+TENANT = {
+    "tenant_id": "bench-0",
+    "display_name": "Bench",
+    "waba_id": "90000000",
+    "phone_number_id": "10000000",
+    "verify_token": "verify-0",
+    "app_secret": SECRET,
+    "access_token": "token-0",
+    "engine": {"type": "rules", "config": {}},
+}
+
+
+class SinkQueue:
+    """Counts jobs instead of queueing them."""
+
+    def __init__(self):
+        self.jobs = 0
+
+    async def put(self, payload: dict):
+        self.jobs += 1
+
+
+def legacy_signature_ok(
+    raw_body: bytes, header_signature: str | None, app_secret: str
+) -> bool:
+    if not header_signature or not header_signature.startswith("sha256="):
+        return False
+    provided = header_signature.split("=", 1)[1]
+    expected = hmac.new(
+        app_secret.encode("utf-8"), raw_body, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, provided)
+
+
+async def legacy_ingest(store, queue, raw: bytes, signature: str | None) -> dict:
+    payload = json.loads(raw)
+    resolved: dict[tuple, object] = {}
+    jobs = []
+    for unit in whatsapp.extract_units(payload):
+        key = (unit["phone_number_id"], unit["waba_id"])
+        if key not in resolved:
+            resolved[key] = await whatsapp.resolve_tenant(store, *key)
+        tenant = resolved[key]
+        if not tenant:
+            continue
+        jobs.append(
+            {
+                "tenant_id": tenant.tenant_id,
+                "phone_number_id": tenant.phone_number_id,
+                "value": unit["value"],
+            }
+        )
+    if not jobs:
+        return {"status": "IGNORED"}
+    verified = set()
+    for tenant in resolved.values():
+        if not tenant or not tenant.app_secret or tenant.tenant_id in verified:
+            continue
+        if not legacy_signature_ok(raw, signature, tenant.app_secret):
+            raise HTTPException(status_code=403, detail="Invalid signature")
+        verified.add(tenant.tenant_id)
+    for job in jobs:
+        await queue.put(job)
+    return {"status": "EVENT_RECEIVED"}
+
+
+def build_app(store: TenantsStore, queue: SinkQueue) -> FastAPI:
+    app = FastAPI()
+    app.state.tenants_store = store
+    app.state.work_queue = queue
+    app.include_router(whatsapp.router)
+
+    @app.post("/legacy/webhook")
+    async def legacy_webhook(
+        request: Request, x_hub_signature_256: str | None = Header(default=None)
+    ):
+        raw = await request.body()
+        await request.json()  # the old handler parsed the body a second time
+        return await legacy_ingest(store, queue, raw, x_hub_signature_256)
+
+    return app
+
+
+def sign(raw: bytes) -> str:
+    return "sha256=" + hmac.new(SECRET.encode(), raw, hashlib.sha256).hexdigest()
+
+
+def bodies() -> dict[str, bytes]:
+    tenant = {**TENANT}
+    delivered = status_payload(
+        tenant, "5215500000000", "wamid.HBgLNTIxNTUwMDAwMDAwFQIAERgSQjc", "delivered"
+    )
+    # Meta's real status callbacks also carry conversation/pricing blocks
+    st = delivered["entry"][0]["changes"][0]["value"]["statuses"][0]
+    st["conversation"] = {"id": "c0ffee", "origin": {"type": "service"}}
+    st["pricing"] = {"billable": True, "pricing_model": "CBP", "category": "service"}
+    message = message_payload(
+        tenant, "5215500000000", "wamid.in1", "hola, ¿qué horario tienen?"
+    )
+    return {
+        "status": json.dumps(delivered).encode(),
+        "message": json.dumps(message).encode(),
+    }
+
+
+async def time_handler(fn, store, queue, raw: bytes, sig: str, n: int) -> float:
+    for _ in range(min(n, 500)):  # warm-up
+        await fn(store, queue, raw, sig)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await fn(store, queue, raw, sig)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def time_asgi(
+    client: httpx.AsyncClient, path: str, raw: bytes, sig: str, n: int
+) -> float:
+    headers = {"content-type": "application/json", "x-hub-signature-256": sig}
+    for _ in range(min(n, 200)):
+        await client.post(path, content=raw, headers=headers)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        r = await client.post(path, content=raw, headers=headers)
+    assert r.status_code == 200, r.text
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def run(iterations: int) -> dict:
+    # measure ingest, not log I/O
+    logger.disabled = True
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    store = TenantsStore()
+    store.seed_for_dev([dict(TENANT)])
+    queue = SinkQueue()
+    app = build_app(store, queue)
+    results = {}
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+        for kind, raw in bodies().items():
+            sig = sign(raw)
+            row = {
+                "bytes": len(raw),
+                "handler_legacy_us": await time_handler(
+                    legacy_ingest, store, queue, raw, sig, iterations
+                ),
+                "handler_new_us": await time_handler(
+                    whatsapp.ingest_webhook, store, queue, raw, sig, iterations
+                ),
+                "asgi_legacy_us": await time_asgi(
+                    client, "/legacy/webhook", raw, sig, iterations // 4
+                ),
+                "asgi_new_us": await time_asgi(
+                    client, "/whatsapp/webhook", raw, sig, iterations // 4
+                ),
+            }
+            row = {k: round(v, 2) for k, v in row.items()}
+            row["handler_speedup"] = round(
+                row["handler_legacy_us"] / row["handler_new_us"], 2
+            )
+            row["asgi_speedup"] = round(row["asgi_legacy_us"] / row["asgi_new_us"], 2)
+            results[kind] = row
+    return results
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    p.add_argument("--iterations", type=int, default=20000)
+    args = p.parse_args()
+    print(json.dumps(asyncio.run(run(args.iterations)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
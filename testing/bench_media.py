@@ -0,0 +1,110 @@
+"""
+Media pipeline against the fake Graph API.
+
+    python -m testing.bench_media --recipients 500 --size-kb 2048
+
+outbound  the same linked image sent to --recipients users, with and without
+          the upload-once media-ID cache (MEDIA_UPLOAD_CACHE). "asset fetches"
+          is how often the link was downloaded: by Meta for every send
+          without the cache (simulated: one fetch per send), by us once per
+          phone number with it.
+inbound   one --size-kb asset downloaded through media_store; peak Python
+          memory stays around MEDIA_CHUNK_SIZE, not the asset size.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("APP_ENV", "bench")
+
+from core.config import settings  # noqa: E402
+from services import http_pool  # noqa: E402
+from services.media import media_ids, media_store  # noqa: E402
+from services.send_scheduler import PRIORITY_BULK, send_scheduler  # noqa: E402
+from services.whatsapp_client import WhatsAppClient  # noqa: E402
+from testing.fake_graph_api import create_app  # noqa: E402
+from testing.servers import start_server  # noqa: E402
+
+
+async def outbound(fake, base_url: str, recipients: int, cached: bool) -> dict:
+    media_ids.enabled = cached
+    media_ids.public_only = False  # the fake serves assets on localhost
+    media_ids._ids.clear()
+    media_ids._links.clear()
+    fake.state.uploads = fake.state.asset_fetches = 0
+    client = WhatsAppClient("token", "100001")
+    content = {"link": f"{base_url}/_assets/banner.png", "caption": "hi"}
+    sem = asyncio.Semaphore(64)
+
+    async def one(i: int):
+        async with sem:
+            await send_scheduler.send(
+                client, f"52100{i:07d}", "image", content, priority=PRIORITY_BULK
+            )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(recipients)))
+    elapsed = time.perf_counter() - start
+    by_link = sum(1 for *_, t in fake.state.sent[-recipients:] if t == "image")
+    fetches = fake.state.asset_fetches + (0 if cached else by_link)
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "uploads": fake.state.uploads,
+        "asset_fetches": fetches,
+    }
+
+
+async def inbound(fake, size: int) -> dict:
+    media_id = fake.state.add_media(os.urandom(size), "image/jpeg")
+    media_store.root = tempfile.mkdtemp()
+    client = WhatsAppClient("token", "100001")
+    tracemalloc.start()
+    start = time.perf_counter()
+    f = await media_store.download(client, "bench", media_id, "image/jpeg")
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "size_kb": f.size // 1024,
+        "peak_python_kb": peak // 1024,
+    }
+
+
+async def run(recipients: int, size_kb: int):
+    fake = create_app()
+    server, base_url = await start_server(fake)
+    settings.GRAPH_API_BASE_URL = base_url
+    await http_pool.aclose_graph_http()
+    # no per-recipient pacing: this measures the media path, not rate limits
+    send_scheduler.pair_rate = send_scheduler.pair_burst = 1e9
+    send_scheduler.number_rate = send_scheduler.number_burst = 1e9
+    fake.state.assets["banner.png"] = ("image/png", os.urandom(size_kb * 1024))
+    try:
+        for cached in (False, True):
+            r = await outbound(fake, base_url, recipients, cached)
+            print(f"outbound cache={'on ' if cached else 'off'} {r}")
+        print(f"inbound  {await inbound(fake, size_kb * 1024)}")
+    finally:
+        await send_scheduler.close()
+        await http_pool.aclose_graph_http()
+        server.should_exit = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recipients", type=int, default=500)
+    parser.add_argument("--size-kb", type=int, default=2048)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(run(args.recipients, args.size_kb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark of rules matching: a linear scan over every rule (keyword
+substring checks + one regex search per rule) vs the compiled RuleSet.
+
+    python -m testing.bench_rules --rules 1000 --iterations 20000
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import random
+import re
+import time
+
+os.environ.setdefault("APP_ENV", "bench")
+
+from services.engines.rules_engine import compile_rules  # noqa: E402
+from services.reply_cache import normalize_text  # noqa: E402
+
+WORDS = (
+    "hola horario precio envio tienda pedido pago tarjeta factura devolucion "
+    "garantia talla color stock oferta descuento cupon domicilio sucursal cita"
+).split()
+
+
+def make_rules(n: int, regex_share: float) -> list[dict]:
+    rules = []
+    every = round(1 / regex_share) if regex_share else 0
+    for i in range(n):
+        word = f"{WORDS[i % len(WORDS)]}{i}"
+        if i % 2 == 0:
+            rules.append({"keywords": [word], "reply": f"k{i}"})
+        elif every and i % every == 1:
+            rules.append({"regex": rf"\b{word}\b", "reply": f"r{i}"})
+        else:
+            rules.append({"reply_ids": [f"btn_{i}"], "reply": f"b{i}"})
+    return rules
+
+
+def make_messages(n: int, rules: int) -> list[dict]:
+    rnd = random.Random(7)
+    out = []
+    for _ in range(n):
+        words = rnd.choices(WORDS, k=8)
+        if rnd.random() < 0.3:
+            i = rnd.randrange(rules)
+            words[rnd.randrange(8)] = f"{WORDS[i % len(WORDS)]}{i}"
+        out.append({"type": "text", "text": {"body": " ".join(words)}})
+    return out
+
+
+class LinearRules:
+    """What a straightforward per-rule loop costs."""
+
+    def __init__(self, rules: list[dict]):
+        self.rules = []
+        for raw in rules:
+            self.rules.append(
+                (
+                    [normalize_text(k) for k in raw.get("keywords") or ()],
+                    re.compile(raw["regex"], re.I) if raw.get("regex") else None,
+                    raw["reply"],
+                )
+            )
+
+    def match(self, message: dict):
+        text = message["text"]["body"]
+        normalized = f" {normalize_text(text)} "
+        for keywords, regex, reply in self.rules:
+            if any(f" {k} " in normalized for k in keywords):
+                return reply
+            if regex is not None and regex.search(text):
+                return reply
+        return None
+
+
+def bench(name: str, match, messages: list[dict]):
+    start = time.perf_counter()
+    hits = sum(1 for m in messages if match(m) is not None)
+    elapsed = time.perf_counter() - start
+    per = elapsed / len(messages) * 1e6
+    print(f"{name:10s} {per:9.1f} us/message  ({hits} matched)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--regex-share", type=float, default=0.1)
+    args = parser.parse_args()
+
+    rules = make_rules(args.rules, args.regex_share)
+    messages = make_messages(args.iterations, args.rules)
+    start = time.perf_counter()
+    compiled = compile_rules(rules)
+    print(
+        f"compiled {args.rules} rules in {(time.perf_counter() - start) * 1e3:.1f} ms"
+    )
+    bench("linear", LinearRules(rules).match, messages)
+    bench("compiled", compiled.match, messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Worker startup cost: import time and memory of `main` in a fresh process.
+
+    python -m testing.bench_startup --types openai,mistral
+
+Scenarios (each in its own interpreter):
+  eager      main + every engine SDK at import (how factory used to work)
+  lazy       main only; SDKs load when a tenant first needs them
+  lazy+use   main, then one engine of each --types built (first-use cost)
+  fork       a gunicorn-like master forks a worker that imports main and
+             builds the engines; with/without ENGINE_PRELOAD in the master.
+             "private" is the memory the worker doesn't share with the
+             master (Private_Clean + Private_Dirty, Linux only).
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROBE = r"""
+import asyncio, json, os, sys, time
+
+def mem():
+    out = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Private_Clean", "Private_Dirty"):
+                    out[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        import resource
+        out["Rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "rss_mb": round(out.get("Rss", 0), 1),
+        "private_mb": round(out.get("Private_Clean", 0) + out.get("Private_Dirty", 0), 1),
+    }
+
+def worker(types, eager):
+    t0 = time.perf_counter()
+    if eager:
+        from services.engines.backends import ENGINE_BACKENDS, _import
+        for etype in ENGINE_BACKENDS:
+            _import(etype)
+    import main  # noqa: F401
+    result = {"import_s": round(time.perf_counter() - t0, 3)}
+    if types:
+        from services.engines.factory import get_engine
+        t1 = time.perf_counter()
+        for etype in types:
+            cfg = {"api_key": "x", "endpoint": "http://x", "deployment": "d"}
+            tenant = {"tenant_id": etype, "display_name": "x",
+                      "engine": {"type": etype, "config": cfg}}
+            asyncio.run(get_engine(tenant))
+        result["first_use_s"] = round(time.perf_counter() - t1, 3)
+    result.update(mem())
+    return result
+
+mode, types, preload = sys.argv[1], [t for t in sys.argv[2].split(",") if t], sys.argv[3]
+if mode == "fork":
+    if preload:
+        from services.engines.backends import preload_sdks
+        preload_sdks(preload.split(","))
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        os.write(w, json.dumps(worker(types, False)).encode())
+        os._exit(0)
+    os.close(w)
+    data = b""
+    while chunk := os.read(r, 65536):
+        data += chunk
+    os.waitpid(pid, 0)
+    print(data.decode())
+else:
+    print(json.dumps(worker(types, mode == "eager")))
+"""
+
+
+def probe(mode: str, types: list[str], preload: list[str]) -> dict:
+    env = {**os.environ, "APP_ENV": os.environ.get("APP_ENV", "bench"), "LOG_FILE": ""}
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE, mode, ",".join(types), ",".join(preload)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--types", default="openai,mistral")
+    parser.add_argument("--runs", type=int, default=3, help="best of N per scenario")
+    args = parser.parse_args()
+    types = [t for t in args.types.split(",") if t]
+
+    scenarios = [
+        ("eager", "eager", [], []),
+        ("lazy", "lazy", [], []),
+        ("lazy+use", "lazy", types, []),
+        ("fork", "fork", types, []),
+        ("fork+preload", "fork", types, types),
+    ]
+    print(
+        f"{'scenario':14s} {'import_s':>9s} {'first_use_s':>12s} {'rss_mb':>8s} {'private_mb':>11s}"
+    )
+    for name, mode, use, preload in scenarios:
+        runs = [probe(mode, use, preload) for _ in range(args.runs)]
+        best = min(runs, key=lambda r: r["import_s"])
+        print(
+            f"{name:14s} {best['import_s']:9.3f} {best.get('first_use_s', 0):12.3f} "
+            f"{best['rss_mb']:8.1f} {best['private_mb']:11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+End-to-end load test for POST /whatsapp/webhook with fake Meta + fake LLM backends.
+
+Starts the fake Graph API and fake LLM in this process, runs the service
+(`uvicorn main:app`) as a subprocess pointed at them, then drives signed
+webhooks at a fixed open-loop rate.
+
+    python -m testing.bench_webhook --rate 50 --duration 20 \\
+        --mix mistral=0.6,openai=0.3,rules=0.1 --llm-latency-ms 800 \\
+        --out bench/$(git rev-parse --short HEAD).json --compare bench/baseline.json
+
+Reports ack latency (webhook response time), end-to-end reply latency
+(webhook sent -> reply reaches the Graph API) and throughput.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+
+import httpx
+
+from testing import fake_graph_api, fake_llm
+from testing.servers import free_port, start_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SECRET = "bench-secret"
+
+
+def parse_mix(mix: str) -> list[tuple[str, float]]:
+    out = []
+    for part in mix.split(","):
+        etype, _, weight = part.partition("=")
+        out.append((etype.strip(), float(weight or 1)))
+    return out
+
+
+def make_tenants(n: int, mix: list[tuple[str, float]]) -> list[dict]:
+    types = [etype for etype, _ in mix]
+    weights = [w for _, w in mix]
+    rng = random.Random(42)
+    tenants = []
+    for i in range(n):
+        etype = (
+            types[i % len(types)] if n >= len(types) else rng.choices(types, weights)[0]
+        )
+        tenants.append(
+            {
+                "tenant_id": f"bench-{i}",
+                "display_name": f"Bench {i}",
+                "waba_id": f"9000{i:04d}",
+                "phone_number_id": f"1000{i:04d}",
+                "verify_token": f"verify-{i}",
+                "app_secret": APP_SECRET,
+                "access_token": f"token-{i}",
+                "engine": {"type": etype, "config": {"model": "fake-model"}},
+            }
+        )
+    return tenants
+
+
+def sign(raw: bytes) -> str:
+    # same scheme services.utils.compute_signature_ok verifies
+    return "sha256=" + hmac.new(APP_SECRET.encode(), raw, hashlib.sha256).hexdigest()
+
+
+def message_payload(tenant: dict, wa_id: str, msg_id: str, text: str) -> dict:
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [
+            {
+                "id": tenant["waba_id"],
+                "changes": [
+                    {
+                        "field": "messages",
+                        "value": {
+                            "messaging_product": "whatsapp",
+                            "metadata": {
+                                "display_phone_number": "15550000000",
+                                "phone_number_id": tenant["phone_number_id"],
+                            },
+                            "contacts": [
+                                {"profile": {"name": "Bench"}, "wa_id": wa_id}
+                            ],
+                            "messages": [
+                                {
+                                    "from": wa_id,
+                                    "id": msg_id,
+                                    "timestamp": str(int(time.time())),
+                                    "type": "text",
+                                    "text": {"body": text},
+                                }
+                            ],
+                        },
+                    }
+                ],
+            }
+        ],
+    }
+
+
+def status_payload(tenant: dict, wa_id: str, msg_id: str, status: str) -> dict:
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [
+            {
+                "id": tenant["waba_id"],
+                "changes": [
+                    {
+                        "field": "messages",
+                        "value": {
+                            "messaging_product": "whatsapp",
+                            "metadata": {
+                                "display_phone_number": "15550000000",
+                                "phone_number_id": tenant["phone_number_id"],
+                            },
+                            "statuses": [
+                                {
+                                    "id": msg_id,
+                                    "status": status,
+                                    "timestamp": str(int(time.time())),
+                                    "recipient_id": wa_id,
+                                }
+                            ],
+                        },
+                    }
+                ],
+            }
+        ],
+    }
+
+
+def percentiles(samples: list[float]) -> dict:
+    if len(samples) < 2:
+        return {"count": len(samples)}
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "p50_ms": round(q[49] * 1000, 2),
+        "p95_ms": round(q[94] * 1000, 2),
+        "p99_ms": round(q[98] * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as c:
+        while time.monotonic() < deadline:
+            try:
+                if (await c.get(f"{base_url}/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("service did not become ready")
+
+
+async def run(args) -> dict:
+    mix = parse_mix(args.mix)
+    tenants = make_tenants(args.tenants, mix)
+
+    # end-to-end correlation: FIFO of send times per (phone_number_id, wa_id)
+    pending: dict[tuple[str, str], deque] = defaultdict(deque)
+    e2e: list[float] = []
+
+    def on_send(phone_number_id: str, to: str, _body: dict):
+        q = pending.get((phone_number_id, to))
+        if q:
+            e2e.append(time.perf_counter() - q.popleft())
+
+    graph_app = fake_graph_api.create_app(
+        args.graph_latency_ms, args.graph_error_rate, on_send=on_send
+    )
+    llm_app = fake_llm.create_app(
+        args.llm_latency_ms, args.llm_error_rate, args.llm_tokens_per_s
+    )
+    graph_server, graph_url = await start_server(graph_app)
+    llm_server, llm_url = await start_server(llm_app)
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    tenants_file = os.path.join(workdir, "tenants.json")
+    with open(tenants_file, "w", encoding="utf-8") as f:
+        json.dump(tenants, f)
+
+    port = free_port()
+    env = {
+        **os.environ,
+        "APP_ENV": "bench",
+        "TENANT_DEV_SEED_FILE": tenants_file,
+        "GRAPH_API_BASE_URL": graph_url,
+        "OPENAI_BASE_URL": f"{llm_url}/v1",
+        "MISTRAL_BASE_URL": f"{llm_url}/v1",
+        "OPENAI_API_KEY": "fake",
+        "MISTRAL_API_KEY": "fake",
+        "QUEUE_SQLITE_PATH": os.path.join(workdir, "queue.db"),
+        "DEDUP_SQLITE_PATH": os.path.join(workdir, "dedup.db"),
+    }
+    for kv in args.env:
+        k, _, v = kv.partition("=")
+        env[k] = v
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)]
+        + ["--log-level", "warning"],
+        cwd=workdir if args.isolated_cwd else ROOT,
+        env={**env, "PYTHONPATH": ROOT},
+        stdout=subprocess.DEVNULL if args.quiet else None,
+        stderr=subprocess.DEVNULL if args.quiet else None,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    ack: list[float] = []
+    ack_errors = 0
+    messages_acked = 0
+    rng = random.Random(7)
+    msg_ids = itertools.count(1)
+    conversations = [
+        (rng.choice(tenants), f"52155{i:06d}") for i in range(args.conversations)
+    ]
+    texts = ["hola", "precio", "horario", "¿tienen envío a domicilio?", "gracias"]
+
+    try:
+        await wait_ready(base_url)
+        limits = httpx.Limits(max_connections=args.max_connections)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+
+            async def post(payload: dict, key: tuple | None) -> bool:
+                nonlocal ack_errors, messages_acked
+                raw = json.dumps(payload).encode()
+                headers = {
+                    "content-type": "application/json",
+                    "x-hub-signature-256": sign(raw),
+                }
+                t0 = time.perf_counter()
+                if key:
+                    pending[key].append(t0)
+                try:
+                    r = await client.post(
+                        "/whatsapp/webhook", content=raw, headers=headers
+                    )
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                ack.append(time.perf_counter() - t0)
+                if not ok:
+                    ack_errors += 1
+                    if key and pending[key]:
+                        pending[key].pop()
+                elif key:
+                    messages_acked += 1
+                return ok
+
+            tasks = []
+            total = int(args.rate * args.duration)
+            start = time.perf_counter()
+            for i in range(total):
+                delay = start + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tenant, wa_id = conversations[i % len(conversations)]
+                mid = f"wamid.bench{next(msg_ids)}"
+                if rng.random() < args.status_ratio / (1 + args.status_ratio):
+                    status = rng.choice(["sent", "delivered", "read"])
+                    tasks.append(
+                        asyncio.create_task(
+                            post(status_payload(tenant, wa_id, mid, status), None)
+                        )
+                    )
+                else:
+                    payload = message_payload(tenant, wa_id, mid, rng.choice(texts))
+                    key = (tenant["phone_number_id"], wa_id)
+                    tasks.append(asyncio.create_task(post(payload, key)))
+            await asyncio.gather(*tasks)
+            load_elapsed = time.perf_counter() - start
+
+            # wait for replies still in flight
+            deadline = time.perf_counter() + args.drain_timeout
+            while len(e2e) < messages_acked and time.perf_counter() < deadline:
+                await asyncio.sleep(0.1)
+            drain_elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        graph_server.should_exit = True
+        llm_server.should_exit = True
+
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            k: v for k, v in vars(args).items() if k not in ("out", "compare", "quiet")
+        },
+        "requests_sent": len(ack),
+        "ack_errors": ack_errors,
+        "messages_acked": messages_acked,
+        "replies": len(e2e),
+        "ack_latency": percentiles(ack),
+        "e2e_reply_latency": percentiles(e2e),
+        "ack_per_s": round(len(ack) / load_elapsed, 1),
+        "replies_per_s": round(len(e2e) / drain_elapsed, 1) if drain_elapsed else 0,
+        "llm_calls": llm_app.state.calls,
+        "graph_sends": len(graph_app.state.sent),
+    }
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """Relative change of the headline numbers vs a previous results file."""
+    out = {}
+    for section in ("ack_latency", "e2e_reply_latency"):
+        for k in ("p50_ms", "p95_ms", "p99_ms"):
+            a, b = baseline.get(section, {}).get(k), current.get(section, {}).get(k)
+            if a and b is not None:
+                out[f"{section}.{k}"] = f"{a} -> {b} ({(b - a) / a:+.1%})"
+    for k in ("ack_per_s", "replies_per_s"):
+        a, b = baseline.get(k), current.get(k)
+        if a and b is not None:
+            out[k] = f"{a} -> {b} ({(b - a) / a:+.1%})"
+    return out
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    p.add_argument("--rate", type=float, default=50.0, help="webhooks per second")
+    p.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    p.add_argument("--tenants", type=int, default=4)
+    p.add_argument(
+        "--mix", default="rules=1", help="engine mix, e.g. mistral=0.6,openai=0.4"
+    )
+    p.add_argument("--conversations", type=int, default=200)
+    p.add_argument(
+        "--status-ratio", type=float, default=0.0, help="status callbacks per message"
+    )
+    p.add_argument("--llm-latency-ms", type=float, default=500.0)
+    p.add_argument("--llm-error-rate", type=float, default=0.0)
+    p.add_argument("--llm-tokens-per-s", type=float, default=0.0)
+    p.add_argument("--graph-latency-ms", type=float, default=80.0)
+    p.add_argument("--graph-error-rate", type=float, default=0.0)
+    p.add_argument("--max-connections", type=int, default=100)
+    p.add_argument("--drain-timeout", type=float, default=30.0)
+    p.add_argument(
+        "--env", action="append", default=[], help="KEY=VALUE for the service"
+    )
+    p.add_argument(
+        "--isolated-cwd", action="store_true", help="run the service in a temp dir"
+    )
+    p.add_argument("--quiet", action="store_true", help="silence service output")
+    p.add_argument("--out", help="write results JSON here")
+    p.add_argument("--compare", help="baseline results JSON to diff against")
+    args = p.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            result["compared_to"] = compare(result, json.load(f))
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Offline throughput benchmark for services.whatsapp_client against the fake Graph API.
+
+    python -m testing.bench_whatsapp_client --messages 5000 --concurrency 200 --latency-ms 50
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("APP_ENV", "bench")
+
+from core.config import settings  # noqa: E402
+from services import http_pool  # noqa: E402
+from services.whatsapp_client import WhatsAppClient  # noqa: E402
+from testing.fake_graph_api import create_app  # noqa: E402
+from testing.servers import start_server  # noqa: E402
+
+
+async def run(messages: int, concurrency: int, latency_ms: float, numbers: int):
+    server, base_url = await start_server(create_app(latency_ms=latency_ms))
+    settings.GRAPH_API_BASE_URL = base_url
+    await http_pool.aclose_graph_http()
+
+    clients = [WhatsAppClient(f"token-{i}", f"10{i:04d}") for i in range(numbers)]
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await clients[i % numbers].send(f"52100{i:07d}", "text", {"body": "hi"})
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    elapsed = time.perf_counter() - t0
+
+    await http_pool.aclose_graph_http()
+    server.should_exit = True
+
+    latencies.sort()
+    q = statistics.quantiles(latencies, n=100)
+    return {
+        "messages": messages,
+        "concurrency": concurrency,
+        "server_latency_ms": latency_ms,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "msgs_per_s": round(messages / elapsed, 1),
+        "p50_ms": round(q[49] * 1000, 2),
+        "p95_ms": round(q[94] * 1000, 2),
+        "p99_ms": round(q[98] * 1000, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--numbers", type=int, default=4)
+    args = parser.parse_args()
+    result = asyncio.run(
+        run(args.messages, args.concurrency, args.latency_ms, args.numbers)
+    )
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,185 @@
+"""
+Local stand-in for the WhatsApp Cloud (Graph) API: messages and media
+(upload, inbound media info + download) endpoints, plus /_assets/<name> as a
+public host for media sent by link.
+
+    python -m testing.fake_graph_api --port 9100 --latency-ms 80 --error-rate 0.01 \
+        --throughput-limit 80
+
+Point the service at it with GRAPH_API_BASE_URL=http://127.0.0.1:9100.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import hashlib
+import itertools
+import random
+import time
+from collections import deque
+from email import policy
+from email.parser import BytesParser
+from typing import Callable
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+async def _chunks(data: bytes, size: int = 65536):
+    view = memoryview(data)
+    for i in range(0, len(view), size):
+        yield bytes(view[i : i + size])  # noqa: E203
+
+
+def create_app(
+    latency_ms: float = 0.0,
+    error_rate: float = 0.0,
+    throughput_limit: float = 0.0,
+    on_send: Callable[[str, str, dict], None] | None = None,
+) -> FastAPI:
+    """
+    throughput_limit: messages/s per phone_number_id before answering with
+    Meta's 130429 rate-limit error (0 = unlimited).
+    on_send(phone_number_id, to, body): called for every accepted message.
+    """
+    app = FastAPI()
+    app.state.latency_ms = latency_ms
+    app.state.error_rate = error_rate
+    app.state.throughput_limit = throughput_limit
+    app.state.rate_limited = 0
+    windows: dict[str, deque] = {}
+    app.state.sent = []  # (monotonic_ts, phone_number_id, to, type)
+    ids = itertools.count(1)
+    # media: id -> (phone_number_id or None, mime_type, bytes)
+    app.state.media = {}
+    app.state.uploads = 0
+    app.state.asset_fetches = 0
+    app.state.assets = {}  # name -> (mime_type, bytes), served on /_assets
+    media_ids = itertools.count(1000)
+
+    def add_media(data: bytes, mime_type: str, pnid: str | None = None) -> str:
+        media_id = str(next(media_ids))
+        app.state.media[media_id] = (pnid, mime_type, data)
+        return media_id
+
+    app.state.add_media = add_media
+
+    @app.post("/{version}/{phone_number_id}/messages")
+    async def messages(phone_number_id: str, request: Request):
+        data = await request.json()
+        if app.state.latency_ms:
+            await asyncio.sleep(app.state.latency_ms / 1000)
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            return JSONResponse(
+                {"error": {"code": 190, "message": "Invalid OAuth access token"}}, 401
+            )
+        if app.state.throughput_limit:
+            now = time.monotonic()
+            window = windows.setdefault(phone_number_id, deque())
+            while window and now - window[0] > 1.0:
+                window.popleft()
+            if len(window) >= app.state.throughput_limit:
+                app.state.rate_limited += 1
+                return JSONResponse(
+                    {"error": {"code": 130429, "message": "Rate limit hit"}}, 400
+                )
+            window.append(now)
+        if app.state.error_rate and random.random() < app.state.error_rate:
+            return JSONResponse(
+                {"error": {"code": 131000, "message": "Something went wrong"}}, 500
+            )
+        media_id = (data.get(data.get("type")) or {}).get("id")
+        if media_id and media_id not in app.state.media:
+            return JSONResponse(
+                {"error": {"code": 131053, "message": "Media upload error"}}, 400
+            )
+        to = data.get("to")
+        app.state.sent.append((time.monotonic(), phone_number_id, to, data.get("type")))
+        if on_send:
+            on_send(phone_number_id, to, data)
+        return {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": to, "wa_id": to}],
+            "messages": [{"id": f"wamid.fake{next(ids)}"}],
+        }
+
+    @app.post("/{version}/{phone_number_id}/media")
+    async def upload(phone_number_id: str, request: Request):
+        # multipart parsed with the stdlib (no python-multipart needed)
+        head = f"Content-Type: {request.headers['content-type']}\r\n\r\n".encode()
+        form = BytesParser(policy=policy.default).parsebytes(
+            head + await request.body()
+        )
+        fields = {
+            part.get_param("name", header="content-disposition"): part
+            for part in form.iter_parts()
+        }
+        data = fields["file"].get_payload(decode=True)
+        mime_type = fields["type"].get_content().strip()
+        app.state.uploads += 1
+        return {"id": add_media(data, mime_type, phone_number_id)}
+
+    @app.get("/_media/{media_id}")
+    async def media_download(media_id: str, request: Request):
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            return JSONResponse({"error": {"code": 190}}, 401)
+        _, mime_type, data = app.state.media[media_id]
+        return StreamingResponse(_chunks(data), media_type=mime_type)
+
+    @app.get("/_assets/{name}")
+    async def asset(name: str):
+        app.state.asset_fetches += 1
+        mime_type, data = app.state.assets[name]
+        return StreamingResponse(_chunks(data), media_type=mime_type)
+
+    @app.get("/{version}/{media_id}")
+    async def media_info(media_id: str, request: Request):
+        if media_id not in app.state.media:
+            return JSONResponse(
+                {"error": {"code": 100, "message": "Unknown media"}}, 404
+            )
+        _, mime_type, data = app.state.media[media_id]
+        return {
+            "messaging_product": "whatsapp",
+            "url": str(request.base_url) + f"_media/{media_id}",
+            "mime_type": mime_type,
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "file_size": len(data),
+            "id": media_id,
+        }
+
+    @app.get("/_stats")
+    async def stats():
+        return {
+            "sent": len(app.state.sent),
+            "rate_limited": app.state.rate_limited,
+            "uploads": app.state.uploads,
+            "asset_fetches": app.state.asset_fetches,
+        }
+
+    @app.post("/_reset")
+    async def reset():
+        app.state.sent.clear()
+        app.state.rate_limited = 0
+        app.state.uploads = app.state.asset_fetches = 0
+        windows.clear()
+        return {"ok": True}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throughput-limit", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.error_rate, args.throughput_limit),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+    )
@@ -0,0 +1,141 @@
+"""
+Local stand-in for the OpenAI and Mistral chat completion APIs
+(both use POST {base}/chat/completions with the same wire format).
+
+    python -m testing.fake_llm --port 9200 --latency-ms 800 --error-rate 0.02
+
+Point engines at it with OPENAI_BASE_URL=http://127.0.0.1:9200/v1 and
+MISTRAL_BASE_URL=http://127.0.0.1:9200/v1 (both SDKs read these); Azure
+OpenAI engines with AZURE_OAI_ENDPOINT=http://127.0.0.1:9200.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_REPLY = (
+    "Gracias por escribirnos. Nuestro horario es de lunes a viernes de 9 a 18 h. "
+    "¿Hay algo más en lo que pueda ayudarte?"
+)
+
+
+def create_app(
+    latency_ms: float = 0.0,
+    error_rate: float = 0.0,
+    tokens_per_s: float = 0.0,
+    reply: str = DEFAULT_REPLY,
+) -> FastAPI:
+    """
+    latency_ms: time to first token (or to the full response when not streaming)
+    error_rate: share of requests answered with HTTP 500
+    tokens_per_s: streaming speed after the first token (0 = instant)
+    """
+    app = FastAPI()
+    app.state.latency_ms = latency_ms
+    app.state.error_rate = error_rate
+    app.state.tokens_per_s = tokens_per_s
+    app.state.reply = reply
+    app.state.calls = 0
+    app.state.errors = 0
+    ids = itertools.count(1)
+
+    def _words() -> list[str]:
+        words = app.state.reply.split(" ")
+        return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+    @app.post("/v1/chat/completions")
+    @app.post("/openai/deployments/{deployment}/chat/completions")  # Azure OpenAI
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        if app.state.latency_ms:
+            await asyncio.sleep(app.state.latency_ms / 1000)
+        if app.state.error_rate and random.random() < app.state.error_rate:
+            app.state.errors += 1
+            return JSONResponse(
+                {"error": {"message": "fake upstream error", "type": "server_error"}},
+                500,
+            )
+
+        cid = f"chatcmpl-fake{next(ids)}"
+        model = body.get("model", "fake")
+        created = int(time.time())
+
+        if body.get("stream"):
+
+            async def _sse():
+                for word in _words():
+                    if app.state.tokens_per_s:
+                        await asyncio.sleep(1 / app.state.tokens_per_s)
+                    chunk = {
+                        "id": cid,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [
+                            {
+                                "index": 0,
+                                "delta": {"role": "assistant", "content": word},
+                                "finish_reason": None,
+                            }
+                        ],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                done = {
+                    "id": cid,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                yield f"data: {json.dumps(done)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(_sse(), media_type="text/event-stream")
+
+        if app.state.tokens_per_s:
+            await asyncio.sleep(len(_words()) / app.state.tokens_per_s)
+        return {
+            "id": cid,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": app.state.reply},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30},
+        }
+
+    @app.get("/_stats")
+    async def stats():
+        return {"calls": app.state.calls, "errors": app.state.errors}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tokens-per-s", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.error_rate, args.tokens_per_s),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+    )
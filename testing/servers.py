@@ -0,0 +1,27 @@
+from __future__ import annotations
+import asyncio
+import socket
+
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_server(app, port: int | None = None) -> tuple[uvicorn.Server, str]:
+    """
+    Run an ASGI app on 127.0.0.1 inside the current event loop.
+    Returns (server, base_url); stop with `server.should_exit = True`.
+    """
+    port = port or free_port()
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"
+    )
+    server = uvicorn.Server(config)
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
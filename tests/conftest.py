@@ -0,0 +1,6 @@
+import os
+import sys
+
+os.environ.setdefault("APP_ENV", "test")
+os.environ.setdefault("LOG_FILE", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,58 @@
+import asyncio
+
+from services.engines.base import ResponseEngine
+from services.engines.cached_engine import CachedEngine
+
+TENANT = {"tenant_id": "t-cache"}
+
+
+class _Slow(ResponseEngine):
+    def __init__(self):
+        self.calls = 0
+
+    async def reply(self, tenant_cfg, message):
+        self.calls += 1
+        await asyncio.sleep(0.1)
+        return "answer"
+
+
+def _msg(text: str) -> dict:
+    return {"type": "text", "text": {"body": text}}
+
+
+async def _leader_cancelled():
+    inner = _Slow()
+    engine = CachedEngine(inner, "fp-cancel", {})
+    leader = asyncio.create_task(engine.reply(TENANT, _msg("opening hours?")))
+    await asyncio.sleep(0.01)
+    waiters = [
+        asyncio.create_task(engine.reply(TENANT, _msg("opening hours?")))
+        for _ in range(3)
+    ]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    assert await asyncio.gather(*waiters) == ["answer"] * 3
+    assert leader.cancelled()
+    # one waiter took over the call; the others shared it
+    assert inner.calls == 2
+
+
+async def _waiter_cancelled():
+    inner = _Slow()
+    engine = CachedEngine(inner, "fp-waiter", {})
+    leader = asyncio.create_task(engine.reply(TENANT, _msg("price?")))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(engine.reply(TENANT, _msg("price?")))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    assert await leader == "answer"
+    assert waiter.cancelled()
+    assert inner.calls == 1
+
+
+def test_waiters_retry_when_the_leader_is_cancelled():
+    asyncio.run(_leader_cancelled())
+
+
+def test_cancelled_waiter_leaves_the_leader_running():
+    asyncio.run(_waiter_cancelled())
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+import routers.whatsapp as wa
+from services.dedup import LRUDedup
+
+TENANT = {"tenant_id": "t-coalesce", "engine": {"type": "fake", "config": {}}}
+
+
+class _Engine:
+    streaming = False
+    use_history = False
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls: list[str] = []
+
+    async def reply(self, tenant_cfg, msg):
+        self.calls.append(msg["text"]["body"])
+        await asyncio.sleep(self.delay)
+        return "re: " + msg["text"]["body"]
+
+
+def _msg(n: int) -> dict:
+    return {
+        "id": f"wamid.{n}",
+        "from": "555",
+        "type": "text",
+        "text": {"body": f"m{n}"},
+    }
+
+
+@pytest.fixture
+def router(monkeypatch):
+    sent: list[str] = []
+    state = {"fail": {"wamid.2"}, "media_delay": 0.0}
+
+    async def attach_media(tenant_cfg, client, msg):
+        await asyncio.sleep(state["media_delay"])
+        if msg["id"] in state["fail"]:
+            raise RuntimeError("media download failed")
+
+    async def send(client, wa_id, kind, body, tenant=None):
+        sent.append(body["body"])
+
+    monkeypatch.setattr(wa, "attach_media", attach_media)
+    monkeypatch.setattr(wa.send_scheduler, "send", send)
+    monkeypatch.setattr(wa, "message_dedup", LRUDedup(60, 1000))
+    return sent, state
+
+
+async def _job(engine, window: float):
+    await wa.coalesce_conversation(
+        TENANT, engine, None, {}, "555", [_msg(1), _msg(2)], window, 5
+    )
+
+
+def test_failed_job_takes_its_pending_messages_back(router):
+    sent, state = router
+
+    async def run():
+        engine = _Engine(0.0)
+        with pytest.raises(RuntimeError):
+            await _job(engine, 0.2)
+        await asyncio.sleep(0.3)
+        # m1 was still waiting for the window: not answered by the batch
+        assert engine.calls == [] and sent == []
+        state["fail"].clear()
+        await _job(engine, 0.05)  # the queue's retry
+        assert engine.calls == ["m1\nm2"]
+        assert sent == ["re: m1\nm2"]
+
+    asyncio.run(run())
+
+
+def test_failed_job_keeps_claims_of_messages_being_answered(router):
+    sent, state = router
+    state["media_delay"] = 0.1
+
+    async def run():
+        engine = _Engine(0.3)
+        with pytest.raises(RuntimeError):
+            await _job(engine, 0.01)
+        state["fail"].clear()
+        await _job(engine, 0.01)  # the queue's retry
+        await asyncio.sleep(0.5)
+        # m1 was already being generated: the retry's m2 joins that batch
+        # instead of m1 being claimed and answered a second time
+        assert engine.calls[-1] == "m1\nm2"
+        assert sent == ["re: m1\nm2"]
+
+    asyncio.run(run())
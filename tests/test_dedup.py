@@ -0,0 +1,62 @@
+import asyncio
+import sqlite3
+import time
+
+from services.dedup import LRUDedup, RotatingBloomDedup, SQLiteDedup
+
+
+async def _retry_after_release(dedup):
+    assert await dedup.claim("wamid.1")
+    # a redelivery while the first attempt is running is a duplicate
+    assert not await dedup.claim("wamid.1")
+    await dedup.release("wamid.1")
+    # the queue's retry after a failure is not
+    assert await dedup.claim("wamid.1")
+    await dedup.complete("wamid.1")
+    assert not await dedup.claim("wamid.1")
+    await dedup.release("wamid.2")  # never claimed: no-op
+
+
+def test_bloom_release_lets_the_retry_through():
+    asyncio.run(_retry_after_release(RotatingBloomDedup(60, 1000, 0.001)))
+
+
+def test_lru_release_lets_the_retry_through():
+    asyncio.run(_retry_after_release(LRUDedup(60, 1000)))
+
+
+def test_sqlite_release_lets_the_retry_through(tmp_path):
+    asyncio.run(_retry_after_release(SQLiteDedup(str(tmp_path / "d.db"), 60)))
+
+
+async def _lapsed_claim(path: str):
+    dedup = SQLiteDedup(path, ttl=60, lease=0.2)
+    assert await dedup.claim("wamid.1")
+    assert not await dedup.claim("wamid.1")
+    # the worker died without complete()/release(): the redelivery gets it
+    await asyncio.sleep(0.3)
+    assert await dedup.claim("wamid.1")
+    await dedup.complete("wamid.1")
+    await asyncio.sleep(0.3)
+    # done messages are kept for the ttl, not the lease
+    assert not await dedup.claim("wamid.1")
+
+
+def test_sqlite_claim_lease_expires_until_completed(tmp_path):
+    asyncio.run(_lapsed_claim(str(tmp_path / "d.db")))
+
+
+def test_sqlite_rows_from_before_leases_count_as_done(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE seen_messages (id TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO seen_messages VALUES ('wamid.old', ?)", (time.time() + 60,)
+    )
+    conn.commit()
+    conn.close()
+    dedup = SQLiteDedup(path, ttl=60)
+    assert not asyncio.run(dedup.claim("wamid.old"))
+    assert asyncio.run(dedup.claim("wamid.new"))
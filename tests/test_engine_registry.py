@@ -0,0 +1,32 @@
+import asyncio
+
+import services.engines.registry as registry
+from services.engines.registry import EngineRegistry
+
+TENANT = {"tenant_id": "t-build", "engine": {"type": "rules", "config": {}}}
+
+
+async def _leader_cancelled(monkeypatch):
+    builds = []
+
+    async def get_engine(tenant_cfg):
+        builds.append(tenant_cfg["tenant_id"])
+        await asyncio.sleep(0.1)
+        return object()
+
+    monkeypatch.setattr(registry, "get_engine", get_engine)
+    engines = EngineRegistry()
+    leader = asyncio.create_task(engines.get(TENANT))
+    await asyncio.sleep(0.01)
+    waiters = [asyncio.create_task(engines.get(TENANT)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    built = await asyncio.wait_for(asyncio.gather(*waiters), 2)
+    assert leader.cancelled()
+    # one waiter took over the build; the others shared it
+    assert len(builds) == 2
+    assert built[0] is built[1] is built[2]
+
+
+def test_waiters_rebuild_when_the_leading_build_is_cancelled(monkeypatch):
+    asyncio.run(_leader_cancelled(monkeypatch))
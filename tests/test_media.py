@@ -0,0 +1,128 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import services.media as media
+from services.media import MediaIdCache, UnsafeMediaLink
+from services.send_scheduler import send_scheduler
+
+OPTED_IN = {"tenant_id": "t1", "engine": {"config": {"upload_media": True}}}
+CLIENT = SimpleNamespace(phone_number_id="pn1")
+
+
+def _cache(**kw) -> MediaIdCache:
+    return MediaIdCache(
+        max_entries=2, id_ttl=60, link_ttl=60, chunk_size=1024, max_bytes=1024, **kw
+    )
+
+
+async def _fail_uploads(cache: MediaIdCache, n: int):
+    for i in range(n):
+        # nothing listens there: the upload fails and the link is sent as is
+        link = f"http://127.0.0.1:9/img{i}.jpg"
+        assert await cache.resolve(CLIENT, "image", {"link": link}, OPTED_IN) is None
+
+
+def test_failed_uploads_are_bounded():
+    cache = _cache(retry_after=60, public_only=False)
+    asyncio.run(_fail_uploads(cache, 5))
+    assert cache.upload_failures == 5
+    assert cache.stats()["failed_links"] == 2
+
+
+def test_expired_failures_are_dropped_on_lookup():
+    cache = _cache(retry_after=0, public_only=False)
+    asyncio.run(_fail_uploads(cache, 2))
+    asyncio.run(_fail_uploads(cache, 2))  # retried, not skipped
+    assert cache.upload_failures == 4
+
+
+def test_upload_cache_is_opt_in():
+    cache = _cache()
+    link = {"link": "https://93.184.216.34/a.png"}
+    tenant = {"tenant_id": "t2", "engine": {"config": {}}}
+    assert asyncio.run(cache.resolve(CLIENT, "image", link, tenant)) is None
+    assert cache.uploads == cache.upload_failures == cache.refused == 0
+
+
+@pytest.mark.parametrize(
+    "link",
+    [
+        "https://127.0.0.1/a.png",
+        "https://169.254.169.254/latest/meta-data/",
+        "https://10.1.2.3/a.png",
+        "https://[::1]/a.png",
+        "https://[::ffff:192.168.0.1]/a.png",
+        "https://localhost/a.png",  # resolves to loopback
+        "http://93.184.216.34/a.png",  # not https
+    ],
+)
+def test_unsafe_links_are_refused(link):
+    cache = _cache()
+    assert asyncio.run(cache.resolve(CLIENT, "image", {"link": link}, OPTED_IN)) is None
+    assert cache.refused == 1
+    assert cache.uploads == cache.upload_failures == 0
+
+
+def test_redirect_to_private_address_is_refused(monkeypatch):
+    fetched = []
+
+    def handler(request: httpx.Request):
+        fetched.append(str(request.url))
+        return httpx.Response(302, headers={"location": "https://10.0.0.5/secret"})
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(media, "get_graph_http", lambda: http)
+
+    async def run():
+        chunks = media._iter_url("https://93.184.216.34/a.png", 1024, [])
+        with pytest.raises(UnsafeMediaLink):
+            async for _ in chunks:
+                pass
+
+    asyncio.run(run())
+    assert fetched == ["https://93.184.216.34/a.png"]
+
+
+def test_host_allowlist():
+    assert media._check_link("https://cdn.example.com/a.png", ["example.com"])
+    with pytest.raises(UnsafeMediaLink):
+        media._check_link("https://evil.com/a.png", ["example.com"])
+    with pytest.raises(UnsafeMediaLink):
+        media._check_link("https://notexample.com/a.png", ["example.com"])
+
+
+def test_private_link_is_sent_as_a_plain_link(monkeypatch):
+    sent = []
+
+    async def _send(client, to, type_, content, priority, tenant):
+        sent.append(content)
+        return {"messages": [{"id": "wamid.1"}]}
+
+    monkeypatch.setattr(send_scheduler, "_send", _send)
+    monkeypatch.setattr(media.media_ids, "public_only", True)
+    content = {"link": "https://169.254.169.254/latest/meta-data/iam"}
+    asyncio.run(send_scheduler.send(CLIENT, "5211", "image", content, tenant=OPTED_IN))
+    assert sent == [content]
+
+
+def test_inbound_download_is_opt_in():
+    assert not media.download_enabled({"tenant_id": "t1", "engine": {"config": {}}})
+    assert media.download_enabled(
+        {"tenant_id": "t1", "engine": {"config": {"download_media": True}}}
+    )
+
+
+def test_failed_download_leaves_the_message_without_the_file(monkeypatch):
+    import routers.whatsapp as wa
+
+    async def download(client, tenant_id, media_id, mime_type, sha256):
+        raise httpx.ConnectError("graph unreachable")
+
+    monkeypatch.setattr(wa.media_store, "download", download)
+    tenant = {"tenant_id": "t1", "engine": {"config": {"download_media": True}}}
+    msg = {"id": "wamid.1", "type": "image", "image": {"id": "m1"}}
+    asyncio.run(wa.attach_media(tenant, CLIENT, msg))
+    assert msg["image"] == {"id": "m1"}
@@ -0,0 +1,93 @@
+import asyncio
+
+from services.queue.consumer import QueueConsumers
+from services.queue.memory import MemoryQueue
+from services.queue.sqlite import SQLiteQueue
+
+
+async def _over_cap_jobs_wait_in_the_queue(queue):
+    release = asyncio.Event()
+    done: list[int] = []
+
+    async def handler(payload):
+        await release.wait()
+        done.append(payload["n"])
+
+    consumers = QueueConsumers(queue, handler, concurrency=4, tenant_limit=1)
+    for n in range(3):
+        await queue.put({"tenant_id": "t1", "n": n})
+    consumers.start()
+    try:
+        await asyncio.sleep(0.3)
+        stats = await consumers.stats()
+        # one job runs; the others stay ready in the queue, not held leased
+        assert stats["busy"] == 1
+        assert stats["leased"] == 1
+        assert stats["ready"] == 2
+        release.set()
+        for _ in range(100):
+            if len(done) == 3:
+                break
+            await asyncio.sleep(0.05)
+        assert sorted(done) == [0, 1, 2]
+        assert consumers.retried == 0
+    finally:
+        await consumers.stop()
+        await queue.close()
+
+
+def test_memory_queue_leaves_over_cap_jobs_queued():
+    asyncio.run(_over_cap_jobs_wait_in_the_queue(MemoryQueue()))
+
+
+def test_sqlite_queue_leaves_over_cap_jobs_queued(tmp_path):
+    queue = SQLiteQueue(str(tmp_path / "queue.db"), poll_interval=0.05)
+    asyncio.run(_over_cap_jobs_wait_in_the_queue(queue))
+
+
+async def _one_sender_stays_in_order(queue):
+    handled: list[int] = []
+
+    async def handler(payload):
+        await asyncio.sleep(0.02)
+        if payload["tenant_id"] == "t1":
+            handled.append(payload["n"])
+
+    consumers = QueueConsumers(queue, handler, concurrency=4, tenant_limit=1)
+    consumers.start()
+    try:
+        for n in range(6):
+            await queue.put({"tenant_id": "t1", "wa_id": "15550001", "n": n})
+            await queue.put({"tenant_id": "t2", "wa_id": "15550002", "n": n})
+            await asyncio.sleep(0.005)
+        for _ in range(100):
+            if len(handled) == 6:
+                break
+            await asyncio.sleep(0.05)
+        assert handled == list(range(6))
+    finally:
+        await consumers.stop()
+        await queue.close()
+
+
+def test_memory_queue_keeps_sender_order_under_the_cap():
+    asyncio.run(_one_sender_stays_in_order(MemoryQueue()))
+
+
+def test_sqlite_queue_keeps_sender_order_under_the_cap(tmp_path):
+    queue = SQLiteQueue(str(tmp_path / "queue.db"), poll_interval=0.05)
+    asyncio.run(_one_sender_stays_in_order(queue))
+
+
+async def _defer_keeps_attempts(queue):
+    await queue.put({"n": 1})
+    job = await queue.get()
+    await queue.defer(job, 0)
+    job = await queue.get()
+    assert job.attempts == 1
+    await queue.close()
+
+
+def test_defer_does_not_count_an_attempt(tmp_path):
+    asyncio.run(_defer_keeps_attempts(MemoryQueue()))
+    asyncio.run(_defer_keeps_attempts(SQLiteQueue(str(tmp_path / "q.db"))))
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from services.circuit_breaker import HALF_OPEN, OPEN, circuit_breakers
+from services.engines.base import ResponseEngine
+from services.engines.resilient_engine import ResilientEngine
+from services.fair_scheduler import fair_scheduler
+
+
+class _Echo(ResponseEngine):
+    async def reply(self, tenant_cfg, message):
+        return "ok"
+
+    async def stream_reply(self, tenant_cfg, message):
+        yield "ok"
+
+
+def _half_open(provider: str):
+    breaker = circuit_breakers.get(provider)
+    breaker.state = OPEN
+    breaker._opened_at = time.monotonic() - breaker.cooldown - 1
+    return breaker
+
+
+async def _cancel_while_waiting_for_slot(provider: str, call):
+    tenant = {"tenant_id": f"t-{provider}", "limits": {"engine": 1}}
+    breaker = _half_open(provider)
+    engine = ResilientEngine([(provider, _Echo())], deadline=5)
+    holder = asyncio.Event()
+    done = asyncio.Event()
+
+    async def hold_slot():
+        async with fair_scheduler.engine_slot(tenant):
+            holder.set()
+            await done.wait()
+
+    blocker = asyncio.create_task(hold_slot())
+    await holder.wait()
+    task = asyncio.create_task(call(engine, tenant))
+    await asyncio.sleep(0.05)  # allow() taken, now queued for the slot
+    assert breaker.state == HALF_OPEN and breaker._probing
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    done.set()
+    await blocker
+    assert not breaker._probing
+    # the next call may probe the provider again
+    assert await call(engine, tenant) == "ok"
+
+
+async def _reply(engine, tenant):
+    return await engine.reply(tenant, {"text": {"body": "hi"}})
+
+
+async def _stream(engine, tenant):
+    return "".join(
+        [d async for d in engine.stream_reply(tenant, {"text": {"body": "hi"}})]
+    )
+
+
+def test_cancel_during_slot_wait_releases_breaker():
+    asyncio.run(_cancel_while_waiting_for_slot("cancel-reply", _reply))
+
+
+def test_cancel_stream_during_slot_wait_releases_breaker():
+    asyncio.run(_cancel_while_waiting_for_slot("cancel-stream", _stream))
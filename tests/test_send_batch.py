@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import routers.whatsapp as wa
+from services.batch_sender import (
+    BatchJob,
+    BatchJobs,
+    RecipientSpool,
+    TooManyBatches,
+    run_batch,
+)
+
+
+class _Request:
+    def __init__(self, body: bytes, chunk: int):
+        self.body = body
+        self.chunk = chunk
+
+    async def stream(self):
+        for i in range(0, len(self.body), self.chunk):
+            yield self.body[i : i + self.chunk]  # noqa: E203
+
+
+def _ndjson(n: int) -> bytes:
+    header = {"tenant_id": "t1", "type": "text", "content": {"body": "hi"}}
+    lines = [json.dumps(header), ""]
+    lines += [json.dumps(str(5210000000 + i)) for i in range(n)]
+    lines.append(json.dumps({"to": "5210000000", "content": {"body": "dup"}}))
+    return "\n".join(lines).encode()
+
+
+async def _read(body: bytes, chunk: int):
+    req, spool = await wa._read_ndjson_batch(_Request(body, chunk))
+    return req, [r async for r in spool]
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 1 << 16])
+def test_ndjson_batch_is_spooled_line_by_line(chunk):
+    req, recipients = asyncio.run(_read(_ndjson(50), chunk))
+    assert req.tenant_id == "t1" and req.recipients == []
+    assert len(recipients) == 51
+    assert recipients[0] == "5210000000"
+    assert recipients[-1]["content"] == {"body": "dup"}
+
+
+def test_empty_ndjson_body_is_rejected():
+    with pytest.raises(HTTPException):
+        asyncio.run(_read(b"\n\n", 4))
+
+
+def test_spool_spills_to_disk_and_feeds_the_batch(monkeypatch):
+    sent: list[str] = []
+
+    async def send(client, to, type_, body, priority=None, tenant=None):
+        sent.append(to)
+        return {"messages": [{"id": f"wamid.{to}"}]}
+
+    monkeypatch.setattr("services.batch_sender.send_scheduler.send", send)
+
+    async def run():
+        spool = RecipientSpool(max_memory=1024, chunk_size=256)
+        for i in range(2000):
+            await spool.write(f'"{5210000000 + i % 1500}"\n'.encode())
+        job = BatchJob("t1", "text")
+        results = [
+            r async for r in run_batch(job, None, {"body": "hi"}, spool, concurrency=4)
+        ]
+        return job, results
+
+    job, results = asyncio.run(run())
+    assert results[-1]["done"] and job.status == "done"
+    assert job.sent == 1500 and job.duplicates == 500
+    assert len(set(sent)) == 1500
+
+
+def test_malformed_lines_are_reported_and_the_batch_goes_on(monkeypatch):
+    sent: list[str] = []
+
+    async def send(client, to, type_, body, priority=None, tenant=None):
+        sent.append(to)
+        return {"messages": [{"id": f"wamid.{to}"}]}
+
+    monkeypatch.setattr("services.batch_sender.send_scheduler.send", send)
+    lines = [
+        '"5210000001"',
+        '{"content": {"body": "no to"}}',
+        "{not json",
+        '{"to": "5210000002", "content": "not an object"}',
+        "null",
+        '{"to": "5210000003"}',
+    ]
+
+    async def run():
+        spool = RecipientSpool()
+        await spool.write("\n".join(lines).encode())
+        job = BatchJob("t1", "text")
+        results = [r async for r in run_batch(job, None, {"body": "hi"}, spool)]
+        return job, results
+
+    job, results = asyncio.run(run())
+    assert job.status == "done"
+    assert sorted(sent) == ["5210000001", "5210000003"]
+    bad = [r for r in results if "recipient" in r]
+    assert [r["recipient"] for r in bad] == [2, 3, 4, 5]
+    assert all(not r["ok"] and r["error"] for r in bad)
+    assert job.invalid == 4 and job.failed == 4 and job.sent == 2
+
+
+def test_batch_registry_evicts_finished_jobs_behind_a_running_one():
+    jobs = BatchJobs(max_jobs=2)
+    running, finished = BatchJob("t1", "text"), BatchJob("t1", "text")
+    finished.status = "done"
+    jobs.add(running)
+    jobs.add(finished)
+    newest = BatchJob("t1", "text")
+    jobs.add(newest)
+    assert jobs.get(running.id) and jobs.get(newest.id)
+    assert jobs.get(finished.id) is None
+    # every slot running: a new batch is refused instead of growing the table
+    with pytest.raises(TooManyBatches):
+        jobs.add(BatchJob("t1", "text"))
+    assert len(jobs._jobs) == 2
@@ -0,0 +1,65 @@
+import asyncio
+
+from services.send_scheduler import SendScheduler
+
+
+class _Client:
+    phone_number_id = "pn-cancel"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.sent: list[str] = []
+
+    async def send(self, to, type_, content):
+        await asyncio.sleep(self.delay)
+        self.sent.append(to)
+        return {"messages": [{"id": f"wamid.{to}"}]}
+
+
+def _scheduler() -> SendScheduler:
+    return SendScheduler(number_rate=5, number_burst=1, pair_rate=1, pair_burst=1)
+
+
+async def _cancel_queued():
+    scheduler, client = _scheduler(), _Client()
+    calls = [
+        asyncio.create_task(scheduler.send(client, f"52{i}", "text", {"body": "x"}))
+        for i in range(4)
+    ]
+    await asyncio.sleep(0.05)  # the first one used the only token
+    for call in calls[1:]:
+        call.cancel()
+    await asyncio.sleep(1)
+    assert client.sent == ["520"]
+    lane = scheduler.stats()["numbers"]["pn-cancel"]
+    assert lane["cancelled"] == 3 and lane["sent"] == 1
+    # the cancelled recipients' pair budget was given back
+    assert all(scheduler._pair("pn-cancel", f"52{i}").idle() for i in range(1, 4))
+    await scheduler.close()
+
+
+async def _cancel_waiting_for_send_slot():
+    scheduler = SendScheduler(number_rate=100, number_burst=100)
+    client = _Client(delay=0.2)
+    tenant = {"tenant_id": "t-slot", "limits": {"sends": 1}}
+    first = asyncio.create_task(
+        scheduler.send(client, "521", "text", {"body": "x"}, tenant=tenant)
+    )
+    second = asyncio.create_task(
+        scheduler.send(client, "522", "text", {"body": "x"}, tenant=tenant)
+    )
+    await asyncio.sleep(0.05)  # second is dispatched, waiting for the slot
+    second.cancel()
+    await first
+    await asyncio.sleep(0.3)
+    assert client.sent == ["521"]
+    assert scheduler.stats()["numbers"]["pn-cancel"]["cancelled"] == 1
+    await scheduler.close()
+
+
+def test_cancelled_sends_are_dropped_from_the_lane():
+    asyncio.run(_cancel_queued())
+
+
+def test_cancelled_sends_are_dropped_before_the_graph_call():
+    asyncio.run(_cancel_waiting_for_send_slot())
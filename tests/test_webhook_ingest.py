@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import routers.whatsapp as wa
+from data.tenants_store import TenantConfig
+from services.queue.memory import MemoryQueue
+
+TENANT = TenantConfig(
+    tenant_id="t1",
+    display_name="T1",
+    phone_number_id="pn1",
+    verify_token="v",
+    access_token="a",
+    engine={"type": "fake", "config": {}},
+)
+
+
+class _Store:
+    async def get_by_phone_number_id(self, phone_number_id):
+        return TENANT if phone_number_id == "pn1" else None
+
+    async def get_by_waba_id(self, waba_id):
+        return None
+
+
+def _delivery(n: int) -> bytes:
+    value = {
+        "metadata": {"phone_number_id": "pn1"},
+        "messages": [{"id": f"wamid.{n}", "from": "555", "type": "text"}],
+    }
+    entry = {"id": "waba1", "changes": [{"field": "messages", "value": value}]}
+    return json.dumps({"entry": [entry]}).encode()
+
+
+def test_full_queue_acks_and_dead_letters():
+    async def run():
+        queue = MemoryQueue(maxsize=1)
+        first = await wa.ingest_webhook(_Store(), queue, _delivery(1), None)
+        # the queue is full: the ack must not wait for a consumer
+        second = await asyncio.wait_for(
+            wa.ingest_webhook(_Store(), queue, _delivery(2), None), 1
+        )
+        assert first == second == {"status": "EVENT_RECEIVED"}
+        stats = await queue.stats()
+        assert stats["ready"] == 1
+        assert stats["dead_letters"] == 1
+
+    asyncio.run(run())
+
+
+def test_try_put_does_not_wait_for_room():
+    async def run():
+        queue = MemoryQueue(maxsize=1)
+        assert await queue.try_put({"n": 1})
+        assert await queue.try_put({"n": 2}) is None
+        job = await queue.get()
+        await queue.ack(job)
+        assert await queue.try_put({"n": 3})
+
+    asyncio.run(run())